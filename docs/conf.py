@@ -49,7 +49,6 @@ autodoc_mock_imports = [
     "sqlalchemy",
     "geoalchemy2",
     "tqdm",
-    "similaritymeasures",
     "pygeos",
 ]
 
@@ -32,7 +32,6 @@ REQUIRED = [
     "osmnx",
     "scikit-learn",
     "tqdm",
-    "similaritymeasures",
     "pygeos>=0.10.0",
 ]
 
@@ -48,7 +47,6 @@ install_requires = [
     "scikit-learn",
     "tqdm",
     "geopandas>=0.9.0",
-    "similaritymeasures",
     "pygeos>=0.10.0",
 ]
 
@@ -0,0 +1,123 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import trackintel as ti
+from trackintel.analysis.coverage import CoverageIndex
+
+
+@pytest.fixture
+def sp_tpls_geolife_long():
+    """Generate sp and tpls of the geolife_long positionfixes."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    pfs, sp = pfs.as_positionfixes.generate_staypoints(method="sliding", dist_threshold=25, time_threshold=5)
+    pfs, tpls = pfs.as_positionfixes.generate_triplegs(sp, method="between_staypoints")
+    return sp, tpls
+
+
+@pytest.fixture
+def overlapping_records():
+    """Records of two users, the ones of user 0 overlap."""
+    t = pd.Timestamp("2021-01-01 00:00:00", tz="utc")
+    h = pd.Timedelta("1h")
+    data = [
+        {"user_id": 0, "started_at": t, "finished_at": t + 2 * h},
+        {"user_id": 0, "started_at": t + h, "finished_at": t + 3 * h},
+        {"user_id": 0, "started_at": t + 3 * h, "finished_at": t + 4 * h},
+        {"user_id": 0, "started_at": t + 30 * h, "finished_at": t + 31 * h},
+        {"user_id": 1, "started_at": t + h, "finished_at": t + 2 * h},
+        {"user_id": 1, "started_at": t + h, "finished_at": t + h},
+    ]
+    return pd.DataFrame(data)
+
+
+def _union_seconds(records, t0, t1):
+    """Tracked seconds of the union of the records clipped to [t0, t1], computed per second."""
+    grid = pd.date_range(t0, t1, freq="s")[:-1]
+    covered = np.zeros(len(grid), dtype=bool)
+    for start, end in zip(records["started_at"], records["finished_at"]):
+        covered |= (grid >= start) & (grid < end)
+    return covered.sum()
+
+
+class TestCoverageIndex:
+    def test_merge(self, overlapping_records):
+        """Test if overlapping and touching records are merged into one interval."""
+        index = CoverageIndex.from_records(overlapping_records)
+        intervals = index.intervals()
+        t = pd.Timestamp("2021-01-01 00:00:00", tz="utc")
+        assert intervals["user_id"].tolist() == [0, 0, 1]
+        assert (intervals["started_at"] == [t, t + pd.Timedelta("30h"), t + pd.Timedelta("1h")]).all()
+        assert (
+            intervals["finished_at"] == [t + pd.Timedelta("4h"), t + pd.Timedelta("31h"), t + pd.Timedelta("2h")]
+        ).all()
+
+    def test_tracked_duration(self, overlapping_records):
+        """Test the tracked time of windows overlapping intervals partially."""
+        index = CoverageIndex.from_records(overlapping_records)
+        t = pd.Timestamp("2021-01-01 00:00:00", tz="utc")
+        assert index.tracked_duration(0, t, t + pd.Timedelta("2d")) == 5 * 3600
+        assert index.tracked_duration(0, t + pd.Timedelta("3h30min"), t + pd.Timedelta("30h30min")) == 3600
+        assert index.tracked_duration(0, t - pd.Timedelta("1d"), t) == 0
+        assert index.tracked_fraction(1, t, t + pd.Timedelta("2h")) == 0.5
+        # scalar queries return scalars
+        assert isinstance(index.tracked_duration(1, t, t + pd.Timedelta("2h")), float)
+        assert isinstance(index.tracked_fraction(1, t, t + pd.Timedelta("2h")), float)
+        assert index.tracked_fraction([0, 1], t, t + pd.Timedelta("2h")).shape == (2,)
+        # unknown users and arrays of queries
+        t0 = pd.DatetimeIndex([t, t, t])
+        assert index.tracked_duration([0, 1, 5], t0, t0 + pd.Timedelta("1h")).tolist() == [3600, 0, 0]
+
+    def test_random_windows(self, sp_tpls_geolife_long):
+        """Test if the tracked time of random windows is the one of the union of the records."""
+        sp, tpls = sp_tpls_geolife_long
+        index = CoverageIndex.from_records(sp, tpls)
+        records = pd.concat([sp, tpls])
+        t_min, t_max = records["started_at"].min(), records["finished_at"].max()
+        rng = np.random.default_rng(0)
+        for _ in range(5):
+            user = rng.choice(records["user_id"].unique())
+            t0, t1 = sorted(t_min + (t_max - t_min) * rng.random(2))
+            t0, t1 = t0.floor("s"), t1.floor("s")
+            expected = _union_seconds(records[records["user_id"] == user], t0, t1)
+            assert index.tracked_duration(user, t0, t1) == expected
+
+    def test_quality_all(self, sp_tpls_geolife_long):
+        """Test if the quality over the whole period agrees with temporal_tracking_quality without overlaps."""
+        sp, _ = sp_tpls_geolife_long
+        index = CoverageIndex.from_records(sp)
+        quality = ti.analysis.tracking_quality.temporal_tracking_quality(sp, granularity="all")
+        intervals = index.intervals().groupby("user_id")
+        fraction = index.tracked_fraction(
+            quality["user_id"], intervals["started_at"].min(), intervals["finished_at"].max()
+        )
+        assert np.allclose(fraction, quality["quality"])
+
+    def test_by_bin(self, overlapping_records):
+        """Test if every day between the first and last record of a user is returned."""
+        index = CoverageIndex.from_records(overlapping_records)
+        daily = index.tracked_fraction_by_bin("D")
+        assert daily["user_id"].tolist() == [0, 0, 1]
+        assert np.allclose(daily["tracked_fraction"], [4 / 24, 1 / 24, 1 / 24])
+        hourly = index.tracked_fraction_by_bin("H")
+        assert len(hourly) == 31 + 1
+        assert hourly["tracked_fraction"].sum() == 6
+        with pytest.raises(AttributeError, match="freq 'W' is unknown"):
+            index.tracked_fraction_by_bin("W")
+
+    def test_gaps(self, overlapping_records):
+        """Test if the gaps between the intervals are returned."""
+        index = CoverageIndex.from_records(overlapping_records)
+        gaps = index.gaps()
+        assert gaps["user_id"].tolist() == [0]
+        assert (gaps["duration"] == pd.Timedelta("26h")).all()
+        assert len(index.gaps(min_duration=26 * 60)) == 0
+
+    def test_errors(self, overlapping_records):
+        """Test if missing columns and inconsistent offsets raise an error."""
+        with pytest.raises(KeyError, match="must have the columns"):
+            CoverageIndex.from_records(overlapping_records.drop(columns="user_id"))
+        with pytest.raises(ValueError, match="offsets must have exactly one entry more"):
+            CoverageIndex([0, 1], [0, 1], [0], [1])
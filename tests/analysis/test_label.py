@@ -5,7 +5,17 @@ import pandas as pd
 import pytest
 
 import trackintel as ti
-from trackintel.analysis.labelling import _check_categories
+from trackintel.analysis.labelling import _check_categories, calculate_tripleg_features
+from trackintel.geogr.coordinates import get_line_coordinates
+from trackintel.geogr.point_distances import haversine_dist
+
+
+@pytest.fixture
+def geolife_pfs_tpls():
+    """Read geolife_long and generate triplegs."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    pfs, sp = pfs.as_positionfixes.generate_staypoints(method="sliding", dist_threshold=25, time_threshold=5)
+    return pfs.as_positionfixes.generate_triplegs(sp)
 
 
 class TestCreate_activity_flag:
@@ -111,3 +121,88 @@ class TestPredict_transport_mode:
         with pytest.raises(ValueError):
             incorrect_dict = {10: "cat1", 5: "cat2", np.inf: "cat3"}
             tpls.as_triplegs.predict_transport_mode(method="simple-coarse", categories=incorrect_dict)
+
+    def test_categories_out_of_range(self):
+        """Test if speeds above all boundaries and undefined speeds get no mode."""
+        tpls_file = os.path.join("tests", "data", "triplegs_transport_mode_identification.csv")
+        tpls = ti.read_triplegs_csv(tpls_file, sep=";", index_col="id", crs="EPSG:4326")
+        tpls.loc[0, "finished_at"] = tpls.loc[0, "started_at"]
+        tpls_mode = tpls.as_triplegs.predict_transport_mode(categories={1: "slow", 10: "fast"})
+        assert tpls_mode["mode"].tolist() == [None, None, None]
+        tpls_mode = tpls.as_triplegs.predict_transport_mode(categories={np.inf: "any"})
+        assert tpls_mode["mode"].tolist() == [None, "any", "any"]
+
+    def test_simple_coarse_coordinates(self, geolife_pfs_tpls):
+        """Test if the extracted coordinates of the triplegs give the same modes."""
+        _, tpls = geolife_pfs_tpls
+        coordinates = get_line_coordinates(tpls)
+        tpls_mode = tpls.as_triplegs.predict_transport_mode(coordinates=coordinates)
+        pd.testing.assert_frame_equal(tpls_mode, tpls.as_triplegs.predict_transport_mode())
+
+    def test_features(self, geolife_pfs_tpls):
+        """Test if the features method classifies the 85th percentile of the positionfix speeds."""
+        pfs, tpls = geolife_pfs_tpls
+        categories = {2: "slow", np.inf: "fast"}
+        tpls_mode = tpls.as_triplegs.predict_transport_mode(method="features", positionfixes=pfs, categories=categories)
+        speed = calculate_tripleg_features(pfs, percentiles=[85])["speed_p85"]
+        assert tpls_mode["mode"].eq(np.where(speed < 2, "slow", "fast")).all()
+
+    def test_features_error(self, geolife_pfs_tpls):
+        """Test if the features method requires positionfixes with tripleg_id."""
+        pfs, tpls = geolife_pfs_tpls
+        with pytest.raises(AttributeError, match="requires positionfixes"):
+            tpls.as_triplegs.predict_transport_mode(method="features")
+        with pytest.raises(AttributeError, match="must include column"):
+            tpls.as_triplegs.predict_transport_mode(method="features", positionfixes=pfs.drop(columns="tripleg_id"))
+
+
+class TestCalculate_tripleg_features:
+    """Tests for calculate_tripleg_features() method."""
+
+    def test_features(self, geolife_pfs_tpls):
+        """Test if the features are the same as computed per tripleg."""
+        pfs, tpls = geolife_pfs_tpls
+        features = calculate_tripleg_features(pfs, percentiles=[50, 90], stop_speed=1)
+        assert features.index.equals(tpls.index.rename("tripleg_id"))
+        for tpl_id, tpl_pfs in pfs.dropna(subset=["tripleg_id"]).groupby("tripleg_id"):
+            tpl_pfs = tpl_pfs.sort_values("tracked_at")
+            x, y = tpl_pfs.geometry.x.values, tpl_pfs.geometry.y.values
+            dt = tpl_pfs["tracked_at"].diff().dt.total_seconds().values[1:]
+            dist = haversine_dist(x[:-1], y[:-1], x[1:], y[1:])[dt > 0]
+            dt = dt[dt > 0]
+            speed = dist / dt
+            acc = np.abs(np.diff(speed) / ((dt[1:] + dt[:-1]) / 2))
+            expected = [np.percentile(speed, 50), np.percentile(speed, 90), dist.sum() / dt.sum()]
+            expected += [acc.mean(), acc.std(), acc.max(), dt[speed < 1].sum() / dt.sum()]
+            assert np.allclose(features.loc[tpl_id], expected)
+
+    def test_coordinates(self, geolife_pfs_tpls):
+        """Test if the extracted coordinates of the positionfixes give the same features."""
+        pfs, _ = geolife_pfs_tpls
+        coordinates = get_line_coordinates(pfs)
+        features = calculate_tripleg_features(pfs, coordinates=coordinates)
+        pd.testing.assert_frame_equal(features, calculate_tripleg_features(pfs))
+        with pytest.raises(ValueError, match="one coordinate per positionfix"):
+            calculate_tripleg_features(pfs.iloc[1:], coordinates=coordinates)
+
+    def test_projected(self, geolife_pfs_tpls):
+        """Test if the features of projected positionfixes are close to the ones in WGS84."""
+        pfs, _ = geolife_pfs_tpls
+        features = calculate_tripleg_features(pfs)
+        features_utm = calculate_tripleg_features(ti.geogr.to_local_crs(pfs))
+        assert np.allclose(features["speed_mean"], features_utm["speed_mean"], rtol=1e-2)
+
+    def test_single_speed(self):
+        """Test if triplegs with one speed have no acceleration and triplegs with one timestamp are missing."""
+        pfs_file = os.path.join("tests", "data", "positionfixes.csv")
+        pfs = ti.read_positionfixes_csv(pfs_file, sep=";", index_col="id", crs="EPSG:4326")
+        pfs["tripleg_id"] = [0, 0, 1, 1, 1, 1]
+        # a tripleg with two positionfixes at the same time
+        pfs_same_time = pfs.iloc[[4, 5]].copy()
+        pfs_same_time["tripleg_id"] = 2
+        pfs_same_time["tracked_at"] = pfs_same_time["tracked_at"].iloc[0]
+        pfs = pd.concat([pfs, pfs_same_time], ignore_index=True)
+        features = calculate_tripleg_features(pfs)
+        assert 2 not in features.index
+        assert np.isnan(features.loc[0, "acceleration_mean"])
+        assert not np.isnan(features.loc[1, "acceleration_mean"])
@@ -9,13 +9,13 @@ from geopandas.testing import assert_geodataframe_equal
 from pandas.testing import assert_frame_equal, assert_index_equal
 from shapely.geometry import Point
 from trackintel.analysis.location_identification import (
-    _freq_assign,
-    _freq_transform,
-    _osna_label_timeframes,
+    _idxmax_per_user,
+    _osna_label_timeframes_array,
     freq_method,
     location_identifier,
     osna_method,
     pre_filter_locations,
+    pre_filter_statistics,
 )
 
 
@@ -114,6 +114,55 @@ class TestPre_Filter:
         f = pre_filter_locations(example_staypoints, **default_kwargs)
         assert_index_equal(f.index, example_staypoints.index)
 
+    def test_missing_location(self, example_staypoints, default_kwargs):
+        """Test if staypoints without location are filtered out."""
+        example_staypoints.loc[example_staypoints.index[0], "location_id"] = np.nan
+        f = pre_filter_locations(example_staypoints, **default_kwargs)
+        assert f.tolist() == [False, True, True, True]
+
+    def test_statistics(self, example_staypoints, default_kwargs):
+        """Test if precomputed statistics give the same filter."""
+        default_kwargs["thresh_sp_at_loc"] = 2
+        statistics = pre_filter_statistics(example_staypoints, agg_level="dataset")
+        f = pre_filter_locations(example_staypoints, statistics=statistics, **default_kwargs)
+        assert f.equals(pre_filter_locations(example_staypoints, **default_kwargs))
+
+    @pytest.mark.parametrize("agg_level", ["user", "dataset"])
+    def test_statistics_other_staypoints(self, example_staypoints, default_kwargs, agg_level):
+        """Test if statistics of other staypoints are matched by user and location id."""
+        default_kwargs.update(agg_level=agg_level, thresh_sp_at_loc=2)
+        statistics = pre_filter_statistics(example_staypoints, agg_level=agg_level)
+        # only location 0 of user 0 (or of the dataset) has two staypoints
+        sp = example_staypoints.iloc[[2, 3]]
+        f = pre_filter_locations(sp, statistics=statistics, **default_kwargs)
+        assert f.tolist() == [False, agg_level == "dataset"]
+        # locations without statistics are filtered out
+        sp = example_staypoints.assign(location_id=example_staypoints["location_id"] + 5)
+        f = pre_filter_locations(sp, statistics=statistics, **default_kwargs)
+        assert not f.any()
+
+
+class TestPre_Filter_Statistics:
+    """Tests for the function `pre_filter_statistics()`."""
+
+    def test_user(self, example_staypoints):
+        """Test the number of staypoints and locations per user."""
+        user, _ = pre_filter_statistics(example_staypoints)
+        assert user["n_staypoints"].tolist() == [3, 1]
+        assert user["n_locations"].tolist() == [2, 1]
+
+    def test_location(self, example_staypoints):
+        """Test the statistics per location for both aggregation levels."""
+        _, loc = pre_filter_statistics(example_staypoints, agg_level="user")
+        assert loc.index.tolist() == [(0, 0), (0, 1), (1, 0)]
+        assert loc["n_staypoints"].tolist() == [2, 1, 1]
+        assert loc.loc[(0, 0), "duration"] == pd.Timedelta("7h")
+        assert loc.loc[(0, 1), "period"] == pd.Timedelta("40h")
+
+        _, loc = pre_filter_statistics(example_staypoints, agg_level="dataset")
+        assert loc["n_staypoints"].tolist() == [3, 1]
+        assert loc.loc[0, "period"] == pd.Timedelta("48h")
+
 
 @pytest.fixture
 def example_freq():
@@ -182,40 +231,38 @@ class TestFreq_method:
         assert freq["purpose"].count() == example_freq["purpose"].count()
         assert_geodataframe_equal(example_freq, freq)
 
-
-class Test_Freq_Transform:
-    """Test help function _freq_transform."""
-
-    def test_function(self):
-        """Test if groupby assign works."""
+    def test_multiple_users(self):
+        """Test if the labels are assigned per user and ties are broken by the order of the location_id."""
         list_dict = [
-            {"location_id": 0, "duration": 1},
-            {"location_id": 0, "duration": 1},
-            {"location_id": 1, "duration": 1},
+            {"user_id": 0, "location_id": 1, "duration": 3},
+            {"user_id": 1, "location_id": 0, "duration": 2},
+            {"user_id": 0, "location_id": 0, "duration": 1},
+            {"user_id": 1, "location_id": 1, "duration": 2},
+            {"user_id": 0, "location_id": 2, "duration": 1},
+            {"user_id": 0, "location_id": 2, "duration": 1},
+            {"user_id": 1, "location_id": 2, "duration": 1},
         ]
-        df = pd.DataFrame(list_dict)
-        freq = _freq_transform(df, "work")
-        sol = pd.Series(["work", "work", None])
-        assert freq.equals(sol)
-
-
-class Test_Freq_Assign:
-    """Test help function _freq_assign."""
-
-    def test_function(self):
-        """Test function with simple input."""
-        dur = pd.Series([9, 0, 8, 1, 7, 6, 5])
-        labels = ("label1", "label2", "label3")
-        freq_sol = np.array([labels[0], None, labels[1], None, labels[2], None, None])
-        freq = _freq_assign(dur, *labels)
-        assert all(freq == freq_sol)
-
-    def test_more_labels_than_entries(self):
-        dur = pd.Series([9, 0])
-        labels = ("label1", "label2", "label3")
-        freq_sol = np.array([labels[0], labels[1]])
-        freq = _freq_assign(dur, *labels)
-        assert all(freq == freq_sol)
+        sp = pd.DataFrame(list_dict)
+        freq = freq_method(sp)
+        sol = pd.Series(["home", "home", None, "work", "work", "work", None], name="purpose")
+        assert freq["purpose"].equals(sol)
+
+    def test_ties(self):
+        """Test if locations with the same duration are labelled in the order of their location_id."""
+        # more locations than sorted by insertion sort, the order of the rows differs from the location_id
+        location_id = np.random.default_rng(0).permutation(40)
+        sp = pd.DataFrame({"user_id": 0, "location_id": location_id, "duration": 1})
+        sp.loc[sp["location_id"] == 39, "duration"] = 2
+        freq = freq_method(sp, "home", "work", "leisure")
+        purpose = freq.set_index("location_id")["purpose"]
+        assert purpose[[39, 0, 1]].tolist() == ["home", "work", "leisure"]
+        assert purpose.drop([39, 0, 1]).isna().all()
+
+    def test_more_labels_than_locations(self):
+        """Test if all locations are labelled if more labels than locations are given."""
+        sp = pd.DataFrame({"user_id": 0, "location_id": [0, 1], "duration": [1, 2]})
+        freq = freq_method(sp, "label1", "label2", "label3")
+        assert freq["purpose"].tolist() == ["label2", "label1"]
 
 
 class TestLocation_Identifier:
@@ -445,29 +492,42 @@ class TestOsna_Method:
         assert_frame_equal(sp, result)
 
 
-class Test_osna_label_timeframes:
-    """Test for the _osna_label_timeframes() function."""
+class Test_osna_label_timeframes_array:
+    """Test for the _osna_label_timeframes_array() function."""
 
     def test_weekend(self):
         """Test if weekend only depends on day and not time."""
-        t1 = pd.Timestamp("2021-05-22 01:00:00")
-        t2 = pd.Timestamp("2021-05-22 07:00:00")
-        t3 = pd.Timestamp("2021-05-22 08:00:00")
-        t4 = pd.Timestamp("2021-05-22 20:00:00")
-        assert _osna_label_timeframes(t1) == "weekend"
-        assert _osna_label_timeframes(t2) == "weekend"
-        assert _osna_label_timeframes(t3) == "weekend"
-        assert _osna_label_timeframes(t4) == "weekend"
+        t = pd.Series(pd.to_datetime(["2021-05-22 01:00", "2021-05-22 07:00", "2021-05-22 08:00", "2021-05-22 20:00"]))
+        assert list(_osna_label_timeframes_array(t)) == ["weekend"] * 4
 
     def test_weekday(self):
         """Test the different labels on a weekday."""
-        t1 = pd.Timestamp("2021-05-20 01:00:00")
-        t2 = pd.Timestamp("2021-05-20 02:00:00")
-        t3 = pd.Timestamp("2021-05-20 08:00:00")
-        t4 = pd.Timestamp("2021-05-20 19:00:00")
-        t5 = pd.Timestamp("2021-05-20 18:59:59")
-        assert _osna_label_timeframes(t1) == "leisure"
-        assert _osna_label_timeframes(t2) == "rest"
-        assert _osna_label_timeframes(t3) == "work"
-        assert _osna_label_timeframes(t4) == "leisure"
-        assert _osna_label_timeframes(t5) == "work"
+        t = pd.Series(
+            pd.to_datetime(
+                [
+                    "2021-05-20 01:00:00",
+                    "2021-05-20 02:00:00",
+                    "2021-05-20 08:00:00",
+                    "2021-05-20 19:00:00",
+                    "2021-05-20 18:59:59",
+                ]
+            )
+        )
+        assert list(_osna_label_timeframes_array(t)) == ["leisure", "rest", "work", "leisure", "work"]
+
+    def test_timezone(self):
+        """Test if the labels are assigned by the local time of timezone aware timestamps."""
+        t = pd.Series(pd.to_datetime(["2021-05-20 06:30:00", "2021-05-22 06:30:00"]).tz_localize("UTC"))
+        labels = _osna_label_timeframes_array(t.dt.tz_convert("Europe/Zurich"))
+        assert list(labels) == ["work", "weekend"]
+
+
+class Test_idxmax_per_user:
+    """Test for the _idxmax_per_user() function."""
+
+    def test_groupby_idxmax(self):
+        """Test if the result is equal to the one of groupby.idxmax with ties and NaN values."""
+        index = pd.MultiIndex.from_tuples([(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (2, 0)], names=["user_id", "loc"])
+        values = pd.Series([1.0, 3.0, 3.0, np.nan, 2.0, np.nan], index=index)
+        result = _idxmax_per_user(values)
+        assert result.to_dict() == {0: (0, 1), 1: (1, 1)}
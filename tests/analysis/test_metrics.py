@@ -0,0 +1,156 @@
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point
+
+import trackintel as ti
+from trackintel.analysis.metrics import (
+    _real_entropy,
+    jump_lengths,
+    location_entropy,
+    mobility_metrics,
+    radius_of_gyration,
+    unique_locations,
+    visitation_frequency,
+)
+
+
+@pytest.fixture
+def example_staypoints():
+    """Staypoints of two users in a planar crs, user 0 alternates between two locations 10m apart."""
+    t = pd.Timestamp("2021-05-17 08:00:00", tz="utc")
+    one_day = pd.Timedelta("1d")
+    list_dict = [
+        {"user_id": 0, "started_at": t, "location_id": 0, "geometry": Point(0, 0)},
+        {"user_id": 0, "started_at": t + one_day, "location_id": 1, "geometry": Point(10, 0)},
+        {"user_id": 0, "started_at": t + 2 * one_day, "location_id": 0, "geometry": Point(0, 0)},
+        {"user_id": 0, "started_at": t + 8 * one_day, "location_id": 1, "geometry": Point(10, 0)},
+        {"user_id": 1, "started_at": t, "location_id": 2, "geometry": Point(0, 0)},
+        {"user_id": 1, "started_at": t + one_day, "location_id": 2, "geometry": Point(0, 0)},
+    ]
+    sp = gpd.GeoDataFrame(data=list_dict, geometry="geometry", crs="EPSG:2056")
+    sp["finished_at"] = sp["started_at"] + pd.Timedelta("1h")
+    sp.index.name = "id"
+    return sp
+
+
+@pytest.fixture
+def geolife_staypoints():
+    """Read geolife data and generate staypoints with locations."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    pfs, sp = pfs.as_positionfixes.generate_staypoints(method="sliding", dist_threshold=25, time_threshold=5)
+    sp, _ = sp.as_staypoints.generate_locations(method="dbscan", epsilon=50, num_samples=1)
+    return sp
+
+
+class TestMobilityMetrics:
+    """Tests for the mobility_metrics() function."""
+
+    def test_planar(self, example_staypoints):
+        """Test the metrics on a simple example."""
+        metrics = mobility_metrics(example_staypoints)
+        assert metrics.index.tolist() == [0, 1]
+        assert metrics.loc[0, "radius_of_gyration"] == 5
+        assert metrics.loc[1, "radius_of_gyration"] == 0
+        assert metrics.loc[0, "jump_length"] == 10
+        assert metrics.loc[1, "jump_length"] == 0
+        assert metrics["n_locations"].tolist() == [2, 1]
+        assert metrics["random_entropy"].tolist() == [1, 0]
+        assert metrics["uncorrelated_entropy"].tolist() == [1, 0]
+
+    def test_freq(self, example_staypoints):
+        """Test if the metrics are calculated per time window."""
+        metrics = mobility_metrics(example_staypoints, ["n_locations", "jump_length"], freq="W-SUN")
+        assert metrics.index.names == ["user_id", "timestamp"]
+        assert metrics["n_locations"].tolist() == [2, 1, 1]
+        # the jump into the second week belongs to the second week
+        assert metrics["jump_length"].tolist() == [10, 10, 0]
+
+    def test_groupby(self, geolife_staypoints):
+        """Test if the geographic metrics are equal to a calculation per user."""
+        metrics = mobility_metrics(geolife_staypoints, chunk_size=10, n_jobs=2)
+        sp = geolife_staypoints.sort_values(["user_id", "started_at"])
+        for user_id, group in sp.groupby("user_id"):
+            x, y = group.geometry.x.to_numpy(), group.geometry.y.to_numpy()
+            d = ti.geogr.point_distances.haversine_dist(x, y, np.full_like(x, x.mean()), np.full_like(y, y.mean()))
+            assert np.isclose(metrics.loc[user_id, "radius_of_gyration"], np.sqrt(np.mean(d**2)))
+            p = group["location_id"].value_counts(normalize=True).to_numpy(dtype=float)
+            assert np.isclose(metrics.loc[user_id, "uncorrelated_entropy"], -(p * np.log2(p)).sum())
+            sequence = group["location_id"].dropna().tolist()
+            assert np.isclose(metrics.loc[user_id, "real_entropy"], _real_entropy(sequence))
+
+    def test_error(self, example_staypoints):
+        """Test if unknown metrics and missing locations raise an error."""
+        with pytest.raises(AttributeError, match="metric 'speed' is unknown"):
+            mobility_metrics(example_staypoints, ["speed"])
+        with pytest.raises(KeyError, match="location_id"):
+            mobility_metrics(example_staypoints.drop(columns="location_id"), ["n_locations"])
+        assert len(mobility_metrics(example_staypoints.drop(columns="location_id"), ["radius_of_gyration"])) == 2
+
+
+class TestSingleMetrics:
+    """Tests for the functions of single metrics."""
+
+    def test_equal(self, example_staypoints):
+        """Test if the single metrics are equal to the columns of mobility_metrics."""
+        metrics = mobility_metrics(example_staypoints)
+        assert radius_of_gyration(example_staypoints).equals(metrics["radius_of_gyration"])
+        assert unique_locations(example_staypoints).equals(metrics["n_locations"])
+        for method in ["random", "uncorrelated", "real"]:
+            entropy = location_entropy(example_staypoints, method=method)
+            assert entropy.equals(metrics[f"{method}_entropy"])
+
+    def test_entropy_error(self, example_staypoints):
+        """Test if an unknown entropy method raises an error."""
+        with pytest.raises(AttributeError, match="method 'shannon' is unknown"):
+            location_entropy(example_staypoints, method="shannon")
+
+    def test_jump_lengths(self, example_staypoints):
+        """Test if the jump lengths are aligned with unsorted staypoints."""
+        sp = example_staypoints.iloc[::-1]
+        jumps = jump_lengths(sp)
+        assert jumps.index.equals(sp.index)
+        assert jumps.iloc[::-1].tolist()[1:4] == [10, 10, 10]
+        assert np.isnan(jumps.loc[0]) and np.isnan(jumps.loc[4])
+
+    def test_visitation_frequency(self, example_staypoints):
+        """Test the visits, frequency and rank of the locations."""
+        visits = visitation_frequency(example_staypoints)
+        assert visits.index.tolist() == [(0, 0), (0, 1), (1, 2)]
+        assert visits["n_visits"].tolist() == [2, 2, 2]
+        assert visits["frequency"].tolist() == [0.5, 0.5, 1]
+        assert visits["rank"].tolist() == [1, 2, 1]
+
+
+class TestRealEntropy:
+    """Tests for the _real_entropy() function."""
+
+    def _brute_force(self, sequence):
+        """Search the shortest new substring of every position in its prefix."""
+        n, sum_lambda = len(sequence), 0
+        for i in range(n):
+            k = 1
+            while i + k <= n and any(sequence[j : j + k] == sequence[i : i + k] for j in range(i - k + 1)):
+                k += 1
+            sum_lambda += k
+        return n * np.log2(n) / sum_lambda
+
+    def test_brute_force(self):
+        """Test if the suffix automaton gives the same result as the brute force search."""
+        rng = np.random.default_rng(0)
+        for _ in range(200):
+            sequence = rng.integers(0, rng.integers(1, 5), rng.integers(1, 30)).tolist()
+            assert np.isclose(_real_entropy(sequence), self._brute_force(sequence))
+
+    def test_periodic(self):
+        """Test if the entropy of a periodic sequence tends to zero."""
+        assert _real_entropy([0, 1, 2] * 1000) < 0.05
+        assert _real_entropy([0, 1, 2] * 1000) < _real_entropy([0, 1, 2] * 100)
+
+    def test_short(self):
+        """Test empty sequences and sequences of length one."""
+        assert np.isnan(_real_entropy([]))
+        assert _real_entropy([4]) == 0
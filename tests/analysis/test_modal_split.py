@@ -8,7 +8,8 @@ from pandas.testing import assert_series_equal
 import pytest
 from shapely.geometry import LineString
 
-from trackintel.analysis.modal_split import _calculate_length, calculate_modal_split
+from trackintel.analysis.modal_split import _calculate_length, _get_time_bins, calculate_modal_split
+from trackintel.geogr.coordinates import get_line_coordinates
 from trackintel.geogr.distances import calculate_haversine_length
 from trackintel.io.dataset_reader import read_geolife, geolife_add_modes_to_triplegs
 
@@ -158,6 +159,8 @@ class TestModalSplit:
         assert modal_split.iloc[0].loc["bike"] == 1
         assert modal_split.iloc[0].loc["car"] == 1
         assert modal_split.iloc[0].loc["walk"] == 4
+        # counts are integers
+        assert (modal_split.dtypes == "int64").all()
 
     def test_modal_split_total_distance(self, test_triplegs_modal_split):
         """Check distances per user and mode without temporal binning"""
@@ -213,6 +216,42 @@ class TestModalSplit:
         with pytest.raises(AttributeError, match=error_msg):
             calculate_modal_split(test_triplegs_modal_split, metric=metric)
 
+    def test_groupby(self, read_geolife_with_modes):
+        """Check if the weekly modal split per user is equal to a groupby with a pd.Grouper."""
+        tpls = read_geolife_with_modes.sample(frac=1, random_state=0)  # unsorted input
+        tpls["duration"] = (tpls["finished_at"] - tpls["started_at"]).dt.total_seconds()
+        modal_split = calculate_modal_split(tpls, metric="duration", freq="W-MON", per_user=True)
+
+        tpls = tpls.set_index("started_at")
+        group = ["user_id", pd.Grouper(freq="W-MON"), "mode"]
+        expected = tpls.groupby(group)["duration"].sum().unstack(fill_value=0)
+        expected.index.names = ["user_id", "timestamp"]
+        assert modal_split.index.is_monotonic_increasing
+        pd.testing.assert_frame_equal(modal_split, expected, check_freq=False)
+
+    def test_input_unchanged(self, test_triplegs_modal_split):
+        """Check if the triplegs are not changed."""
+        tpls = test_triplegs_modal_split.copy()
+        calculate_modal_split(tpls, metric="distance", freq="D", per_user=True)
+        pd.testing.assert_frame_equal(tpls, test_triplegs_modal_split)
+
+
+class Test_get_time_bins:
+    """Test help function _get_time_bins"""
+
+    @pytest.mark.parametrize("freq", ["D", "6H", "W-MON", "W-SUN", "MS", "M", "Q"])
+    def test_grouper(self, freq):
+        """Check if the timestamps are assigned to the same bins as with pd.Grouper."""
+        rng = np.random.default_rng(0)
+        seconds = rng.integers(0, 3600 * 24 * 365, 500)
+        started_at = pd.Series(pd.Timestamp("2021-01-01", tz="Europe/Zurich") + pd.to_timedelta(seconds, unit="s"))
+        codes, bins = _get_time_bins(started_at, freq)
+
+        s = pd.Series(0, index=pd.DatetimeIndex(started_at))
+        expected = s.groupby(pd.Grouper(freq=freq)).apply(lambda x: x.index)
+        for label, timestamps in expected.items():
+            assert np.array_equal(np.sort(started_at[bins[codes] == label]), np.sort(timestamps))
+
 
 class Test_calculate_length:
     """Test help function calculate_length"""
@@ -227,3 +266,9 @@ class Test_calculate_length:
         """Test haversine length calculation."""
         res = pd.Series(calculate_haversine_length(test_triplegs_modal_split))
         assert_series_equal(res, _calculate_length(test_triplegs_modal_split))
+
+    def test_coordinates(self, test_triplegs_modal_split):
+        """Test if the extracted coordinates give the same length."""
+        coordinates = get_line_coordinates(test_triplegs_modal_split)
+        res = _calculate_length(test_triplegs_modal_split, coordinates)
+        assert np.array_equal(res, _calculate_length(test_triplegs_modal_split))
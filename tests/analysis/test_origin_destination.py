@@ -0,0 +1,93 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import Point, box
+
+import trackintel as ti
+from trackintel.analysis.origin_destination import od_matrix
+
+
+@pytest.fixture
+def example_od():
+    """Staypoints at three locations in two zones and trips between them."""
+    list_dict = [
+        {"location_id": 0, "geometry": Point(0.5, 0.5)},
+        {"location_id": 1, "geometry": Point(0.6, 0.6)},
+        {"location_id": 2, "geometry": Point(1.5, 0.5)},
+        {"location_id": np.nan, "geometry": Point(5, 5)},
+    ]
+    sp = gpd.GeoDataFrame(list_dict, geometry="geometry", crs="EPSG:2056", index=[10, 11, 12, 13])
+    sp.index.name = "id"
+    zones = gpd.GeoDataFrame(
+        {"name": ["left", "right"]}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)], crs="EPSG:2056", index=[7, 8]
+    )
+
+    t = pd.Timestamp("2021-05-17 08:00:00", tz="utc")
+    list_dict = [
+        {"started_at": t, "origin_staypoint_id": 10, "destination_staypoint_id": 12},
+        {"started_at": t, "origin_staypoint_id": 11, "destination_staypoint_id": 12},
+        {"started_at": t + pd.Timedelta("7d"), "origin_staypoint_id": 12, "destination_staypoint_id": 10},
+        {"started_at": t + pd.Timedelta("7d"), "origin_staypoint_id": 10, "destination_staypoint_id": 12},
+        {"started_at": t, "origin_staypoint_id": 10, "destination_staypoint_id": 13},  # no location or zone
+        {"started_at": t, "origin_staypoint_id": np.nan, "destination_staypoint_id": 12},  # unknown origin
+    ]
+    trips = pd.DataFrame(list_dict)
+    return trips, sp, zones
+
+
+class TestOdMatrix:
+    """Tests for the od_matrix() function."""
+
+    def test_locations(self, example_od):
+        """Test if trips are aggregated between the locations of the staypoints."""
+        trips, sp, _ = example_od
+        od = od_matrix(trips, sp)
+        assert od.columns.tolist() == ["origin", "destination", "count"]
+        assert od.values.tolist() == [[0, 2, 2], [1, 2, 1], [2, 0, 1]]
+
+    def test_zones(self, example_od):
+        """Test if the staypoints are assigned to the zones."""
+        trips, sp, zones = example_od
+        od = od_matrix(trips, sp, zones=zones.to_crs("EPSG:4326"))
+        assert od.values.tolist() == [[7, 8, 3], [8, 7, 1]]
+
+    def test_freq(self, example_od):
+        """Test if the trips are aggregated per time window."""
+        trips, sp, _ = example_od
+        od = od_matrix(trips, sp, freq="W-SUN")
+        assert od.columns.tolist() == ["origin", "destination", "timestamp", "count"]
+        assert od["timestamp"].dt.day.tolist() == [23, 23, 30, 30]
+        assert od["count"].tolist() == [1, 1, 1, 1]
+
+    def test_chunks(self, example_od):
+        """Test if chunked processing and an iterable of trips give the same result."""
+        trips, sp, _ = example_od
+        od = od_matrix(trips, sp, freq="D")
+        assert od.equals(od_matrix(trips, sp, freq="D", chunk_size=2))
+        assert od.equals(od_matrix([trips.iloc[:3], trips.iloc[3:]], sp, freq="D"))
+
+    def test_sparse(self, example_od):
+        """Test the sparse return type."""
+        trips, sp, zones = example_od
+        ids, matrix = od_matrix(trips, sp, zones=zones, return_type="sparse")
+        assert ids.tolist() == [7, 8]
+        assert np.array_equal(matrix.toarray(), [[0, 3], [1, 0]])
+
+        ids, matrices = od_matrix(trips, sp, freq="W-SUN", return_type="sparse")
+        assert ids.tolist() == [0, 1, 2]
+        assert len(matrices) == 2
+        assert sum(m.sum() for m in matrices.values()) == 4
+
+    def test_accessor(self, example_od):
+        """Test if the function is available in the analysis module."""
+        trips, sp, _ = example_od
+        assert ti.analysis.od_matrix(trips, sp).equals(od_matrix(trips, sp))
+
+    def test_error(self, example_od):
+        """Test if missing locations or an unknown return_type raise an error."""
+        trips, sp, _ = example_od
+        with pytest.raises(KeyError, match="location_id"):
+            od_matrix(trips, sp.drop(columns="location_id"))
+        with pytest.raises(AttributeError, match="return_type 'dense' is unknown"):
+            od_matrix(trips, sp, return_type="dense")
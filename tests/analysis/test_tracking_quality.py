@@ -1,13 +1,14 @@
 import os
 import datetime
 
+import numpy as np
 import pytest
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Point
 
 import trackintel as ti
-from trackintel.analysis.tracking_quality import _get_times
+from trackintel.analysis.tracking_quality import _split_into_bins
 
 
 @pytest.fixture
@@ -184,16 +185,6 @@ class TestTemporal_tracking_quality:
         with pytest.raises(KeyError):
             ti.analysis.tracking_quality.temporal_tracking_quality(locs)
 
-    def test_tracking_quality_user_error(self, testdata_sp_tpls_geolife_long):
-        """Test if the an error is raised when passing unknown 'granularity' to _get_tracking_quality_user()."""
-        sp_tpls = testdata_sp_tpls_geolife_long
-        user_0 = sp_tpls.loc[sp_tpls["user_id"] == 0]
-
-        with pytest.raises(AttributeError):
-            ti.analysis.tracking_quality._get_tracking_quality_user(user_0, granularity=12345)
-        with pytest.raises(AttributeError):
-            ti.analysis.tracking_quality._get_tracking_quality_user(user_0, granularity="random")
-
     def test_staypoints_accessors(self, testdata_all_geolife_long):
         """Test tracking_quality calculation from staypoints accessor."""
         sp, _, _ = testdata_all_geolife_long
@@ -263,6 +254,29 @@ class TestTemporal_tracking_quality:
             # get the "quality" of the last record and compare to the correct_quality
             assert quality.values[-1][-1] == correct_quality
 
+    def test_timezone(self):
+        """Test if days and hours are the ones of the local time of the records."""
+        t = pd.Timestamp("2022-01-01 23:30:00", tz="Asia/Kolkata")
+        sp = get_test_sp(t, pd.Timedelta("1h"))
+
+        quality = ti.analysis.tracking_quality.temporal_tracking_quality(sp, granularity="day")
+        assert (quality["day"] == pd.to_datetime(["2022-01-01", "2022-01-02"]).tz_localize("Asia/Kolkata")).all()
+        assert (quality["quality"] == 1 / 48).all()
+        quality = ti.analysis.tracking_quality.temporal_tracking_quality(sp, granularity="hour")
+        assert quality["hour"].tolist() == [0, 23]
+
+    def test_daylight_saving_time(self):
+        """Test if records over a change of daylight saving time keep their duration."""
+        t = pd.Timestamp("2021-10-30 20:00:00", tz="Europe/Zurich")
+        sp = get_test_sp(t, pd.Timedelta("12h"))
+
+        quality = ti.analysis.tracking_quality.temporal_tracking_quality(sp, granularity="hour")
+        # the hour from 2 to 3 o'clock occurs twice
+        assert quality.loc[quality["hour"] == 2, "quality"].values[0] == 2
+        assert quality["quality"].sum() == 12
+        splitted = ti.analysis.tracking_quality._split_overlaps(sp.iloc[[2]], granularity="day")
+        assert (splitted["finished_at"] - splitted["started_at"]).sum() == pd.Timedelta("12h")
+
 
 class TestSplit_overlaps:
     """Tests for the _split_overlaps() function."""
@@ -357,8 +371,8 @@ class TestSplit_overlaps:
         assert (sp_res["finished_at"] == [midnight, end, midnight, end, midnight]).all()
 
 
-class TestGet_times:
-    """Test if _get_times splits correctly"""
+class Test_split_into_bins:
+    """Test if _split_into_bins splits correctly"""
 
     def test_midnight_ns(self):
         """Test datetimes 1 ns around midnight."""
@@ -371,7 +385,16 @@ class TestGet_times:
         time2 = midnight
         time3 = midnight + pd.Timedelta("1h")
         time4 = time3 + pd.Timestamp.resolution
-        times = [time1, time2, time3, time4]
-        result = (times[:-1], times[1:])
-        row = pd.Series({"index": 0, "started_at": times[0], "finished_at": times[-1]})
-        assert _get_times(row, freq="H") == result
+        times = pd.Series([time1, time2, time3, time4])
+        record, time_bin, piece_start, piece_end = _split_into_bins(times.iloc[[0]], times.iloc[[-1]], freq="H")
+        assert (record == 0).all()
+        assert (np.diff(time_bin) == 1).all()
+        assert (piece_start == times.iloc[:-1].to_numpy(dtype="datetime64[ns]").view("int64")).all()
+        assert (piece_end == times.iloc[1:].to_numpy(dtype="datetime64[ns]").view("int64")).all()
+
+    def test_empty_range(self):
+        """Test if a range with the same start and end is kept as one piece."""
+        start = pd.Series([pd.Timestamp("2022-03-18 10:00:00", tz="utc")])
+        record, _, piece_start, piece_end = _split_into_bins(start, start, freq="D")
+        assert record.tolist() == [0]
+        assert piece_start.tolist() == piece_end.tolist() == [start[0].value]
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from trackintel.analysis.transitions import LocationTransitions
+
+
+@pytest.fixture
+def example_trips():
+    """Trips of two users between the locations 10 (home), 20 (work) and 30 (gym)."""
+    staypoints = pd.DataFrame({"location_id": [10, 20, 30, 10, 20, np.nan]}, index=[0, 1, 2, 3, 4, 5])
+    staypoints.index.name = "id"
+    t = pd.Timestamp("2021-05-17 07:00:00", tz="Europe/Zurich")
+    # user 0: home -> work -> home -> work -> gym -> home, user 1: home -> work -> (unknown)
+    list_dict = [
+        {"user_id": 0, "started_at": t, "origin_staypoint_id": 0, "destination_staypoint_id": 1},
+        {"user_id": 0, "started_at": t + pd.Timedelta("10h"), "origin_staypoint_id": 1, "destination_staypoint_id": 0},
+        {"user_id": 0, "started_at": t + pd.Timedelta("1d"), "origin_staypoint_id": 0, "destination_staypoint_id": 1},
+        {"user_id": 0, "started_at": t + pd.Timedelta("34h"), "origin_staypoint_id": 1, "destination_staypoint_id": 2},
+        {"user_id": 0, "started_at": t + pd.Timedelta("36h"), "origin_staypoint_id": 2, "destination_staypoint_id": 3},
+        {"user_id": 1, "started_at": t, "origin_staypoint_id": 3, "destination_staypoint_id": 4},
+        {"user_id": 1, "started_at": t + pd.Timedelta("10h"), "origin_staypoint_id": 4, "destination_staypoint_id": 5},
+    ]
+    trips = pd.DataFrame(list_dict).sample(frac=1, random_state=0)  # unsorted
+    trips.index.name = "id"
+    return trips, staypoints
+
+
+class TestFromTrips:
+    """Tests for LocationTransitions.from_trips()."""
+
+    def test_global(self, example_trips):
+        """Test the counts of a first order model over all users."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints)
+        assert model.locations.tolist() == [10, 20, 30]
+        assert model.contexts.tolist() == [(10,), (20,), (30,)]
+        assert np.array_equal(model.counts.toarray(), [[0, 3, 0], [1, 0, 1], [1, 0, 0]])
+        assert np.allclose(model.probabilities().toarray(), [[0, 1, 0], [0.5, 0, 0.5], [1, 0, 0]])
+
+    def test_order(self, example_trips):
+        """Test if the context contains the origins of the last trips of the same user."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints, order=2)
+        assert model.contexts.names == ["location_1", "location_2"]
+        assert model.contexts.tolist() == [(10, 20), (20, 10), (20, 30)]
+        assert np.array_equal(model.counts.toarray(), [[1, 0, 1], [0, 1, 0], [1, 0, 0]])
+
+    def test_per_user_time_bins(self, example_trips):
+        """Test if the transitions are counted per user and bin of the local time of day."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints, per_user=True, time_bins=2)
+        assert model.contexts.names == ["user_id", "location_1", "time_bin"]
+        assert model.contexts.tolist() == [(0, 10, 0), (0, 20, 1), (0, 30, 1), (1, 10, 0)]
+        assert np.array_equal(model.counts.toarray(), [[0, 2, 0], [1, 0, 1], [1, 0, 0], [0, 1, 0]])
+
+        contexts, matrix = model.get_matrix(user_id=1, normalize=False)
+        assert contexts.tolist() == [(1, 10, 0)]
+        assert np.array_equal(matrix.toarray(), [[0, 1, 0]])
+
+    def test_error(self, example_trips):
+        """Test if a missing location_id or a wrong order raise an error."""
+        trips, staypoints = example_trips
+        with pytest.raises(KeyError, match="location_id"):
+            LocationTransitions.from_trips(trips, staypoints.rename(columns={"location_id": "loc"}))
+        with pytest.raises(ValueError, match="order must be at least 1"):
+            LocationTransitions.from_trips(trips, staypoints, order=0)
+
+
+class TestPredictNext:
+    """Tests for LocationTransitions.predict_next()."""
+
+    def test_global(self, example_trips):
+        """Test if the k most likely locations are predicted and unknown contexts are NaN."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints)
+        pred = model.predict_next([20, 10, 40], k=2)
+        assert pred.columns.tolist() == ["next_location_1", "next_location_2", "probability_1", "probability_2"]
+        assert pred["next_location_1"].tolist()[:2] == [10, 20]
+        assert pred["probability_1"].tolist()[:2] == [0.5, 1]
+        assert pred.loc[0, "next_location_2"] == 30
+        assert pred.iloc[1:, [1, 3]].isna().all(axis=None)
+        assert pred.iloc[2].isna().all()
+
+    def test_per_user_order(self, example_trips):
+        """Test predictions with the user and the last two locations."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints, order=2, per_user=True)
+        pred = model.predict_next([[20, 10], [10, 20]], user_id=0)
+        assert pred["next_location_1"].tolist() == [20, 10]
+        assert pred["probability_1"].tolist() == [1, 0.5]
+
+    def test_time(self, example_trips):
+        """Test if the time of the queries is binned like the trips."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints, time_bins=2)
+        time = pd.to_datetime(["2021-06-01 08:00:00+02:00", "2021-06-01 20:00:00+02:00"])
+        pred = model.predict_next([10, 10], time=time)
+        assert pred["next_location_1"].iloc[0] == 20
+        assert np.isnan(pred["next_location_1"].iloc[1])
+
+    def test_error(self, example_trips):
+        """Test if missing arguments raise an error."""
+        trips, staypoints = example_trips
+        model = LocationTransitions.from_trips(trips, staypoints, order=2, per_user=True, time_bins=2)
+        with pytest.raises(ValueError, match="last 2 locations"):
+            model.predict_next([10], user_id=0)
+        with pytest.raises(ValueError, match="user_id is required"):
+            model.predict_next([[10, 20]])
+        with pytest.raises(ValueError, match="time is required"):
+            model.predict_next([[10, 20]], user_id=0)
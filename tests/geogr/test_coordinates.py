@@ -0,0 +1,39 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+from shapely.geometry import LineString, MultiLineString
+
+from trackintel.geogr.coordinates import get_line_coordinates
+
+
+@pytest.fixture
+def lines():
+    """Construct a GeoSeries with a LineString, a MultiLineString and an empty LineString."""
+    ls_1 = LineString([(0, 0), (1, 0), (1, 1)])
+    ls_2 = LineString([(5, 5), (6, 6)])
+    return gpd.GeoSeries([ls_1, MultiLineString([ls_2, ls_1]), LineString(), ls_2])
+
+
+class TestGetLineCoordinates:
+    def test_offsets(self, lines):
+        """Test if the offsets point to the coordinates of each geometry."""
+        coords, offsets, _ = get_line_coordinates(lines)
+        assert np.array_equal(offsets, [0, 3, 8, 8, 10])
+        assert np.array_equal(coords[offsets[1] : offsets[2]], [[5, 5], [6, 6], [0, 0], [1, 0], [1, 1]])
+
+    def test_segments(self, lines):
+        """Test if there are no segments between geometries and between parts of MultiLineStrings."""
+        _, _, segments = get_line_coordinates(lines)
+        expected = np.ones(9, dtype=bool)
+        expected[[2, 4, 7]] = False
+        assert np.array_equal(segments, expected)
+
+    def test_changed_geometries(self, lines):
+        """Test if the result is read-only and changed geometries are extracted again."""
+        result = get_line_coordinates(lines)
+        assert not result.coords.flags.writeable
+        assert np.array_equal(get_line_coordinates(gpd.GeoDataFrame(geometry=lines)).coords, result.coords)
+
+        lines[3] = LineString([(7, 7), (8, 8)])
+        coords, offsets, _ = get_line_coordinates(lines)
+        assert np.array_equal(coords[offsets[3] :], [[7, 7], [8, 8]])
@@ -17,8 +17,13 @@ from trackintel.geogr.distances import (
     check_gdf_planar,
     meters_to_decimal_degrees,
     calculate_distance_matrix,
+    calculate_bearing,
     calculate_haversine_length,
+    get_planar_coordinates,
+    neighbors,
+    to_local_crs,
 )
+from trackintel.geogr.coordinates import get_line_coordinates
 from trackintel.geogr.point_distances import haversine_dist
 
 
@@ -113,6 +118,56 @@ class TestCalculate_distance_matrix:
         # atol = 10mm
         assert np.allclose(our_d_matrix, their_d_matrix, atol=0.01)
 
+    @pytest.mark.parametrize("block_size", [1, 7, 1024])
+    def test_haversine_blockwise(self, block_size):
+        """Test if the result of the blockwise calculation is independent of the block size."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        D = calculate_distance_matrix(X=sp, dist_metric="haversine")
+        D_block = calculate_distance_matrix(X=sp, dist_metric="haversine", block_size=block_size)
+        D_xy = calculate_distance_matrix(X=sp.iloc[0:5], Y=sp.iloc[5:], dist_metric="haversine", block_size=block_size)
+        assert np.array_equal(D, D_block)
+        assert np.allclose(D[0:5, 5:], D_xy)
+        assert (np.diag(D_block) == 0).all()
+
+    def test_haversine_float32(self):
+        """Test if the calculation in float32 is close to the float64 result."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        D = calculate_distance_matrix(X=sp, dist_metric="haversine")
+        D_32 = calculate_distance_matrix(X=sp, dist_metric="haversine", dtype=np.float32)
+        assert D_32.dtype == np.float32
+        assert np.allclose(D, D_32, rtol=1e-4, atol=1)
+
+    def test_haversine_out(self, tmp_path):
+        """Test if the distances are written into the memory mapped array passed via out."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        D = calculate_distance_matrix(X=sp, dist_metric="haversine")
+        out = np.memmap(tmp_path / "D.dat", dtype=np.float64, mode="w+", shape=(len(sp), len(sp)))
+        D_out = calculate_distance_matrix(X=sp, dist_metric="haversine", out=out, block_size=4)
+        assert D_out is out
+        assert np.array_equal(D, out)
+        with pytest.raises(ValueError, match="out must be of shape"):
+            calculate_distance_matrix(X=sp, dist_metric="haversine", out=np.empty((2, 2)))
+
+    def test_haversine_max_distance(self):
+        """Test if the sparse result contains exactly the pairs within max_distance."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        D = calculate_distance_matrix(X=sp, dist_metric="haversine")
+        D_sparse = calculate_distance_matrix(X=sp, dist_metric="haversine", max_distance=1000, block_size=3)
+        assert D_sparse.shape == D.shape
+        assert D_sparse.nnz == np.sum(D <= 1000)  # zeros on the diagonal are stored explicitly
+        assert np.array_equal(D_sparse.toarray(), np.where(D <= 1000, D, 0))
+
+    def test_blockwise_arguments_error(self):
+        """Test if out and max_distance raise an error for other metrics than haversine."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        with pytest.raises(AttributeError, match="only supported for dist_metric 'haversine', 'dtw' and 'frechet'"):
+            calculate_distance_matrix(X=sp, dist_metric="euclidean", max_distance=10)
+
     def test_trajectory_distance_dtw(self, geolife_tpls):
         """Calculate Linestring length using dtw, single and multi core."""
         tpls = geolife_tpls
@@ -136,6 +191,55 @@ class TestCalculate_distance_matrix:
 
         assert np.isclose(np.sum(np.abs(D_single - D_multi)), 0)
 
+    @pytest.mark.parametrize("dist_metric", ["dtw", "frechet"])
+    def test_trajectory_distance_xy(self, geolife_tpls, dist_metric):
+        """Test if the distances between X and Y are the corresponding part of the symmetric matrix."""
+        tpls = geolife_tpls.iloc[0:6]
+        D = calculate_distance_matrix(X=tpls, dist_metric=dist_metric)
+        D_xy = calculate_distance_matrix(X=tpls.iloc[0:2], Y=tpls.iloc[2:6], dist_metric=dist_metric)
+        assert np.allclose(D, D.T)
+        assert np.allclose(D[0:2, 2:6], D_xy)
+
+    def test_trajectory_distance_max_distance(self, geolife_tpls):
+        """Test if the sparse matrix contains exactly the pairs within max_distance."""
+        tpls = geolife_tpls.iloc[0:6]
+        D = calculate_distance_matrix(X=tpls, dist_metric="frechet")
+        D_sparse = calculate_distance_matrix(X=tpls, dist_metric="frechet", max_distance=np.median(D))
+        assert D_sparse.nnz == np.sum(D <= np.median(D))
+        assert np.allclose(D_sparse.toarray(), np.where(D <= np.median(D), D, 0))
+
+    def test_trajectory_distance_out(self, geolife_tpls):
+        """Test if the distances are written into out and window changes the dtw distance."""
+        tpls = geolife_tpls.iloc[0:6]
+        D = calculate_distance_matrix(X=tpls, dist_metric="dtw")
+        out = np.empty((6, 6), dtype=np.float32)
+        D_out = calculate_distance_matrix(X=tpls, dist_metric="dtw", out=out)
+        assert D_out is out
+        assert np.allclose(D, out)
+        D_window = calculate_distance_matrix(X=tpls, dist_metric="dtw", window=2)
+        assert np.all(D_window >= D - 1e-12)
+
+    def test_trajectory_distance_kwds(self, geolife_tpls):
+        """Test if the distance between coordinates can be set and unexpected keywords raise an error."""
+        tpls = geolife_tpls.iloc[0:4]
+        D = calculate_distance_matrix(X=tpls, dist_metric="dtw")
+        assert np.allclose(calculate_distance_matrix(X=tpls, dist_metric="dtw", metric="euclidean"), D)
+        assert np.allclose(calculate_distance_matrix(X=tpls, dist_metric="dtw", metric="minkowski", p=2), D)
+        D_cityblock = calculate_distance_matrix(X=tpls, dist_metric="dtw", metric="cityblock")
+        assert np.all(D_cityblock >= D - 1e-12)
+        D_frechet = calculate_distance_matrix(X=tpls, dist_metric="frechet")
+        D_frechet_inf = calculate_distance_matrix(X=tpls, dist_metric="frechet", p=np.inf)
+        assert np.all(D_frechet_inf <= D_frechet + 1e-12)
+
+        with pytest.raises(TypeError, match="Unexpected keyword arguments"):
+            calculate_distance_matrix(X=tpls, dist_metric="dtw", foo=1)
+        with pytest.raises(TypeError, match="Unexpected keyword arguments"):
+            calculate_distance_matrix(X=tpls, dist_metric="frechet", metric="cityblock")
+        with pytest.raises(TypeError, match="Unexpected keyword arguments"):
+            calculate_distance_matrix(X=tpls, dist_metric="dtw", p=3)
+        with pytest.raises(AttributeError, match="metric 'cosine' is unknown"):
+            calculate_distance_matrix(X=tpls, dist_metric="dtw", metric="cosine")
+
     def test_trajectory_distance_via_accessor_x(self, geolife_tpls):
         """Calculate Linestring length using dtw via accessor."""
         tpls = geolife_tpls
@@ -178,6 +282,58 @@ class TestCalculate_distance_matrix:
             calculate_distance_matrix(X=gdf, dist_metric="dtw", n_jobs=1)
 
 
+class TestNeighbors:
+    """Tests for the neighbors() function."""
+
+    @pytest.fixture
+    def sp(self):
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        return ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+
+    def test_radius(self, sp):
+        """Test if the radius query returns the same pairs and distances as the distance matrix."""
+        D = calculate_distance_matrix(X=sp, dist_metric="haversine")
+        N = neighbors(sp, radius=1000)
+        assert N.shape == D.shape
+        assert N.nnz == np.sum(D <= 1000)
+        assert np.allclose(N.toarray(), np.where(D <= 1000, D, 0), atol=0.01)
+
+    def test_k(self, sp):
+        """Test if the k nearest neighbors are the k smallest distances of the distance matrix."""
+        x, y = sp.iloc[0:5], sp.iloc[5:]
+        D = calculate_distance_matrix(X=x, Y=y, dist_metric="haversine")
+        distances, indices = neighbors(x, y, k=3, return_type="list")
+        assert len(distances) == len(indices) == len(x)
+        for i in range(len(x)):
+            assert np.allclose(distances[i], np.sort(D[i])[:3], atol=0.01)
+            assert np.allclose(D[i, indices[i]], distances[i], atol=0.01)
+
+    def test_euclidean(self, sp):
+        """Test if the euclidean query matches the distance matrix of projected points."""
+        sp = sp.set_crs("epsg:4326").to_crs("epsg:32649")
+        D = calculate_distance_matrix(X=sp, dist_metric="euclidean")
+        N = neighbors(sp, radius=500, metric="euclidean")
+        assert np.allclose(N.toarray(), np.where(D <= 500, D, 0))
+        N = neighbors(sp, radius=500, metric="manhattan")
+        assert N.nnz == np.sum(calculate_distance_matrix(X=sp, dist_metric="cityblock") <= 500)
+
+    def test_accessor(self, sp):
+        """Test if the accessors return the same result as the function."""
+        sp, locs = sp.as_staypoints.generate_locations(epsilon=10, num_samples=1, agg_level="dataset")
+        assert (sp.as_staypoints.neighbors(radius=100) != neighbors(sp, radius=100)).nnz == 0
+        N = locs.as_locations.neighbors(sp, k=1)
+        assert (N != neighbors(locs, sp, k=1)).nnz == 0
+
+    def test_error(self, sp):
+        """Test if the missing or ambiguous query arguments raise an error."""
+        with pytest.raises(ValueError, match="Exactly one of the arguments"):
+            neighbors(sp)
+        with pytest.raises(ValueError, match="Exactly one of the arguments"):
+            neighbors(sp, radius=10, k=1)
+        with pytest.raises(AttributeError, match="return_type 'dense' is unknown"):
+            neighbors(sp, radius=10, return_type="dense")
+
+
 class TestCheck_gdf_planar:
     """Tests for check_gdf_planar() method."""
 
@@ -228,6 +384,53 @@ class TestCheck_gdf_planar:
         assert_geodataframe_equal(pfs, pfs_4326)
 
 
+class TestToLocalCrs:
+    """Tests for to_local_crs() and get_planar_coordinates()."""
+
+    @pytest.fixture
+    def pfs(self):
+        file = os.path.join("tests", "data", "positionfixes.csv")
+        return ti.read_positionfixes_csv(file, sep=";", crs="EPSG:4326", index_col=None)
+
+    def test_to_local_crs(self, pfs):
+        """Test if the data is projected into the UTM zone and planar data is not changed."""
+        pfs_utm = to_local_crs(pfs)
+        assert pfs_utm.crs == "EPSG:32632"
+        assert check_gdf_planar(pfs_utm)
+        pfs_2056 = pfs.to_crs("EPSG:2056")
+        assert to_local_crs(pfs_2056) is pfs_2056
+
+    def test_planar_coordinates(self, pfs):
+        """Test if the coordinates are the ones of the UTM zone and planar coordinates are unchanged."""
+        pfs_utm = pfs.to_crs("EPSG:32632")
+        xy = get_planar_coordinates(pfs)
+        assert np.allclose(xy, np.column_stack([pfs_utm.geometry.x, pfs_utm.geometry.y]))
+        assert np.allclose(get_planar_coordinates(pfs_utm), xy)
+
+    def test_same_zone(self, pfs):
+        """Test if both functions project into the same UTM zone."""
+        pfs["geom"] = pfs["geom"].translate(-4, 13)
+        pfs_utm = to_local_crs(pfs)
+        assert pfs_utm.crs == "EPSG:32631"
+        assert np.allclose(get_planar_coordinates(pfs), np.column_stack([pfs_utm.geometry.x, pfs_utm.geometry.y]))
+
+    def test_planar_coordinates_by(self, pfs):
+        """Test if every group is projected into its own UTM zone."""
+        # move the points of the second user to New York
+        pfs.loc[pfs["user_id"] == 1, "geom"] = pfs.loc[pfs["user_id"] == 1, "geom"].translate(-82, -6)
+        xy = get_planar_coordinates(pfs, by="user_id")
+        for user, epsg in [(0, "EPSG:32632"), (1, "EPSG:32618")]:
+            user_utm = pfs[pfs["user_id"] == user].to_crs(epsg)
+            assert np.allclose(xy[pfs["user_id"] == user], np.column_stack([user_utm.geometry.x, user_utm.geometry.y]))
+
+    def test_none_crs(self, pfs):
+        """Test if a missing crs is assumed to be WGS84."""
+        xy = get_planar_coordinates(pfs)
+        pfs.crs = None
+        with pytest.warns(UserWarning):
+            assert np.allclose(get_planar_coordinates(pfs), xy)
+
+
 class TestMetersToDecimalDegrees:
     """Tests for the meters_to_decimal_degrees() function."""
 
@@ -256,3 +459,41 @@ class Testcalc_haversine_length:
         ls1, ls2 = np.array(ls1.coords), np.array(ls2.coords)
         assert length[0] == np.sum(haversine_dist(ls1[:-1, 0], ls1[:-1, 1], ls1[1:, 0], ls1[1:, 1]))
         assert length[1] == np.sum(haversine_dist(ls2[:-1, 0], ls2[:-1, 1], ls2[1:, 0], ls2[1:, 1]))
+
+    def test_multilinestring_index(self, gdf_lineStrings):
+        """Test if MultiLineStrings are summed per part and the result is aligned to the index."""
+        ls_short, ls_long = gdf_lineStrings.geometry
+        gdf = gpd.GeoDataFrame(
+            geometry=[ls_long, MultiLineString([ls_short, ls_long]), LineString()], index=[5, 3, 7], crs="wgs84"
+        )
+        length = calculate_haversine_length(gdf)
+        expected = calculate_haversine_length(gdf_lineStrings)
+        assert length.index.equals(gdf.index)
+        assert np.isclose(length[5], expected[1])
+        assert np.isclose(length[3], expected[0] + expected[1])
+        assert length[7] == 0
+
+    def test_coordinates(self, gdf_lineStrings):
+        """Test if extracted coordinates can be passed to compute the length and the bearing."""
+        coordinates = get_line_coordinates(gdf_lineStrings)
+        length = calculate_haversine_length(gdf_lineStrings, coordinates=coordinates)
+        assert length.equals(calculate_haversine_length(gdf_lineStrings))
+        bearing = calculate_bearing(gdf_lineStrings, coordinates=coordinates)
+        assert bearing.equals(calculate_bearing(gdf_lineStrings))
+
+
+class TestCalculateBearing:
+    """Tests for the calculate_bearing() function."""
+
+    def test_bearing(self):
+        """Test the bearing of lines in the four main directions for geographic and planar crs."""
+        lines = [LineString([(8, 47), (8.1, 47.2), (8, 48)]), LineString([(8, 47), (9, 47)]), LineString()]
+        lines += [LineString([(8, 47), (8, 46)]), LineString([(8, 47), (7, 47)])]
+        gdf = gpd.GeoDataFrame(geometry=lines, crs="wgs84")
+        bearing = calculate_bearing(gdf)
+        assert np.allclose(bearing[[0, 3]], [0, 180])
+        # the initial bearing of the great circle towards east is slightly north of east
+        assert 89 < bearing[1] < 90 and 270 < bearing[4] < 271
+        assert np.isnan(bearing[2])
+        gdf = gdf.set_crs("EPSG:2056", allow_override=True)
+        assert np.allclose(calculate_bearing(gdf)[[0, 1, 3, 4]], [0, 90, 180, 270])
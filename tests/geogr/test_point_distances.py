@@ -2,10 +2,12 @@ import os
 from math import radians
 
 import numpy as np
+import pytest
 from sklearn.metrics.pairwise import haversine_distances
 
 import trackintel as ti
 from trackintel.geogr.distances import haversine_dist
+from trackintel.geogr.point_distances import prepare_points, prepared_dist
 
 
 class TestHaversineDist:
@@ -71,3 +73,61 @@ class TestHaversineDist:
         d_ours = haversine_dist(bsas[1], bsas[0], paris[1], paris[0])
 
         assert np.abs(d_theirs[1][0] - d_ours) < 0.01
+
+    def test_short_distances(self):
+        """Test if short distances are precise and the same for floats and arrays."""
+        # 1 m north at the equator
+        lat = np.rad2deg(1 / 6371000)
+        assert np.isclose(haversine_dist(0, 0, 0, lat, float_flag=True), 1, rtol=1e-9)
+        assert np.isclose(haversine_dist(0, 0, 0, lat)[0], 1, rtol=1e-9)
+        assert haversine_dist(8.5, 47.3, 8.5, 47.3, float_flag=True) == 0
+
+
+class TestPreparedDist:
+    @pytest.fixture
+    def geolife_sp(self):
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        return ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+
+    def test_haversine(self, geolife_sp):
+        """Test if the prepared distances equal haversine_dist for indices and whole arrays."""
+        x, y = geolife_sp.geometry.x.values, geolife_sp.geometry.y.values
+        pts = prepare_points(x, y)
+        ix_1, ix_2 = np.triu_indices(len(x), k=1)
+        d = prepared_dist(pts, pts, ix_1, ix_2)
+        assert np.allclose(d, haversine_dist(x[ix_1], y[ix_1], x[ix_2], y[ix_2]))
+        pts_1 = prepare_points(x[ix_1], y[ix_1])
+        pts_2 = prepare_points(x[ix_2], y[ix_2])
+        assert np.allclose(prepared_dist(pts_1, pts_2), d)
+
+    def test_equirectangular(self, geolife_sp):
+        """Test if the equirectangular approximation is close for short distances."""
+        x, y = geolife_sp.geometry.x.values, geolife_sp.geometry.y.values
+        pts = prepare_points(x, y)
+        ix_1, ix_2 = np.triu_indices(len(x), k=1)
+        d = prepared_dist(pts, pts, ix_1, ix_2)
+        d_approx = prepared_dist(pts, pts, ix_1, ix_2, method="equirectangular")
+        short = d < 10000
+        assert short.any()
+        assert np.allclose(d_approx[short], d[short], rtol=1e-3)
+        # across the antimeridian
+        pts = prepare_points([179.9999, -179.9999], [0, 0])
+        assert np.isclose(prepared_dist(pts, pts, 0, 1, method="equirectangular"), 22.239, atol=1e-3)
+
+    def test_float32_out(self, geolife_sp):
+        """Test if float32 points are evaluated in single precision into the out buffer."""
+        x, y = geolife_sp.geometry.x.values, geolife_sp.geometry.y.values
+        pts = prepare_points(x, y)
+        pts_32 = prepare_points(x, y, dtype=np.float32)
+        assert pts_32.lat.dtype == np.float32
+        out = np.empty(len(x) - 1, dtype=np.float32)
+        ix = np.arange(len(x) - 1)
+        d_32 = prepared_dist(pts_32, pts_32, ix, ix + 1, out=out)
+        assert d_32 is out
+        assert np.allclose(d_32, prepared_dist(pts, pts, ix, ix + 1), atol=2)
+
+    def test_method_error(self):
+        """Test if an unknown method raises an error."""
+        pts = prepare_points([8.5, 8.7], [47.3, 47.2])
+        with pytest.raises(AttributeError, match="method 'euclidean' is unknown"):
+            prepared_dist(pts, pts, method="euclidean")
@@ -0,0 +1,165 @@
+import os
+
+import numpy as np
+import pytest
+from scipy.spatial.distance import cdist
+
+import trackintel as ti
+from trackintel.geogr.trajectory_distances import (
+    get_flat_coordinates,
+    trajectory_distances,
+    trajectory_distance_matrix,
+    trajectory_similarity_search,
+)
+
+
+@pytest.fixture
+def short_tpls():
+    """Read the geolife triplegs with less than 200 points."""
+    tpls_file = os.path.join("tests", "data", "geolife", "geolife_triplegs.csv")
+    tpls = ti.read_triplegs_csv(tpls_file, tz="utc", index_col="id")
+    return tpls[tpls.geometry.apply(lambda g: len(g.coords)) < 200]
+
+
+def _reference_distance(query, other, metric, p=2):
+    """Calculate the DTW or discrete Fréchet distance by filling the dynamic programming matrix cell by cell."""
+    cost = cdist(query, other, metric="minkowski", p=p)
+    D = np.full((len(query) + 1, len(other) + 1), np.inf)
+    D[0, 0] = 0
+    for i in range(1, len(query) + 1):
+        for j in range(1, len(other) + 1):
+            best = min(D[i - 1, j - 1], D[i - 1, j], D[i, j - 1])
+            D[i, j] = cost[i - 1, j - 1] + best if metric == "dtw" else max(cost[i - 1, j - 1], best)
+    return D[-1, -1]
+
+
+def _distance_matrix(tpls, metric, window):
+    """Calculate the full distance matrix of the triplegs."""
+    rows, cols, d = trajectory_distance_matrix(tpls, tpls, metric=metric, window=window)
+    D = np.zeros((len(tpls), len(tpls)))
+    D[rows, cols] = d
+    return D
+
+
+class TestGetFlatCoordinates:
+    def test_offsets(self, short_tpls):
+        """Test if the offsets point to the coordinates of each LineString."""
+        coords, offsets = get_flat_coordinates(short_tpls.geometry)
+        assert len(offsets) == len(short_tpls) + 1
+        for i, geom in enumerate(short_tpls.geometry):
+            assert np.array_equal(coords[offsets[i] : offsets[i + 1]], np.array(geom.coords))
+
+
+class TestTrajectoryDistances:
+    @pytest.mark.parametrize("metric", ["dtw", "frechet"])
+    @pytest.mark.parametrize("p", [1, 2, 3, np.inf])
+    def test_reference(self, short_tpls, metric, p):
+        """Test if the distances are the same as filling the dynamic programming matrix cell by cell."""
+        coords, offsets = get_flat_coordinates(short_tpls.geometry)
+        lengths = np.diff(offsets)[:8]
+        query = coords[offsets[0] : offsets[1]]
+        d = trajectory_distances(query, coords, lengths, metric=metric, max_cells=5000, p=p)
+        for i in range(len(lengths)):
+            other = coords[offsets[i] : offsets[i + 1]]
+            assert np.isclose(d[i], _reference_distance(query, other, metric, p))
+
+    @pytest.mark.parametrize("metric", ["dtw", "frechet"])
+    def test_window(self, short_tpls, metric):
+        """Test if a band can only increase the distance and a wide band does not change it."""
+        coords, offsets = get_flat_coordinates(short_tpls.geometry)
+        query, lengths = coords[offsets[1] : offsets[2]], np.diff(offsets)
+        d = trajectory_distances(query, coords, lengths, metric=metric)
+        d_narrow = trajectory_distances(query, coords, lengths, metric=metric, window=1)
+        d_wide = trajectory_distances(query, coords, lengths, metric=metric, window=lengths.max())
+        assert np.all(np.isfinite(d_narrow))
+        assert np.all(d_narrow >= d - 1e-12)
+        assert np.allclose(d, d_wide)
+
+    @pytest.mark.parametrize("metric", ["dtw", "frechet"])
+    def test_cutoff(self, short_tpls, metric):
+        """Test if only the distances above the cutoff are abandoned."""
+        coords, offsets = get_flat_coordinates(short_tpls.geometry)
+        query, lengths = coords[offsets[2] : offsets[3]], np.diff(offsets)
+        d = trajectory_distances(query, coords, lengths, metric=metric)
+        cutoff = np.median(d)
+        d_cutoff = trajectory_distances(query, coords, lengths, metric=metric, cutoff=cutoff)
+        assert np.array_equal(d_cutoff[d <= cutoff], d[d <= cutoff])
+        assert np.all(d_cutoff[d > cutoff] > cutoff)
+
+    def test_error(self, short_tpls):
+        """Test if unknown metrics and too small windows raise an error."""
+        coords, offsets = get_flat_coordinates(short_tpls.geometry)
+        with pytest.raises(AttributeError, match="metric 'lcss' is unknown"):
+            trajectory_distances(coords[:3], coords, np.diff(offsets), metric="lcss")
+        with pytest.raises(ValueError, match="window must be at least 1"):
+            trajectory_distances(coords[:3], coords, np.diff(offsets), window=0)
+        with pytest.raises(ValueError, match="p must be at least 1"):
+            trajectory_distances(coords[:3], coords, np.diff(offsets), p=0.5)
+
+
+class TestTrajectoryDistanceMatrix:
+    def test_symmetric(self, short_tpls):
+        """Test if only the upper triangle is returned without Y and the full rectangle with Y."""
+        rows, cols, d = trajectory_distance_matrix(short_tpls, metric="frechet", n_jobs=2)
+        assert np.all(rows < cols)
+        assert len(d) == len(short_tpls) * (len(short_tpls) - 1) // 2
+
+        rows_xy, cols_xy, d_xy = trajectory_distance_matrix(short_tpls, short_tpls, metric="frechet")
+        assert len(d_xy) == len(short_tpls) ** 2
+        D = np.zeros((len(short_tpls), len(short_tpls)))
+        D[rows_xy, cols_xy] = d_xy
+        assert np.allclose(D[rows, cols], d)
+        assert np.allclose(D, D.T)
+
+    @pytest.mark.parametrize("n_jobs", [1, 2])
+    def test_out(self, short_tpls, n_jobs, tmp_path):
+        """Test if the workers write the rows and the mirrored columns into out, also into a memmap."""
+        n = len(short_tpls)
+        rows, cols, d = trajectory_distance_matrix(short_tpls, short_tpls, metric="dtw")
+        expected = np.zeros((n, n))
+        expected[rows, cols] = d
+
+        out = np.full((n, n), np.nan)
+        assert trajectory_distance_matrix(short_tpls, metric="dtw", n_jobs=n_jobs, out=out) is out
+        assert np.allclose(out, expected)
+        out = np.memmap(os.path.join(tmp_path, "d.dat"), dtype=np.float32, mode="w+", shape=(n, n))
+        trajectory_distance_matrix(short_tpls, short_tpls, metric="dtw", n_jobs=n_jobs, out=out)
+        assert np.allclose(out, expected)
+        with pytest.raises(ValueError, match="out must be of shape"):
+            trajectory_distance_matrix(short_tpls, metric="dtw", out=np.empty((n, n + 1)))
+
+
+class TestTrajectorySimilaritySearch:
+    @pytest.mark.parametrize("metric,window", [("dtw", None), ("dtw", 3), ("frechet", None)])
+    def test_max_distance(self, short_tpls, metric, window):
+        """Test if exactly the pairs within max_distance are found."""
+        D = _distance_matrix(short_tpls, metric, window)
+        max_distance = np.quantile(D, 0.1)
+        S = trajectory_similarity_search(short_tpls, max_distance=max_distance, metric=metric, window=window)
+        assert S.nnz == np.sum(D <= max_distance)
+        assert np.allclose(S.toarray(), np.where(D <= max_distance, D, 0))
+
+    @pytest.mark.parametrize("metric,window", [("dtw", None), ("dtw", 3), ("frechet", None)])
+    def test_k(self, short_tpls, metric, window):
+        """Test if the k smallest distances are found sorted by distance."""
+        D = _distance_matrix(short_tpls, metric, window)
+        S = trajectory_similarity_search(short_tpls, k=3, metric=metric, window=window)
+        for i in range(len(short_tpls)):
+            assert np.allclose(S[i].data, np.sort(D[i])[:3])
+            assert np.allclose(D[i, S[i].indices], S[i].data)
+
+    def test_k_max_distance(self, short_tpls):
+        """Test if k and max_distance can be combined."""
+        D = _distance_matrix(short_tpls, "frechet", None)
+        max_distance = np.quantile(D, 0.05)
+        S = short_tpls.as_triplegs.similarity_search(k=2, max_distance=max_distance, metric="frechet")
+        for i in range(len(short_tpls)):
+            expected = np.sort(D[i])[:2]
+            assert np.allclose(S[i].data, expected[expected <= max_distance])
+
+    def test_error(self, short_tpls):
+        """Test if missing k and max_distance or an unknown metric raise an error."""
+        with pytest.raises(ValueError, match="At least one of the arguments"):
+            trajectory_similarity_search(short_tpls)
+        with pytest.raises(AttributeError, match="metric 'lcss' is unknown"):
+            trajectory_similarity_search(short_tpls, k=1, metric="lcss")
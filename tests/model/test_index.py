@@ -0,0 +1,174 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from shapely.geometry import box
+
+import trackintel as ti
+from trackintel.model.index import SpatioTemporalIndex
+
+
+@pytest.fixture
+def example_sp():
+    """Staypoints of the geolife dataset with overlapping staypoints and a shuffled order."""
+    sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+    sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id", crs="epsg:4326")
+    sp = sp.sample(frac=1, random_state=0)
+    # make some staypoints overlap the following ones
+    sp.iloc[::5, sp.columns.get_loc("finished_at")] += pd.Timedelta("1D")
+    return sp
+
+
+@pytest.fixture
+def example_pfs():
+    """Positionfixes of the geolife dataset."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    return pfs
+
+
+def _overlapping(sp, user_id, t0, t1):
+    """Staypoints of a user that overlap [t0, t1] with boolean masks."""
+    mask = sp["user_id"] == user_id
+    if t0 is not None:
+        mask &= sp["finished_at"] >= t0
+    if t1 is not None:
+        mask &= sp["started_at"] <= t1
+    return sp.loc[mask].sort_values("started_at", kind="stable")
+
+
+class TestSpatioTemporalIndex:
+    """Tests for the SpatioTemporalIndex class."""
+
+    def test_positions_for(self, example_sp):
+        """Test if the records of a user in a time window are the same as with boolean masks."""
+        sp = example_sp
+        index = SpatioTemporalIndex.from_frame(sp)
+        assert len(index) == len(sp)
+        times = sp["started_at"].sort_values().iloc[[0, 10, 20, 40, -1]].tolist() + [None]
+        for user_id in sp["user_id"].unique():
+            for t0 in times:
+                for t1 in times:
+                    result = sp.iloc[index.positions_for(user_id, t0, t1)]
+                    expected = _overlapping(sp, user_id, t0, t1)
+                    assert set(result.index) == set(expected.index)
+                    assert result["started_at"].is_monotonic_increasing
+
+    def test_unknown_user(self, example_sp):
+        """Test if an unknown user has no records."""
+        index = SpatioTemporalIndex.from_frame(example_sp)
+        assert len(index.positions_for(-1)) == 0
+
+    def test_positionfixes(self, example_pfs):
+        """Test if positionfixes are indexed by 'tracked_at'."""
+        pfs = example_pfs
+        index = SpatioTemporalIndex.from_frame(pfs)
+        t0, t1 = pfs["tracked_at"].iloc[100], pfs["tracked_at"].iloc[200]
+        result = pfs.iloc[index.positions_for(pfs["user_id"].iloc[100], t0, t1)]
+        mask = (pfs["user_id"] == pfs["user_id"].iloc[100]) & pfs["tracked_at"].between(t0, t1)
+        assert result.index.equals(pfs.loc[mask].sort_values("tracked_at", kind="stable").index)
+
+    def test_query_bbox(self, example_sp):
+        """Test if the records in a bounding box are the same as with a spatial predicate."""
+        sp = example_sp
+        index = SpatioTemporalIndex.from_frame(sp)
+        minx, miny, maxx, maxy = sp.total_bounds
+        bounds = (minx, miny, (minx + maxx) / 2, (miny + maxy) / 2)
+        in_box = sp.intersects(box(*bounds))
+
+        result = sp.iloc[index.query_bbox(bounds)]
+        assert set(result.index) == set(sp.index[in_box])
+        t0, t1 = sp["started_at"].sort_values().iloc[[10, 30]]
+        for user_id in [None, sp["user_id"].iloc[0]]:
+            result = sp.iloc[index.query_bbox(bounds, user_id=user_id, t0=t0, t1=t1)]
+            expected = sp.loc[in_box & (sp["finished_at"] >= t0) & (sp["started_at"] <= t1)]
+            if user_id is not None:
+                expected = expected.loc[expected["user_id"] == user_id]
+            assert set(result.index) == set(expected.index)
+
+    def test_query_bbox_no_geometry(self, example_sp):
+        """Test if an error is raised for spatial queries without a geometry."""
+        index = SpatioTemporalIndex.from_frame(pd.DataFrame(example_sp.drop(columns="geom")))
+        with pytest.raises(AttributeError, match="The frame has no geometry"):
+            index.query_bbox((0, 0, 1, 1))
+
+    def test_missing_columns(self, example_sp):
+        """Test if an error is raised if the time columns are missing."""
+        with pytest.raises(KeyError, match="To build the index"):
+            SpatioTemporalIndex.from_frame(example_sp.drop(columns="finished_at"))
+
+    def test_file(self, example_sp, tmp_path):
+        """Test if the index is the same after writing and reading it."""
+        sp = example_sp
+        index = SpatioTemporalIndex.from_frame(sp)
+        filename = os.path.join(tmp_path, "staypoints_index.npz")
+        index.to_file(filename)
+        index_read = SpatioTemporalIndex.read_file(filename, sp)
+        for attr in ["offsets", "order", "starts", "ends", "_max_end"]:
+            assert np.array_equal(getattr(index, attr), getattr(index_read, attr))
+        assert index.user_ids.equals(index_read.user_ids)
+        assert index.time_columns == index_read.time_columns
+
+        # the rows of the frame must be the same
+        with pytest.raises(ValueError, match="The index does not belong to the frame"):
+            SpatioTemporalIndex.read_file(filename, sp.iloc[::-1])
+        with pytest.raises(ValueError, match="The index does not belong to the frame"):
+            SpatioTemporalIndex.read_file(filename, sp.iloc[1:])
+
+
+class TestAccessor:
+    """Tests for the index methods of the accessors."""
+
+    def test_index_for(self, example_sp):
+        """Test if the index is built once and reused by the accessor."""
+        sp = example_sp
+        user_id, (t0, t1) = sp["user_id"].iloc[0], sp["started_at"].sort_values().iloc[[10, 30]]
+        result = sp.as_staypoints.index_for(user_id, t0, t1)
+        index = sp.as_staypoints._index
+        assert set(result.index) == set(_overlapping(sp, user_id, t0, t1).index)
+        sp.as_staypoints.query_bbox(sp.total_bounds)
+        assert sp.as_staypoints._index is index
+
+    def test_rebuild(self, example_sp):
+        """Test if the index is rebuilt if the index of the frame is replaced."""
+        sp = example_sp
+        index = sp.as_staypoints.build_index()
+        sp.index = sp.index + 1
+        result = sp.as_staypoints.index_for(sp["user_id"].iloc[0])
+        assert sp.as_staypoints._index is not index
+        assert set(result.index) == set(sp.index[sp["user_id"] == sp["user_id"].iloc[0]])
+
+    def test_rebuild_modified(self, example_sp):
+        """Test if the index is rebuilt if the times or geometries of the frame are modified in place."""
+        sp = example_sp
+        user_id = sp["user_id"].iloc[0]
+        t0, t1 = sp["started_at"].min(), sp["finished_at"].max()
+        index = sp.as_staypoints.build_index()
+        assert len(sp.as_staypoints.index_for(user_id, t0, t1)) > 0
+
+        sp["started_at"] += pd.Timedelta(days=10)
+        sp["finished_at"] += pd.Timedelta(days=10)
+        assert len(sp.as_staypoints.index_for(user_id, t0, t1)) == 0
+        assert sp.as_staypoints._index is not index
+
+        bounds = sp.total_bounds
+        sp.as_staypoints.build_index()
+        sp["geom"] = sp.translate(xoff=10)
+        assert len(sp.as_staypoints.query_bbox(bounds)) == 0
+
+    def test_read_index(self, example_sp, tmp_path):
+        """Test if a written index is attached to the accessor."""
+        sp = example_sp
+        filename = os.path.join(tmp_path, "staypoints_index.npz")
+        sp.as_staypoints.build_index().to_file(filename)
+        sp_copy = sp.copy()
+        index = sp_copy.as_staypoints.read_index(filename)
+        sp_copy.as_staypoints.index_for(sp["user_id"].iloc[0])
+        assert sp_copy.as_staypoints._index is index
+
+    def test_triplegs(self):
+        """Test if triplegs are queried by the accessor."""
+        tpls_file = os.path.join("tests", "data", "geolife", "geolife_triplegs.csv")
+        tpls = ti.read_triplegs_csv(tpls_file, tz="utc", index_col="id", crs="epsg:4326")
+        result = tpls.as_triplegs.query_bbox(tpls.total_bounds)
+        assert set(result.index) == set(tpls.index)
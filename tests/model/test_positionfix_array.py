@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from geopandas.testing import assert_geodataframe_equal
+
+import trackintel as ti
+from trackintel.model.positionfix_array import PositionfixArray
+
+
+@pytest.fixture
+def example_pfs():
+    """Positionfixes of the geolife dataset in a shuffled order."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    return pfs.sample(frac=1, random_state=0)
+
+
+class TestPositionfixArray:
+    """Tests for the PositionfixArray class."""
+
+    def test_round_trip(self, example_pfs):
+        """Test if the positionfixes are the same after compacting them, sorted by user and time."""
+        pfs = example_pfs
+        pfa = pfs.as_positionfixes.compact()
+        assert len(pfa) == len(pfs)
+        expected = pfs.sort_values(["user_id", "tracked_at"], kind="stable")
+        assert_geodataframe_equal(pfa.to_positionfixes(), expected[pfa.to_positionfixes().columns])
+
+    def test_float32(self, example_pfs):
+        """Test if the coordinates are stored as float32."""
+        pfa = example_pfs.as_positionfixes.compact(dtype="float32", columns=[])
+        assert pfa.x.dtype == np.float32 and pfa.y.dtype == np.float32
+        assert pfa.columns == {}
+        # x, y as float32 and time, index as int64
+        assert pfa.nbytes == len(pfa) * 24 + pfa.offsets.nbytes
+
+    def test_users(self, example_pfs):
+        """Test if the rows of the users are given by the offsets."""
+        pfs = example_pfs
+        pfa = pfs.as_positionfixes.compact()
+        assert pfa.user_ids.equals(pd.Index(np.sort(pfs["user_id"].unique())))
+        for i, (user_id, pfs_user) in enumerate(pfa.iter_users()):
+            assert user_id == pfa.user_ids[i]
+            assert (pfs_user["user_id"] == user_id).all()
+            assert pfs_user.index.equals(pd.RangeIndex(pfa.offsets[i], pfa.offsets[i + 1]))
+            assert pfs_user["tracked_at"].is_monotonic_increasing
+        assert (pfa.user_ids[pfa.user_codes] == pfa.to_positionfixes()["user_id"]).all()
+
+    def test_geometry(self, example_pfs):
+        """Test if the geometries are created with the index and the crs of the positionfixes."""
+        pfs = example_pfs
+        pfa = pfs.as_positionfixes.compact()
+        geometry = pfa.geometry
+        assert geometry.crs == pfs.crs
+        assert geometry.sort_index().geom_equals(pfs.geometry.sort_index()).all()
+
+    def test_take(self, example_pfs):
+        """Test if the offsets are updated when taking rows."""
+        pfa = example_pfs.as_positionfixes.compact()
+        positions = np.arange(0, len(pfa), 3)
+        pfa_taken = pfa.take(positions)
+        assert_geodataframe_equal(pfa_taken.to_positionfixes(), pfa.to_positionfixes().iloc[positions])
+
+    def test_duplicated(self, example_pfs):
+        """Test if duplicates are found within the users."""
+        pfs = pd.concat([example_pfs, example_pfs.iloc[:3]]).reset_index(drop=True)
+        pfa = pfs.as_positionfixes.compact()
+        duplicated = pfa.duplicated()
+        assert duplicated.sum() == 3
+        assert not pfa.take(np.flatnonzero(~duplicated)).duplicated().any()
+
+    def test_length_error(self, example_pfs):
+        """Test if an error is raised if the arrays have different lengths."""
+        pfa = example_pfs.as_positionfixes.compact()
+        with pytest.raises(ValueError, match="All arrays must have one entry per positionfix"):
+            PositionfixArray(pfa.x, pfa.y[1:], pfa.time, pfa.user_ids, pfa.offsets)
+        with pytest.raises(ValueError, match="offsets must have exactly one entry more"):
+            PositionfixArray(pfa.x, pfa.y, pfa.time, pfa.user_ids, pfa.offsets[1:])
@@ -9,6 +9,7 @@ from geopandas.testing import assert_geodataframe_equal
 from shapely.geometry import Point
 
 import trackintel as ti
+from trackintel.geogr.coordinates import get_line_coordinates
 from trackintel.io.postgis import read_trips_postgis
 from trackintel.model.util import _copy_docstring, get_speed_positionfixes
 
@@ -182,6 +183,13 @@ class TestSimpleSpeedTriplegs:
         tpls_speed_normal = ti.model.util.get_speed_triplegs(tpls)
         assert_geodataframe_equal(tpls_speed_acc, tpls_speed_normal)
 
+    def test_coordinates(self, example_triplegs):
+        """Test whether the extracted coordinates yield the same speeds"""
+        _, tpls = example_triplegs
+        coordinates = get_line_coordinates(tpls)
+        tpls_speed = ti.model.util.get_speed_triplegs(tpls, coordinates=coordinates)
+        assert_geodataframe_equal(tpls_speed, ti.model.util.get_speed_triplegs(tpls))
+
     def test_method_error(self):
         """Test whether an error is triggered if wrong posistionfixes are used as input"""
         with pytest.raises(Exception) as e_info:
@@ -1,6 +1,8 @@
 import os
 import pytest
 import geopandas as gpd
+import pandas as pd
+from shapely.geometry import box
 from geopandas.testing import assert_geodataframe_equal
 
 import trackintel as ti
@@ -121,3 +123,34 @@ class TestSpatial_filter:
         extent = gpd.read_file(os.path.join("tests", "data", "area", "tsinghua.geojson"))
         with pytest.raises(AttributeError):
             locs.as_locations.spatial_filter(areas=extent, method=12345)
+
+    def test_return_area_ids(self):
+        """Test if the matched area ids are returned for every filtered feature."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id", crs="epsg:4326")
+        extent = gpd.read_file(os.path.join("tests", "data", "area", "tsinghua.geojson"))
+        # split the area into two overlapping zones
+        minx, miny, maxx, maxy = extent.total_bounds
+        mid = (minx + maxx) / 2
+        zones = gpd.GeoDataFrame(
+            geometry=[box(minx, miny, mid, maxy), box(mid - 1e-3, miny, maxx, maxy)], index=[10, 20], crs=extent.crs
+        )
+        zones = gpd.overlay(zones, extent, how="intersection").set_index(pd.Index([10, 20]))
+
+        within_sp, area_ids = sp.as_staypoints.spatial_filter(areas=zones, method="within", return_area_ids=True)
+        assert within_sp.equals(sp.as_staypoints.spatial_filter(areas=zones, method="within"))
+        # every feature has at least one zone and the pairs are sorted like the source
+        assert (area_ids.index.unique() == within_sp.index).all()
+        assert set(area_ids) <= {10, 20}
+        for sp_id, zone_id in area_ids.items():
+            assert sp.loc[sp_id, "geom"].within(zones.loc[zone_id, "geometry"])
+
+    def test_re_project_keeps_source(self, locs_from_geolife):
+        """Test if the returned features keep the geometries and the order of the source when reprojecting."""
+        locs = locs_from_geolife
+        extent = gpd.read_file(os.path.join("tests", "data", "area", "tsinghua.geojson")).to_crs("epsg:2056")
+
+        within_loc = locs.as_locations.spatial_filter(areas=extent, method="within", re_project=True)
+        assert within_loc.crs == locs.crs
+        assert within_loc.index.is_monotonic_increasing
+        assert_geodataframe_equal(within_loc, locs.loc[within_loc.index])
@@ -0,0 +1,173 @@
+import os
+import re
+
+import pandas as pd
+import pytest
+from geopandas.testing import assert_geodataframe_equal
+
+import trackintel as ti
+from trackintel.preprocessing.pipeline import Pipeline, run_pipeline
+
+STEPS = [
+    "generate_staypoints",
+    "generate_triplegs",
+    ("create_activity_flag", {"time_threshold": 5}),
+    "generate_trips",
+    ("generate_locations", {"epsilon": 200}),
+    ("generate_tours", {"max_nr_gaps": 1}),
+]
+
+
+@pytest.fixture
+def geolife_pfs():
+    """Positionfixes of two users of the geolife dataset."""
+    pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+    return pfs
+
+
+@pytest.fixture
+def geolife_results(geolife_pfs):
+    """The results of running the steps one after another."""
+    pfs, sp = geolife_pfs.as_positionfixes.generate_staypoints()
+    pfs, tpls = pfs.as_positionfixes.generate_triplegs(sp)
+    sp = sp.as_staypoints.create_activity_flag(time_threshold=5)
+    sp, tpls, trips = tpls.as_triplegs.generate_trips(sp)
+    sp, locs = sp.as_staypoints.generate_locations(epsilon=200)
+    trips, tours = trips.as_trips.generate_tours(staypoints=sp, max_nr_gaps=1)
+    return {
+        "positionfixes": pfs,
+        "staypoints": sp,
+        "triplegs": tpls,
+        "trips": trips,
+        "locations": locs,
+        "tours": tours,
+    }
+
+
+class TestRun_pipeline:
+    """Tests for the run_pipeline() function."""
+
+    def test_same_as_steps(self, geolife_pfs, geolife_results):
+        """Test if the pipeline returns the same tables as running the steps one after another."""
+        results = run_pipeline(geolife_pfs, STEPS)
+        assert set(results) == set(geolife_results)
+        for name, table in geolife_results.items():
+            pd.testing.assert_frame_equal(results[name], table)
+
+    def test_per_user(self, geolife_pfs, geolife_results):
+        """Test if running every user on its own returns the same tables with consecutive ids."""
+        assert geolife_pfs["user_id"].nunique() > 1
+        results = run_pipeline(geolife_pfs, STEPS, per_user=True)
+        for name, table in geolife_results.items():
+            # generate_tours returns an object user_id column if run on all users
+            pd.testing.assert_frame_equal(results[name], table, check_dtype=name != "tours")
+        assert len(results["tours"]) > 0
+
+    def test_per_user_dataset_locations(self, geolife_pfs):
+        """Test if the chain is split at locations generated for all users."""
+        steps = STEPS[:4] + [("generate_locations", {"agg_level": "dataset", "epsilon": 200})]
+        results = run_pipeline(geolife_pfs, steps)
+        results_user = run_pipeline(geolife_pfs, steps, per_user=True, n_jobs=2)
+        for name, table in results.items():
+            pd.testing.assert_frame_equal(results_user[name], table)
+
+    def test_user_without_staypoints(self, geolife_pfs):
+        """Test if users without staypoints are merged with the other users."""
+        pfs_few = geolife_pfs.iloc[:3].copy()
+        pfs_few["user_id"] = 99
+        pfs = pd.concat([geolife_pfs, pfs_few]).reset_index(drop=True)
+        pfs.index.name = "id"
+        steps = STEPS[:4]
+        results = run_pipeline(pfs, steps)
+        results_user = run_pipeline(pfs, steps, per_user=True)
+        for name, table in results.items():
+            pd.testing.assert_frame_equal(results_user[name], table)
+
+    def test_empty(self, geolife_pfs):
+        """Test if empty positionfixes raise the same error as the accessor in both modes."""
+        pfs = geolife_pfs.iloc[:0]
+        with pytest.raises(AssertionError, match="Geodataframe is empty") as info:
+            pfs.as_positionfixes
+        for per_user in [False, True]:
+            with pytest.raises(AssertionError, match=re.escape(str(info.value))):
+                run_pipeline(pfs, STEPS, per_user=per_user)
+
+    def test_input_unchanged(self, geolife_pfs):
+        """Test if the input positionfixes are not changed."""
+        pfs = geolife_pfs.copy()
+        run_pipeline(geolife_pfs, STEPS[:2], per_user=True)
+        assert_geodataframe_equal(pfs, geolife_pfs)
+        run_pipeline(geolife_pfs, STEPS)
+        assert_geodataframe_equal(pfs, geolife_pfs)
+
+    def test_local_crs(self, geolife_pfs):
+        """Test if the steps run on the projected positionfixes and the results are in the input crs."""
+        steps = STEPS[:2] + [("generate_locations", {"epsilon": 200})]
+        results = run_pipeline(geolife_pfs, steps, crs="local")
+
+        pfs_utm = ti.geogr.to_local_crs(geolife_pfs)
+        pfs_utm, sp_utm = pfs_utm.as_positionfixes.generate_staypoints(distance_metric="euclidean")
+        _, tpls_utm = pfs_utm.as_positionfixes.generate_triplegs(sp_utm)
+        sp_utm, locs_utm = sp_utm.as_staypoints.generate_locations(epsilon=200, distance_metric="euclidean")
+        locs = locs_utm.to_crs(geolife_pfs.crs)
+        locs["extent"] = locs_utm["extent"].to_crs(geolife_pfs.crs)
+        expected = {"staypoints": sp_utm.to_crs(geolife_pfs.crs), "triplegs": tpls_utm.to_crs(geolife_pfs.crs)}
+        expected["locations"] = locs
+        for name, table in expected.items():
+            assert_geodataframe_equal(results[name], table, check_less_precise=True)
+
+    def test_local_crs_per_user(self, geolife_pfs):
+        """Test if the projection gives the same results per user."""
+        results = run_pipeline(geolife_pfs, STEPS[:4], crs="local")
+        results_user = run_pipeline(geolife_pfs, STEPS[:4], crs="local", per_user=True)
+        for name, table in results.items():
+            pd.testing.assert_frame_equal(results_user[name], table)
+        assert results["trips"].crs == geolife_pfs.crs
+
+
+class TestPipeline:
+    """Tests for the planning of the Pipeline class."""
+
+    def test_unknown_step(self):
+        """Test if an error is raised for unknown steps."""
+        with pytest.raises(AttributeError, match="Step 'generate_foo' is unknown"):
+            Pipeline(["generate_staypoints", "generate_foo"])
+
+    def test_unknown_argument(self):
+        """Test if an error is raised for unknown arguments before any step is run."""
+        with pytest.raises(TypeError):
+            Pipeline(["generate_staypoints", ("generate_triplegs", {"foo": 1})])
+
+    def test_table_argument(self):
+        """Test if an error is raised if a table is passed as argument."""
+        with pytest.raises(ValueError, match="are set by the pipeline"):
+            Pipeline(["generate_staypoints", ("generate_tours", {"return_index": True})])
+
+    def test_missing_input(self):
+        """Test if an error is raised if the input of a step is not generated before."""
+        with pytest.raises(ValueError, match="Step 'generate_trips' requires the triplegs"):
+            Pipeline(["generate_staypoints", "generate_trips"])
+
+    def test_crs(self):
+        """Test if the local crs uses the euclidean distance and other values raise an error."""
+        pipeline = Pipeline(["generate_staypoints", "generate_triplegs", "generate_locations"], crs="local")
+        kwargs = {name: kwargs for name, kwargs, _, _ in pipeline.steps}
+        assert kwargs["generate_staypoints"]["distance_metric"] == "euclidean"
+        assert kwargs["generate_locations"]["distance_metric"] == "euclidean"
+        assert "distance_metric" not in kwargs["generate_triplegs"]
+        with pytest.raises(AttributeError, match="crs 'utm' is unknown"):
+            Pipeline(STEPS, crs="utm")
+        with pytest.raises(ValueError, match="must use the distance_metric 'euclidean'"):
+            Pipeline([("generate_staypoints", {"distance_metric": "haversine"})], crs="local")
+
+    def test_tours_with_locations(self):
+        """Test if the tours use the staypoints only if the locations are generated before."""
+        inputs = {name: inputs for name, _, inputs, _ in Pipeline(STEPS).steps}
+        assert inputs["generate_tours"] == ["trips", "staypoints"]
+        inputs = {name: inputs for name, _, inputs, _ in Pipeline(STEPS[:4] + STEPS[5:]).steps}
+        assert inputs["generate_tours"] == ["trips"]
+
+    def test_toplevel(self):
+        """Test if the pipeline is available at the top level."""
+        assert ti.Pipeline is Pipeline
+        assert ti.preprocessing.run_pipeline is run_pipeline
@@ -207,6 +207,22 @@ class TestGenerate_staypoints:
 
         assert (sp.index == np.arange(len(sp))).all()
 
+    def test_euclidean(self, geolife_pfs_sp_long):
+        """Test if euclidean distances on geographic and projected pfs lead to the same staypoints as haversine."""
+        pfs, sp = geolife_pfs_sp_long
+        pfs = pfs.drop(columns="staypoint_id")
+        kwargs = {"method": "sliding", "dist_threshold": 25, "time_threshold": 5, "distance_metric": "euclidean"}
+        pfs_euclidean, sp_euclidean = pfs.as_positionfixes.generate_staypoints(**kwargs)
+        # the distortion of the projection can only change the assignment of pfs close to the threshold
+        assert len(sp_euclidean) == len(sp)
+        assert (sp_euclidean.to_crs("EPSG:32650").distance(sp.to_crs("EPSG:32650")) < 5).all()
+        same_sp = pfs_euclidean["staypoint_id"].eq(geolife_pfs_sp_long[0]["staypoint_id"]).fillna(True)
+        assert same_sp.mean() > 0.99
+
+        pfs_utm, sp_utm = ti.geogr.to_local_crs(pfs).as_positionfixes.generate_staypoints(**kwargs)
+        assert (sp_utm.distance(sp_euclidean.to_crs(sp_utm.crs)) < 1).all()
+        assert pfs_utm["staypoint_id"].equals(pfs_euclidean["staypoint_id"])
+
     def test_include_last(self):
         """Test if the include_last arguement will include the last pfs as stp."""
         pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife"))
@@ -293,13 +309,29 @@ class TestGenerate_staypoints:
         _, sp = pfs.as_positionfixes.generate_staypoints(gap_threshold=1e8, include_last=True)
         assert len(sp) == 1
 
+    @pytest.mark.parametrize("kwargs", [{}, {"distance_metric": "euclidean"}, {"include_last": True}])
+    def test_compact(self, kwargs):
+        """Test if staypoints generated from a PositionfixArray are the same as from a GeoDataFrame."""
+        pfs, _ = ti.io.dataset_reader.read_geolife(os.path.join("tests", "data", "geolife_long"))
+        # add duplicates
+        pfs = pd.concat([pfs, pfs.iloc[:5]]).reset_index(drop=True)
+        with pytest.warns(UserWarning, match="5 duplicates were dropped"):
+            pfs_ori, sp_ori = pfs.as_positionfixes.generate_staypoints(**kwargs)
+        with pytest.warns(UserWarning, match="5 duplicates were dropped"):
+            pfa, sp = ti.preprocessing.generate_staypoints(pfs.as_positionfixes.compact(), **kwargs)
+
+        assert isinstance(pfa, ti.model.PositionfixArray)
+        assert_geodataframe_equal(sp_ori, sp)
+        pfs_compact = pfa.to_positionfixes().sort_index()
+        assert_geodataframe_equal(pfs_ori, pfs_compact[pfs_ori.columns])
+
 
 class Test_Generate_staypoints_sliding_user:
     """Test for _generate_staypoints_sliding_user."""
 
     def test_unknown_distance_metric(self, example_positionfixes):
         """Test if the distance metric is unknown, an AttributeError will be raised."""
-        with pytest.raises(AttributeError):
+        with pytest.raises(AttributeError, match="distance_metric 'unknown' is unknown"):
             example_positionfixes.as_positionfixes.generate_staypoints(
                 method="sliding", dist_threshold=100, time_threshold=5, distance_metric="unknown"
             )
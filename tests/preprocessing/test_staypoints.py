@@ -13,6 +13,12 @@ import trackintel as ti
 from trackintel.geogr.distances import calculate_distance_matrix
 
 
+def assert_same_partition(a, b):
+    """Assert that two label arrays describe the same partition (up to renaming of the labels)."""
+    a, b = pd.factorize(a)[0], pd.factorize(b)[0]
+    np.testing.assert_array_equal(a, b)
+
+
 @pytest.fixture
 def example_staypoints():
     """Staypoints for location generation.
@@ -192,6 +198,23 @@ class TestGenerate_locations:
 
         assert len(set(locs.index)) == len(set(labels))
 
+    def test_dbscan_haversine_coordinate_order(self):
+        """Test if haversine DBSCAN uses the distances in meters of points given as (longitude, latitude)."""
+        # at latitude 60 a degree of longitude is half as long as a degree of latitude: the first two points are
+        # ~150m apart, but would be ~300m apart if longitude and latitude were swapped
+        p = np.array([[10, 60], [10.0027, 60], [10, 60.01], [10.0027, 60.01]])
+        sp = gpd.GeoDataFrame({"user_id": [0] * 4}, geometry=gpd.points_from_xy(p[:, 0], p[:, 1]), crs="epsg:4326")
+        sp["started_at"] = pd.Timestamp("2021-01-01", tz="utc")
+        sp["finished_at"] = pd.Timestamp("2021-01-01 01:00:00", tz="utc")
+        sp, locs = sp.as_staypoints.generate_locations(epsilon=200, distance_metric="haversine")
+        assert sp["location_id"].tolist() == [0, 0, 1, 1]
+
+        # the same clusters as DBSCAN on the haversine distance matrix
+        D = calculate_distance_matrix(sp, dist_metric="haversine")
+        assert np.isclose(D[0, 1], 150, atol=2)
+        labels = DBSCAN(eps=200, min_samples=1, metric="precomputed").fit_predict(D)
+        assert_same_partition(sp["location_id"], labels)
+
     def test_dbscan_loc(self):
         """Test haversine dbscan location result with manually grouping the locations method."""
         sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
@@ -432,6 +455,157 @@ class TestGenerate_locations:
 
         assert sp2.loc[[2, 7], "location_id"].isnull().all()
 
+    def test_extent(self):
+        """Test that the extent is the convex hull of the staypoints, buffered for points and lines."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id", crs="epsg:4326")
+        sp, locs = sp.as_staypoints.generate_locations(epsilon=100, num_samples=1, agg_level="user")
+
+        assert (locs["extent"].geom_type == "Polygon").all()
+        for (user_id, location_id), group in sp.groupby(["user_id", "location_id"]):
+            hull = group.geometry.unary_union.convex_hull
+            extent = locs.loc[location_id, "extent"]
+            if hull.geom_type == "Polygon":
+                assert extent.equals(hull)
+            else:
+                radius = ti.geogr.distances.meters_to_decimal_degrees(100, locs.loc[location_id, "center"].y)
+                assert extent.equals(hull.buffer(radius))
+
+    def test_extent_false(self, example_staypoints):
+        """Test that extent=False only skips the extent column."""
+        sp = example_staypoints
+        kwargs = dict(epsilon=10, num_samples=2, distance_metric="haversine")
+        for agg_level in ["user", "dataset"]:
+            sp_ext, locs_ext = sp.as_staypoints.generate_locations(agg_level=agg_level, **kwargs)
+            sp_no_ext, locs_no_ext = sp.as_staypoints.generate_locations(agg_level=agg_level, extent=False, **kwargs)
+            assert "extent" not in locs_no_ext.columns
+            assert_geodataframe_equal(sp_ext, sp_no_ext)
+            assert_geodataframe_equal(locs_ext.drop(columns="extent"), locs_no_ext)
+
+    @pytest.mark.parametrize("distance_metric", ["haversine", "euclidean"])
+    @pytest.mark.parametrize("num_samples", [1, 3])
+    def test_partitioned_dataset(self, distance_metric, num_samples):
+        """Test that the partitioned clustering yields the same locations as a single DBSCAN."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id", crs="epsg:4326")
+        epsilon, partition_size = 100, 300
+        if distance_metric == "euclidean":
+            sp = sp.to_crs("epsg:32649")
+        kwargs = dict(epsilon=epsilon, num_samples=num_samples, distance_metric=distance_metric, agg_level="dataset")
+        sp_glob, locs_glob = sp.as_staypoints.generate_locations(**kwargs)
+        sp_part, locs_part = sp.as_staypoints.generate_locations(**kwargs, partition_size=partition_size, n_jobs=2)
+        assert_geodataframe_equal(sp_glob, sp_part)
+        assert_geodataframe_equal(locs_glob, locs_part)
+
+    def test_partitioned_sklearn(self):
+        """Test partitioned clustering against sklearn DBSCAN on points scattered over many partitions."""
+        rng = np.random.default_rng(0)
+        centers = rng.uniform([8.4, 47.3], [8.6, 47.45], size=(20, 2))
+        p = centers[rng.integers(0, 20, 1000)] + rng.normal(0, 0.002, size=(1000, 2))
+        sp = gpd.GeoDataFrame({"user_id": np.zeros(len(p))}, geometry=gpd.points_from_xy(p[:, 0], p[:, 1]))
+        db = DBSCAN(eps=50 / 6371000, min_samples=4, algorithm="ball_tree", metric="haversine")
+        labels = db.fit_predict(np.deg2rad(p[:, ::-1]))
+        labels_part = ti.preprocessing.staypoints._dbscan_partitioned(sp, 50, 4, "haversine", 200)
+        assert np.array_equal(labels, labels_part)
+
+    def test_partition_size_error(self, example_staypoints):
+        """Test if a partition size smaller than epsilon or an unsupported metric raises an error."""
+        with pytest.raises(ValueError, match="partition_size must be larger than epsilon."):
+            example_staypoints.as_staypoints.generate_locations(epsilon=100, agg_level="dataset", partition_size=10)
+        with pytest.raises(AttributeError, match="is not supported with partition_size"):
+            example_staypoints.as_staypoints.generate_locations(
+                distance_metric="cosine", agg_level="dataset", partition_size=1000
+            )
+
+    @pytest.mark.parametrize("agg_level", ["user", "dataset"])
+    def test_grid(self, example_staypoints, agg_level):
+        """Test if the grid method finds the same locations as dbscan for well separated staypoints."""
+        sp_grid, locs_grid = example_staypoints.as_staypoints.generate_locations(
+            method="grid", epsilon=10, num_samples=2, agg_level=agg_level
+        )
+        sp_db, locs_db = example_staypoints.as_staypoints.generate_locations(
+            method="dbscan", epsilon=10, num_samples=2, agg_level=agg_level
+        )
+        assert_geodataframe_equal(sp_grid, sp_db)
+        assert_geodataframe_equal(locs_grid, locs_db)
+
+    def test_grid_cells(self):
+        """Test if staypoints in the same grid cell are assigned to the same location."""
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id", crs="epsg:4326")
+        sp = sp.to_crs("epsg:32649")
+        sp, locs = sp.as_staypoints.generate_locations(
+            method="grid", epsilon=100, num_samples=1, distance_metric="euclidean", agg_level="dataset"
+        )
+        cell = pd.Series(list(zip(sp.geometry.x // 100, sp.geometry.y // 100)), index=sp.index)
+        assert (sp.groupby(cell)["location_id"].nunique() == 1).all()
+        assert sp["location_id"].notna().all()
+        assert set(sp["location_id"]) == set(locs.index)
+
+    def test_hdbscan(self):
+        """Test if the hdbscan method returns the same clusters as calling HDBSCAN directly."""
+        HDBSCAN = pytest.importorskip("sklearn.cluster").__dict__.get("HDBSCAN")
+        if HDBSCAN is None:
+            pytest.skip("HDBSCAN requires scikit-learn >= 1.3")
+        sp_file = os.path.join("tests", "data", "geolife", "geolife_staypoints.csv")
+        sp = ti.read_staypoints_csv(sp_file, tz="utc", index_col="id")
+        sp, _ = sp.as_staypoints.generate_locations(
+            method="hdbscan", epsilon=10, num_samples=2, distance_metric="haversine", agg_level="dataset"
+        )
+        p = np.deg2rad(np.column_stack([sp.geometry.y, sp.geometry.x]))
+        db = HDBSCAN(min_cluster_size=2, min_samples=2, cluster_selection_epsilon=10 / 6371000, metric="haversine")
+        labels = db.fit_predict(p)
+        assert_same_partition(sp["location_id"].fillna(-1).to_numpy(), labels)
+
+    @pytest.mark.parametrize("agg_level", ["user", "dataset"])
+    def test_incremental(self, example_staypoints, agg_level):
+        """Test if incremental generation keeps existing location ids and matches a full run."""
+        sp = example_staypoints
+        sp_full, _ = sp.as_staypoints.generate_locations(epsilon=10, num_samples=1, agg_level=agg_level)
+        _, locs = sp.iloc[:3].as_staypoints.generate_locations(epsilon=10, num_samples=1, agg_level=agg_level)
+        sp_inc, locs_inc = sp.as_staypoints.generate_locations(
+            method="incremental", locations=locs, epsilon=10, num_samples=1, agg_level=agg_level
+        )
+        # existing locations are kept unchanged
+        assert_geodataframe_equal(locs_inc.iloc[: len(locs)], locs)
+        # staypoints in the already known part keep their location
+        assert (sp_inc["location_id"].iloc[:3] == sp_full["location_id"].iloc[:3]).all()
+        assert_same_partition(sp_inc["location_id"].to_numpy(), sp_full["location_id"].to_numpy())
+        # every user-location pair of the staypoints exists in the locations
+        pairs = set(zip(sp_inc["user_id"], sp_inc["location_id"]))
+        assert pairs == set(zip(locs_inc["user_id"], locs_inc.index))
+        locs_inc.as_locations
+
+    def test_incremental_user(self, example_staypoints):
+        """Test if incremental generation does not assign staypoints to locations of other users."""
+        sp = example_staypoints
+        _, locs = sp[sp["user_id"] == 0].as_staypoints.generate_locations(epsilon=10, num_samples=1)
+        sp_inc, locs_inc = sp.as_staypoints.generate_locations(
+            method="incremental", locations=locs, epsilon=10, num_samples=1
+        )
+        user_1 = sp_inc.loc[sp_inc["user_id"] == 1, "location_id"]
+        assert not user_1.isin(locs.index).any()
+        assert (locs_inc.loc[user_1, "user_id"] == 1).all()
+
+        # a user visiting exactly the same places gets its own locations
+        sp_other = sp[sp["user_id"] == 0].copy()
+        sp_other["user_id"] = 2
+        sp_other.index = sp_other.index + 1000
+        sp_inc, locs_inc = sp_other.as_staypoints.generate_locations(
+            method="incremental", locations=locs, epsilon=10, num_samples=1
+        )
+        assert not sp_inc["location_id"].isin(locs.index).any()
+        assert len(locs_inc) == 2 * len(locs)
+
+    def test_method_args_error(self, example_staypoints):
+        """Test if missing locations or unsupported metrics for the new methods raise an AttributeError."""
+        with pytest.raises(AttributeError, match="requires the existing locations"):
+            example_staypoints.as_staypoints.generate_locations(method="incremental")
+        with pytest.raises(AttributeError, match="is not supported with method 'grid'"):
+            example_staypoints.as_staypoints.generate_locations(method="grid", distance_metric="cosine")
+        with pytest.raises(AttributeError, match="only supported for method 'dbscan'"):
+            example_staypoints.as_staypoints.generate_locations(method="grid", agg_level="dataset", partition_size=1000)
+
     def test_agg_level_error(self, example_staypoints):
         """Test if unknown "agg_level" raises AttributeError"""
         agg_level = "unknown"
@@ -443,7 +617,7 @@ class TestGenerate_locations:
     def test_method_error(self, example_staypoints):
         """Test if unknown "method" raises AttributeError"""
         method = "unknown"
-        error_msg = f"method '{method}' is unknown. Supported values are ['dbscan']."
+        error_msg = f"method '{method}' is unknown. Supported values are ['dbscan', 'grid', 'hdbscan', 'incremental']."
         with pytest.raises(AttributeError) as e:
             example_staypoints.as_staypoints.generate_locations(method="unknown")
             assert error_msg == str(e.value)
@@ -515,6 +689,28 @@ class TestMergeStaypoints:
         assert sp.loc[7, "geom"] == merged_sp.loc[7, "geom"]
         assert sp.loc[2, "geom"] == merged_sp.loc[2, "geom"]
 
+    def test_merge_staypoints_long_chain(self):
+        """Test if a long chain of staypoints at the same location is merged into one staypoint."""
+        n = 500
+        t = pd.Timestamp("1971-01-01 00:00:00", tz="utc") + pd.to_timedelta(np.arange(n) * 10, unit="min")
+        sp = gpd.GeoDataFrame(
+            {
+                "user_id": 0,
+                "started_at": t,
+                "finished_at": t + pd.Timedelta("5min"),
+                "location_id": np.repeat([0, 1], [n - 1, 1]),
+            },
+            geometry=gpd.points_from_xy(np.zeros(n), np.zeros(n)),
+            crs="EPSG:4326",
+        )
+        sp.index.name = "id"
+        tpls = pd.DataFrame(columns=["user_id", "started_at"])
+        merged_sp = sp.as_staypoints.merge_staypoints(tpls, agg={"geometry": "first"})
+        assert merged_sp.index.tolist() == [0, n - 1]
+        assert merged_sp.loc[0, "finished_at"] == sp.loc[n - 2, "finished_at"]
+        # the dtypes of the staypoints are preserved
+        assert (merged_sp.dtypes == sp.dtypes[merged_sp.columns]).all()
+
     def test_merge_staypoints_error(self, example_staypoints_merge):
         sp, tpls = example_staypoints_merge
         sp.drop(columns=["location_id"], inplace=True)
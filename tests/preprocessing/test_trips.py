@@ -313,3 +313,65 @@ class TestTourHelpers:
             # check that all trips belong to the tour
             for i, id in enumerate(trips_on_tour["trip_id"]):
                 assert id in list(tours.loc[tour_id, "trips"])
+
+    def test_get_trips_grouped_index(self, example_nested_tour):
+        """Test that grouping via the TourTripIndex yields the same groups as via the tours table."""
+        trips, tours = ti.preprocessing.trips.generate_tours(example_nested_tour)
+        _, _, index = ti.preprocessing.trips.generate_tours(example_nested_tour, return_index=True)
+        grouped_tours = ti.preprocessing.trips.get_trips_grouped(trips, tours)
+        grouped_index = ti.preprocessing.trips.get_trips_grouped(trips, index)
+        for (tour_id_1, df_1), (tour_id_2, df_2) in zip(grouped_tours, grouped_index):
+            assert tour_id_1 == tour_id_2
+            pd.testing.assert_frame_equal(df_1, df_2)
+
+
+class TestTourTripIndex:
+    """Test the compact representation of the tour-trip relationship."""
+
+    def test_return_index(self, example_nested_tour):
+        """Test that the index holds the same information as the list columns."""
+        trips_list, tours_list = ti.preprocessing.trips.generate_tours(example_nested_tour)
+        trips, tours, index = ti.preprocessing.trips.generate_tours(example_nested_tour, return_index=True)
+        assert "trips" not in tours.columns
+        assert "tour_id" not in trips.columns
+        pd.testing.assert_frame_equal(tours, tours_list.drop(columns="trips"))
+        assert len(index) == len(tours)
+        for tour_id, trip_ids in tours_list["trips"].items():
+            assert list(index.trips_of(tour_id)) == trip_ids
+        for trip_id, tour_ids in trips_list["tour_id"].dropna().items():
+            assert list(index.tours_of(trip_id)) == tour_ids
+
+    def test_csr_layout(self, example_nested_tour):
+        """Test offsets and flat trip ids of the nested tour."""
+        _, tours = ti.preprocessing.trips.generate_tours(example_nested_tour)
+        index = ti.preprocessing.trips.TourTripIndex.from_tours(tours)
+        assert list(index.offsets) == [0, 1, 3, 8]
+        assert list(index.trip_ids) == [1, 100, 200, 2, 6, 100, 200, 15]
+        assert list(index.lengths) == [1, 2, 5]
+
+    def test_tours_of_unknown_trip(self, example_nested_tour):
+        """Test that a trip without tour returns an empty array."""
+        _, _, index = ti.preprocessing.trips.generate_tours(example_nested_tour, return_index=True)
+        assert len(index.tours_of(5)) == 0
+
+    def test_to_frame(self, example_nested_tour):
+        """Test that the long format is equal to exploding the list column."""
+        _, tours = ti.preprocessing.trips.generate_tours(example_nested_tour)
+        index = ti.preprocessing.trips.TourTripIndex.from_tours(tours)
+        expected = tours["trips"].explode().reset_index()
+        expected.columns = ["tour_id", "trip_id"]
+        expected = expected.astype("int64")
+        pd.testing.assert_frame_equal(index.to_frame(), expected)
+
+    def test_empty_tours(self, example_trip_data):
+        """Test that an empty index is returned if no tours are found."""
+        trips, _ = example_trip_data
+        with pytest.warns(UserWarning, match="No tours can be generated"):
+            _, tours, index = ti.preprocessing.trips.generate_tours(trips, max_time="2h", return_index=True)
+        assert len(index) == 0
+        assert len(index.tours_of(1)) == 0
+
+    def test_invalid_offsets(self):
+        """Test that inconsistent offsets raise an error."""
+        with pytest.raises(ValueError, match="offsets must have exactly one entry more"):
+            ti.preprocessing.trips.TourTripIndex([0, 1], [0, 2], [1, 2])
@@ -3,11 +3,20 @@ from .tracking_quality import _split_overlaps as split_overlaps
 
 from .labelling import create_activity_flag
 from .labelling import predict_transport_mode
+from .labelling import calculate_tripleg_features
 
 from .modal_split import calculate_modal_split
 
+from .coverage import CoverageIndex
+
+from .transitions import LocationTransitions
+from .origin_destination import od_matrix
+
+from .metrics import mobility_metrics
+from .metrics import radius_of_gyration, jump_lengths, location_entropy, unique_locations, visitation_frequency
+
 from .location_identification import location_identifier
-from .location_identification import pre_filter_locations
+from .location_identification import pre_filter_locations, pre_filter_statistics
 from .location_identification import freq_method, osna_method
 
 __all__ = [
@@ -15,9 +24,20 @@ __all__ = [
     "split_overlaps",
     "create_activity_flag",
     "predict_transport_mode",
+    "calculate_tripleg_features",
     "calculate_modal_split",
+    "CoverageIndex",
+    "LocationTransitions",
+    "od_matrix",
+    "mobility_metrics",
+    "radius_of_gyration",
+    "jump_lengths",
+    "location_entropy",
+    "unique_locations",
+    "visitation_frequency",
     "location_identifier",
     "pre_filter_locations",
+    "pre_filter_statistics",
     "freq_method",
     "osna_method",
 ]
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+
+from trackintel.analysis.tracking_quality import NS_PER_BIN, _localize
+
+
+class CoverageIndex:
+    """Per-user index of the tracked time.
+
+    The tracked time ranges of all records are merged per user into sorted, non-overlapping intervals. Together with
+    the prefix sums of their durations, the tracked time of a user between any two timestamps is answered with two
+    binary searches. Overlapping records, e.g., of staypoints and triplegs, are counted only once.
+
+    The intervals of all users are stored one after another: the intervals of the i-th user are
+    ``starts[offsets[i]:offsets[i + 1]]`` and ``ends[offsets[i]:offsets[i + 1]]``, as nanoseconds since the epoch.
+
+    Parameters
+    ----------
+    user_ids : array-like
+        Ids of the users, in the order of the rows of the index.
+
+    offsets : array-like of int
+        Start positions of the intervals of each user with a trailing entry for the end of the last user. Must have
+        length ``len(user_ids) + 1``.
+
+    starts, ends : array-like of int
+        Start and end of the merged intervals in nanoseconds since the epoch (UTC), sorted within each user.
+
+    tz : str or tzinfo, optional
+        Timezone of the returned timestamps and of the days and hours in :meth:`tracked_fraction_by_bin`.
+
+    Examples
+    --------
+    >>> index = CoverageIndex.from_records(sp, tpls)
+    >>> index.tracked_fraction(user_id, "2021-05-01 00:00:00+00:00", "2021-06-01 00:00:00+00:00")
+    >>> index.gaps(min_duration=60)
+    """
+
+    def __init__(self, user_ids, offsets, starts, ends, tz=None):
+        self.user_ids = pd.Index(user_ids)
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.starts = np.asarray(starts, dtype="int64")
+        self.ends = np.asarray(ends, dtype="int64")
+        self.tz = tz
+        if len(self.offsets) != len(self.user_ids) + 1:
+            raise ValueError("offsets must have exactly one entry more than user_ids.")
+        if self.offsets[-1] != len(self.starts) or len(self.starts) != len(self.ends):
+            raise ValueError("The last entry of offsets must be equal to the number of intervals.")
+        # tracked nanoseconds of all intervals before the i-th one
+        self._cum_tracked = np.zeros(len(self.starts) + 1, dtype="int64")
+        np.cumsum(self.ends - self.starts, out=self._cum_tracked[1:])
+
+    @classmethod
+    def from_records(cls, *sources):
+        """Build the index from records with a start and end time, e.g., staypoints and triplegs.
+
+        Parameters
+        ----------
+        *sources : DataFrame
+            One or several tables with the columns ``['user_id', 'started_at', 'finished_at']``. Records with a
+            non-positive duration are ignored.
+
+        Returns
+        -------
+        CoverageIndex
+        """
+        required_columns = ["user_id", "started_at", "finished_at"]
+        for source in sources:
+            if any([c not in source.columns for c in required_columns]):
+                raise KeyError(
+                    "To build the coverage index, the source dataframes must have the columns [%s], but it has [%s]."
+                    % (", ".join(required_columns), ", ".join(source.columns))
+                )
+        df = pd.concat([source[required_columns] for source in sources], ignore_index=True)
+        df = df.loc[df["finished_at"] > df["started_at"]]
+        tz = df["started_at"].dt.tz
+
+        user_codes, user_ids = pd.factorize(df["user_id"], sort=True)
+        start = pd.DatetimeIndex(df["started_at"]).asi8
+        end = pd.DatetimeIndex(df["finished_at"]).asi8
+        order = np.lexsort((start, user_codes))
+        user_codes, start, end = user_codes[order], start[order], end[order]
+
+        # a record starts a new interval if it starts after all previous records of the user have finished
+        max_end = pd.Series(end).groupby(user_codes).cummax().to_numpy()
+        new_interval = np.ones(len(start), dtype=bool)
+        new_interval[1:] = (user_codes[1:] != user_codes[:-1]) | (start[1:] > max_end[:-1])
+        first = np.flatnonzero(new_interval)
+        starts = start[first]
+        ends = np.maximum.reduceat(end, first) if len(first) else end[first]
+
+        offsets = np.zeros(len(user_ids) + 1, dtype="int64")
+        np.cumsum(np.bincount(user_codes[first], minlength=len(user_ids)), out=offsets[1:])
+        return cls(user_ids, offsets, starts, ends, tz=tz)
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def tracked_duration(self, user_id, t0, t1):
+        """Return the tracked time of users between two timestamps.
+
+        All arguments can be scalars or arrays of the same length, such that many queries are answered at once.
+
+        Parameters
+        ----------
+        user_id : scalar or array-like
+            Users without records have no tracked time.
+
+        t0, t1 : Timestamp or array-like of Timestamps
+            Start and end of the time window.
+
+        Returns
+        -------
+        float or np.array
+            The tracked time in seconds.
+        """
+        scalar = np.ndim(user_id) == 0 and np.ndim(t0) == 0 and np.ndim(t1) == 0
+        user_id, t0, t1 = np.broadcast_arrays(np.atleast_1d(user_id), _to_ns(t0), _to_ns(t1))
+        i = self.user_ids.get_indexer(user_id)
+        lo = np.where(i >= 0, self.offsets[i], 0)
+        hi = np.where(i >= 0, self.offsets[i + 1], 0)
+        tracked = (self._tracked_before(t1, lo, hi) - self._tracked_before(t0, lo, hi)) / 1e9
+        tracked = np.maximum(tracked, 0)
+        return tracked[0] if scalar else tracked
+
+    def tracked_fraction(self, user_id, t0, t1):
+        """Return the fraction of the time between two timestamps that users are tracked.
+
+        See :meth:`tracked_duration` for the parameters.
+
+        Returns
+        -------
+        float or np.array
+            The tracked fraction between 0 and 1.
+        """
+        tracked = self.tracked_duration(user_id, t0, t1)
+        extent = (_to_ns(t1) - _to_ns(t0)) / 1e9
+        fraction = tracked / extent
+        # the extent is an array also for scalar timestamps
+        return fraction[0] if np.ndim(tracked) == 0 else fraction
+
+    def tracked_fraction_by_bin(self, freq="D"):
+        """Return the tracked fraction of every day or hour between the first and the last record of each user.
+
+        Parameters
+        ----------
+        freq : {'D', 'H'}, default 'D'
+            Days or hours of the local time in the timezone of the index.
+
+        Returns
+        -------
+        DataFrame
+            One row per user and bin with the columns ``['user_id', 'started_at', 'finished_at', 'tracked_fraction']``.
+
+        Examples
+        --------
+        >>> hourly = index.tracked_fraction_by_bin("H")
+        >>> heatmap = hourly.assign(day=hourly["started_at"].dt.date, hour=hourly["started_at"].dt.hour).pivot_table(
+        ...     index="day", columns="hour", values="tracked_fraction")
+        """
+        if freq not in NS_PER_BIN:
+            raise AttributeError(f"freq '{freq}' is unknown. Supported values are {list(NS_PER_BIN)}.")
+        bin_ns = NS_PER_BIN[freq]
+        has_intervals = self.offsets[1:] > self.offsets[:-1]
+        user_pos = np.flatnonzero(has_intervals)
+        first_start = self.starts[self.offsets[:-1][has_intervals]]
+        last_end = self.ends[self.offsets[1:][has_intervals] - 1]
+        first_bin = _wall_ns(first_start, self.tz) // bin_ns
+        n_bins = (_wall_ns(last_end, self.tz) - 1) // bin_ns - first_bin + 1
+
+        user = np.repeat(user_pos, n_bins)
+        bins = np.repeat(first_bin, n_bins) + np.arange(n_bins.sum()) - np.repeat(np.cumsum(n_bins) - n_bins, n_bins)
+        started_at = _localize(bins * bin_ns, self.tz)
+        finished_at = _localize((bins + 1) * bin_ns, self.tz)
+        fraction = self.tracked_fraction(self.user_ids[user], started_at, finished_at)
+        return pd.DataFrame(
+            {
+                "user_id": self.user_ids[user],
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "tracked_fraction": fraction,
+            }
+        )
+
+    def intervals(self):
+        """Return the merged tracked intervals.
+
+        Returns
+        -------
+        DataFrame
+            One row per interval with the columns ``['user_id', 'started_at', 'finished_at']``.
+        """
+        return pd.DataFrame(
+            {
+                "user_id": self.user_ids.repeat(np.diff(self.offsets)),
+                "started_at": _from_ns(self.starts, self.tz),
+                "finished_at": _from_ns(self.ends, self.tz),
+            }
+        )
+
+    def gaps(self, min_duration=0):
+        """Return the untracked time between the tracked intervals of each user.
+
+        Parameters
+        ----------
+        min_duration : float, default 0 (minutes)
+            Only return gaps that are longer than ``min_duration`` minutes.
+
+        Returns
+        -------
+        DataFrame
+            One row per gap with the columns ``['user_id', 'started_at', 'finished_at', 'duration']``.
+        """
+        # every interval but the last of a user is followed by a gap
+        is_last = np.zeros(len(self.starts), dtype=bool)
+        is_last[self.offsets[1:][self.offsets[1:] > self.offsets[:-1]] - 1] = True
+        before = np.flatnonzero(~is_last)
+        gap_start, gap_end = self.ends[before], self.starts[before + 1]
+        long_enough = gap_end - gap_start > min_duration * 60 * 1e9
+        user_ids = self.user_ids.repeat(np.diff(self.offsets))
+        gaps = pd.DataFrame(
+            {
+                "user_id": user_ids[before[long_enough]],
+                "started_at": _from_ns(gap_start[long_enough], self.tz),
+                "finished_at": _from_ns(gap_end[long_enough], self.tz),
+            }
+        )
+        gaps["duration"] = gaps["finished_at"] - gaps["started_at"]
+        return gaps
+
+    def _tracked_before(self, t, lo, hi):
+        """Tracked nanoseconds before t within the intervals lo:hi (vectorized over queries)."""
+        # number of intervals that start before or at t
+        k = _segmented_searchsorted(self.starts, lo, hi, t)
+        tracked = self._cum_tracked[k] - self._cum_tracked[lo]
+        # the last of these intervals may still be ongoing at t
+        ongoing = k > lo
+        last = np.maximum(k - 1, 0)
+        overshoot = np.where(ongoing, np.maximum(self.ends[last] - t, 0), 0) if len(self.ends) else 0
+        return tracked - overshoot
+
+
+def _segmented_searchsorted(a, lo, hi, v):
+    """For every query, the first position in a[lo:hi] with a value larger than v (searchsorted with side 'right')."""
+    lo, hi = lo.copy(), hi.copy()
+    active = lo < hi
+    while active.any():
+        mid = (lo + hi) // 2
+        # the middle of finished searches can be out of bounds
+        go_right = a[np.minimum(mid, len(a) - 1)] <= v
+        lo = np.where(active & go_right, mid + 1, lo)
+        hi = np.where(active & ~go_right, mid, hi)
+        active = lo < hi
+    return lo
+
+
+def _to_ns(t):
+    """Nanoseconds since the epoch (UTC) of a timestamp or an array of timestamps."""
+    t = pd.to_datetime(t)
+    if isinstance(t, pd.Timestamp):
+        return np.array([t.value])
+    return pd.DatetimeIndex(t).asi8
+
+
+def _from_ns(ns, tz):
+    """Timestamps in timezone tz from nanoseconds since the epoch (UTC)."""
+    timestamps = pd.DatetimeIndex(ns.astype("datetime64[ns]"))
+    return timestamps if tz is None else timestamps.tz_localize("UTC").tz_convert(tz)
+
+
+def _wall_ns(ns, tz):
+    """Nanoseconds of the local (wall) time in timezone tz."""
+    return _from_ns(ns, tz).tz_localize(None).asi8 if tz is not None else ns
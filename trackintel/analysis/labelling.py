@@ -1,9 +1,10 @@
 import datetime
 
 import numpy as np
+import pandas as pd
 
 from trackintel.geogr.distances import check_gdf_planar, calculate_haversine_length
-from trackintel.model.util import get_speed_triplegs
+from trackintel.geogr.point_distances import haversine_dist
 
 
 def create_activity_flag(staypoints, method="time_threshold", time_threshold=15.0, activity_column_name="is_activity"):
@@ -57,10 +58,15 @@ def predict_transport_mode(triplegs, method="simple-coarse", **kwargs):
     triplegs: GeoDataFrame (as trackintel triplegs)
         The original input triplegs.
 
-    method: {'simple-coarse'}
+    method: {'simple-coarse', 'features'}
         The following methods are available for transport mode inference/prediction:
 
-        - 'simple-coarse' : Uses simple heuristics to predict coarse transport classes.
+        - 'simple-coarse' : Uses simple heuristics to predict coarse transport classes. The coordinates of the
+          triplegs extracted with :func:`trackintel.geogr.coordinates.get_line_coordinates` can be reused with the
+          keyword argument ``coordinates``.
+        - 'features' : Uses the same classes on a percentile of the positionfix speeds within each tripleg.
+          Requires the keyword argument ``positionfixes`` with the column ``tripleg_id``. The percentile can be set
+          with the keyword argument ``percentile`` (default 85).
 
     Returns
     -------
@@ -75,23 +81,41 @@ def predict_transport_mode(triplegs, method="simple-coarse", **kwargs):
     ``fast_mobility`` (>100 km/h) modes such as high-speed rail or airplanes.
     These categories are default values and can be overwritten using the keyword argument categories.
 
+    The ``features`` method classifies the given percentile of the speeds between consecutive positionfixes instead
+    of the average speed, which is less affected by stops, e.g., at traffic lights. Triplegs without positionfixes
+    get no mode. See :func:`calculate_tripleg_features`.
+
     Examples
     --------
     >>> tpls  = tpls.as_triplegs.predict_transport_mode()
     >>> print(tpls["mode"])
+    >>> tpls  = tpls.as_triplegs.predict_transport_mode(method="features", positionfixes=pfs)
     """
+    if method not in ["simple-coarse", "features"]:
+        raise AttributeError(f"Method {method} not known for predicting tripleg transport modes.")
+
+    # implemented as keyword argument if later other methods that don't use categories are added
+    categories = kwargs.pop(
+        "categories", {15 / 3.6: "slow_mobility", 100 / 3.6: "motorized_mobility", np.inf: "fast_mobility"}
+    )
     if method == "simple-coarse":
-        # implemented as keyword argument if later other methods that don't use categories are added
-        categories = kwargs.pop(
-            "categories", {15 / 3.6: "slow_mobility", 100 / 3.6: "motorized_mobility", np.inf: "fast_mobility"}
-        )
+        return _predict_transport_mode_simple_coarse(triplegs, categories, kwargs.pop("coordinates", None))
 
-        return _predict_transport_mode_simple_coarse(triplegs, categories)
-    else:
-        raise AttributeError(f"Method {method} not known for predicting tripleg transport modes.")
+    positionfixes = kwargs.pop("positionfixes", None)
+    if positionfixes is None:
+        raise AttributeError('Method "features" requires positionfixes as input.')
+    percentile = kwargs.pop("percentile", 85)
+    if not (_check_categories(categories)):
+        raise ValueError("the categories must be in increasing order")
 
+    features = calculate_tripleg_features(positionfixes, percentiles=[percentile])
+    speed = features[f"speed_p{percentile}"].reindex(triplegs.index)
+    triplegs = triplegs.copy()
+    triplegs["mode"] = _categorize_speed(speed.to_numpy(), categories)
+    return triplegs
 
-def _predict_transport_mode_simple_coarse(triplegs_in, categories):
+
+def _predict_transport_mode_simple_coarse(triplegs_in, categories, coordinates=None):
     """
     Predict a transport mode out of three coarse classes.
 
@@ -108,6 +132,9 @@ def _predict_transport_mode_simple_coarse(triplegs_in, categories):
         The unit for the upper boundary is m/s.
         The default is {15/3.6: 'slow_mobility', 100/3.6: 'motorized_mobility', np.inf: 'fast_mobility'}.
 
+    coordinates : LineCoordinates, optional
+        The coordinates of the triplegs, see :func:`trackintel.geogr.coordinates.get_line_coordinates`.
+
     Raises
     ------
     ValueError
@@ -125,30 +152,133 @@ def _predict_transport_mode_simple_coarse(triplegs_in, categories):
     if not (_check_categories(categories)):
         raise ValueError("the categories must be in increasing order")
 
+    # same speed as get_speed_triplegs, without copying the triplegs twice
+    if check_gdf_planar(triplegs_in):
+        distance = triplegs_in.length
+    else:
+        distance = calculate_haversine_length(triplegs_in, coordinates=coordinates)
+    duration = (triplegs_in["finished_at"] - triplegs_in["started_at"]).dt.total_seconds()
+    speed = (distance / duration).to_numpy()
+
     triplegs = triplegs_in.copy()
+    triplegs["mode"] = _categorize_speed(speed, categories)
+    return triplegs
 
-    def category_by_speed(speed):
-        """
-        Identify the mode based on the (overall) tripleg speed.
 
-        Parameters
-        ----------
-        speed : float
-            the speed of one tripleg
+def _categorize_speed(speed, categories):
+    """Assign each speed the category of the first upper boundary above it, None if there is none."""
+    bounds = np.fromiter(categories.keys(), dtype=np.float64, count=len(categories))
+    labels = np.array(list(categories.values()) + [None], dtype=object)
+    # NaN speeds are sorted behind all boundaries and get None
+    return labels[np.searchsorted(bounds, speed, side="right")]
 
-        Returns
-        -------
-        str
-            the identified mode.
-        """
-        for bound in categories:
-            if speed < bound:
-                return categories[bound]
 
-    triplegs_speed = get_speed_triplegs(triplegs)
+def calculate_tripleg_features(positionfixes, percentiles=(50, 85, 95), stop_speed=1.0, coordinates=None):
+    """
+    Calculate speed and acceleration features of triplegs from their positionfixes.
 
-    triplegs["mode"] = triplegs_speed["speed"].apply(category_by_speed)
-    return triplegs
+    Parameters
+    ----------
+    positionfixes : GeoDataFrame (as trackintel positionfixes)
+        The positionfixes with the column ``tripleg_id``, e.g., as returned by
+        :func:`trackintel.preprocessing.positionfixes.generate_triplegs`.
+
+    percentiles : list of float, default (50, 85, 95)
+        The percentiles of the speed to calculate, between 0 and 100.
+
+    stop_speed : float, default 1.0
+        Speed in m/s below which the user is considered to be stopped.
+
+    coordinates : LineCoordinates, optional
+        The coordinates of the positionfixes extracted with
+        :func:`trackintel.geogr.coordinates.get_line_coordinates`, exactly one per positionfix. If None, they are
+        taken from the geometry of the positionfixes.
+
+    Returns
+    -------
+    features : DataFrame
+        Indexed by ``tripleg_id`` with the columns
+
+        - ``speed_p<q>`` for every percentile q of the speeds between consecutive positionfixes in m/s.
+        - ``speed_mean`` the distance divided by the duration in m/s.
+        - ``acceleration_mean``, ``acceleration_std`` and ``acceleration_max`` of the absolute acceleration
+          between consecutive speeds in m/s², NaN for triplegs with a single speed.
+        - ``stop_rate`` the fraction of the time spent below ``stop_speed``.
+
+    Notes
+    -----
+    Consecutive positionfixes with the same timestamp are skipped. Triplegs without two positionfixes at different
+    times are missing in the result. All features are computed in one vectorized pass over the positionfixes sorted
+    by tripleg and time.
+
+    Examples
+    --------
+    >>> from trackintel.analysis.labelling import calculate_tripleg_features
+    >>> features = calculate_tripleg_features(pfs, percentiles=[50, 95])
+    """
+    if "tripleg_id" not in positionfixes:
+        raise AttributeError('Positionfixes must include column "tripleg_id".')
+    has_tripleg = positionfixes["tripleg_id"].notna().to_numpy()
+    pfs = positionfixes[has_tripleg]
+    tripleg_id = pfs["tripleg_id"].to_numpy(dtype=np.int64)
+    t = pfs["tracked_at"].to_numpy(dtype="datetime64[ns]").view(np.int64) / 1e9
+    order = np.lexsort((t, tripleg_id))
+    tripleg_id, t = tripleg_id[order], t[order]
+    if coordinates is None:
+        x, y = pfs.geometry.x.to_numpy()[order], pfs.geometry.y.to_numpy()[order]
+    elif len(coordinates.coords) != len(positionfixes):
+        raise ValueError("coordinates must contain exactly one coordinate per positionfix.")
+    else:
+        x, y = coordinates.coords[has_tripleg][order].T
+
+    # segments between consecutive positionfixes of the same tripleg
+    dt = np.diff(t)
+    valid = (tripleg_id[1:] == tripleg_id[:-1]) & (dt > 0)
+    start, end = np.flatnonzero(valid), np.flatnonzero(valid) + 1
+    if check_gdf_planar(pfs):
+        dist = np.hypot(x[end] - x[start], y[end] - y[start])
+    else:
+        dist = haversine_dist(x[start], y[start], x[end], y[end])
+    dt, seg_id = dt[valid], tripleg_id[start]
+    speed = dist / dt
+
+    # segments are sorted by tripleg, groups are contiguous
+    new_group = np.ones(len(seg_id), dtype=bool)
+    new_group[1:] = seg_id[1:] != seg_id[:-1]
+    group_start = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+    n_groups = len(group_start)
+    counts = np.diff(np.append(group_start, len(seg_id)))
+
+    features = {}
+    speed_sorted = speed[np.lexsort((speed, group))]
+    for q in percentiles:
+        # linear interpolation between the closest ranks as in np.percentile
+        rank = group_start + q / 100 * (counts - 1)
+        lower = np.floor(rank).astype(np.int64)
+        upper = np.ceil(rank).astype(np.int64)
+        features[f"speed_p{q}"] = speed_sorted[lower] + (speed_sorted[upper] - speed_sorted[lower]) * (rank - lower)
+    duration = np.bincount(group, weights=dt, minlength=n_groups)
+    features["speed_mean"] = np.bincount(group, weights=dist, minlength=n_groups) / duration
+
+    # acceleration between consecutive segments, relative to the time between their centers
+    same = group[1:] == group[:-1]
+    acc = np.abs(np.diff(speed) / ((dt[1:] + dt[:-1]) / 2))[same]
+    acc_group = group[1:][same]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        n_acc = np.bincount(acc_group, minlength=n_groups)
+        acc_mean = np.bincount(acc_group, weights=acc, minlength=n_groups) / n_acc
+        acc_sq = np.bincount(acc_group, weights=acc**2, minlength=n_groups) / n_acc
+        features["acceleration_mean"] = acc_mean
+        features["acceleration_std"] = np.sqrt(np.maximum(acc_sq - acc_mean**2, 0))
+    acc_max = np.full(n_groups, np.nan)
+    if len(acc):
+        acc_start = np.flatnonzero(np.append(True, acc_group[1:] != acc_group[:-1]))
+        acc_max[acc_group[acc_start]] = np.maximum.reduceat(acc, acc_start)
+    features["acceleration_max"] = acc_max
+
+    features["stop_rate"] = np.bincount(group, weights=dt * (speed < stop_speed), minlength=n_groups) / duration
+    return pd.DataFrame(features, index=pd.Index(seg_id[group_start], name="tripleg_id"))
 
 
 def _check_categories(cat):
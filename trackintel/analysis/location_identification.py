@@ -83,6 +83,7 @@ def pre_filter_locations(
     thresh_sp_at_loc=10,
     thresh_loc_time="1h",
     thresh_loc_period="5h",
+    statistics=None,
 ):
     """Filter locations and user out that have not enough data to do a proper analysis.
 
@@ -114,6 +115,11 @@ def pre_filter_locations(
         Minimum timespan of first to last visit at a location to be included.
         If str must be parsable by pd.to_timedelta.
 
+    statistics : tuple of DataFrame, optional
+        The user and location statistics as returned by `pre_filter_statistics` with the same `agg_level`. Pass them
+        to try out several thresholds without recomputing them. They are matched to the staypoints by user and
+        location id, users and locations without statistics are filtered out.
+
     Returns
     -------
     total_filter: pd.Series
@@ -128,45 +134,92 @@ def pre_filter_locations(
     # assert validity of staypoints
     staypoints.as_staypoints
 
-    sp = staypoints.copy()
     if isinstance(thresh_loc_time, str):
         thresh_loc_time = pd.to_timedelta(thresh_loc_time)
     if isinstance(thresh_loc_period, str):
         thresh_loc_period = pd.to_timedelta(thresh_loc_period)
+    groupby_loc = _get_groupby_loc(agg_level)
+    if statistics is None:
+        statistics = pre_filter_statistics(staypoints, agg_level=agg_level)
+    user, loc = statistics
 
     # filtering users
-    user = sp.groupby("user_id").nunique()
-    user_sp = user["started_at"] >= thresh_sp  # every staypoint should have a started_at -> count
-    user_loc = user["location_id"] >= thresh_loc
-    user_filter_agg = user_sp & user_loc
-    user_filter_agg.rename("user_filter", inplace=True)  # rename for merging
-    user_filter = pd.merge(sp["user_id"], user_filter_agg, left_on="user_id", right_index=True)["user_filter"]
+    user_filter_agg = (user["n_staypoints"] >= thresh_sp) & (user["n_locations"] >= thresh_loc)
 
     # filtering locations
-    sp["duration"] = sp["finished_at"] - sp["started_at"]
-    if agg_level == "user":
-        groupby_loc = ["user_id", "location_id"]
-    elif agg_level == "dataset":
-        groupby_loc = ["location_id"]
+    loc_sp = loc["n_staypoints"] >= thresh_sp_at_loc
+    loc_time = loc["duration"] >= thresh_loc_time
+    loc_period = loc["period"] >= thresh_loc_period
+    loc_filter_agg = loc_sp & loc_time & loc_period
+
+    # align the filters with the staypoints, staypoints without user or location are filtered out
+    # by label, such that statistics of other staypoints (e.g., a superset) can be used
+    user_filter = user_filter_agg.reindex(staypoints["user_id"], fill_value=False).to_numpy()
+    if len(groupby_loc) > 1:
+        loc_keys = pd.MultiIndex.from_frame(staypoints[groupby_loc])
     else:
-        raise ValueError(f"Unknown agg_level '{agg_level}' use instead {{'user', 'dataset'}}.")
-    loc = sp.groupby(groupby_loc).agg({"started_at": [min, "count"], "finished_at": max, "duration": sum})
-    loc.columns = loc.columns.droplevel(0)  # remove possible multi-index
-    loc.rename(columns={"min": "started_at", "max": "finished_at", "sum": "duration"}, inplace=True)
+        loc_keys = staypoints[groupby_loc[0]]
+    loc_filter = loc_filter_agg.reindex(loc_keys, fill_value=False).to_numpy(dtype=bool)
+
+    return pd.Series(user_filter & loc_filter, index=staypoints.index)
+
+
+def pre_filter_statistics(staypoints, agg_level="user"):
+    """Calculate the user and location statistics that are used by `pre_filter_locations`.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints with the column "location_id".
+
+    agg_level: {"user", "dataset"}, default "user"
+        The level of aggregation of the location statistics. 'user' : per user and location;
+        'dataset' : per location over the whole dataset.
+
+    Returns
+    -------
+    user: pd.DataFrame
+        Per user the columns "n_staypoints" (distinct start times) and "n_locations".
+
+    loc: pd.DataFrame
+        Per location the columns "n_staypoints", "started_at" (first visit), "finished_at" (last visit),
+        "duration" (summed time spent at the location) and "period" (timespan from first to last visit).
+
+    Examples
+    --------
+    >>> from ti.analysis.location_identification import pre_filter_statistics
+    >>> statistics = pre_filter_statistics(staypoints)
+    >>> mask = pre_filter_locations(staypoints, thresh_sp=5, statistics=statistics)
+    """
+    groupby_loc = _get_groupby_loc(agg_level)
+    # only select the needed columns, e.g., no geometry
+    sp = pd.DataFrame(staypoints[["user_id", "location_id", "started_at", "finished_at"]])
+    sp["duration"] = sp["finished_at"] - sp["started_at"]
+
+    # every staypoint should have a started_at -> count
+    user = sp.groupby("user_id").agg(
+        n_staypoints=("started_at", "nunique"),
+        n_locations=("location_id", "nunique"),
+    )
+    loc = sp.groupby(groupby_loc).agg(
+        n_staypoints=("started_at", "count"),
+        started_at=("started_at", "min"),
+        finished_at=("finished_at", "max"),
+        duration=("duration", "sum"),
+    )
     # period for maximal time span first visit - last visit.
     # duration for effective time spent at location summed up.
     loc["period"] = loc["finished_at"] - loc["started_at"]
-    loc_sp = loc["count"] >= thresh_sp_at_loc
-    loc_time = loc["duration"] >= thresh_loc_time
-    loc_period = loc["period"] >= thresh_loc_period
-    loc_filter_agg = loc_sp & loc_time & loc_period
-    loc_filter_agg.rename("loc_filter", inplace=True)  # rename for merging
-    loc_filter = pd.merge(sp[groupby_loc], loc_filter_agg, how="left", left_on=groupby_loc, right_index=True)
-    loc_filter = loc_filter["loc_filter"]
+    return user, loc
 
-    total_filter = user_filter & loc_filter
 
-    return total_filter
+def _get_groupby_loc(agg_level):
+    """Columns that define a location for the aggregation level."""
+    if agg_level == "user":
+        return ["user_id", "location_id"]
+    if agg_level == "dataset":
+        return ["location_id"]
+    raise ValueError(f"Unknown agg_level '{agg_level}' use instead {{'user', 'dataset'}}.")
 
 
 def freq_method(staypoints, *labels):
@@ -177,6 +230,9 @@ def freq_method(staypoints, *labels):
 
     Labels can also be given as arguments.
 
+    Locations with the same duration are ranked by their location_id, i.e., the location with the smaller id gets
+    the label first.
+
     Parameters
     ----------
     staypoints : GeoDataFrame (as trackintel staypoints)
@@ -198,52 +254,25 @@ def freq_method(staypoints, *labels):
     sp = staypoints.copy()
     if not labels:
         labels = ("home", "work")
-    for name, group in sp.groupby("user_id"):
-        if "duration" not in group.columns:
-            group["duration"] = group["finished_at"] - group["started_at"]
-        # pandas keeps inner order of groups
-        sp.loc[sp["user_id"] == name, "purpose"] = _freq_transform(group, *labels)
-    return sp
-
-
-def _freq_transform(group, *labels):
-    """Transform function that assigns the longest (duration) visited locations the labels in order.
-
-    Parameters
-    ----------
-    group : pd.DataFrame
-        Should have columns "location_id" and "duration".
-
-    Returns
-    -------
-    pd.Series
-        dtype : object
-    """
-    group_agg = group.groupby("location_id").agg({"duration": sum})
-    group_agg["purpose"] = _freq_assign(group_agg["duration"], *labels)
-    group_merge = pd.merge(
-        group["location_id"], group_agg["purpose"], how="left", left_on="location_id", right_index=True
+    if "duration" in sp.columns:
+        duration = sp["duration"]
+    else:
+        duration = sp["finished_at"] - sp["started_at"]
+
+    # one duration sum per user and location
+    loc_duration = duration.groupby([sp["user_id"], sp["location_id"]]).sum()
+    if pd.api.types.is_timedelta64_dtype(loc_duration):
+        loc_duration /= pd.Timedelta("1ns")
+    # rank the locations of each user by decreasing duration, ties are broken by the order of the location_id
+    rank = loc_duration.groupby(level=0).rank(method="first", ascending=False).to_numpy()
+    label_array = np.array([*labels, None], dtype=object)
+    purpose = pd.Series(
+        label_array[np.where(rank <= len(labels), rank - 1, len(labels)).astype(int)],
+        index=loc_duration.index,
+        name="purpose",
     )
-    return group_merge["purpose"]
-
-
-def _freq_assign(duration, *labels):
-    """Assign k labels to k longest durations the rest is `None`.
-
-    Parameters
-    ----------
-    duration : pd.Series
-
-    Returns
-    -------
-    np.array
-        dtype : object
-    """
-    kth = (-duration).argsort()[: len(labels)]  # if inefficient use partial sort.
-    label_array = np.full(len(duration), fill_value=None)
-    labels = labels[: len(kth)]  # if provided with more labels than entries.
-    label_array[kth] = labels
-    return label_array
+    sp["purpose"] = sp[["user_id", "location_id"]].join(purpose, on=["user_id", "location_id"])["purpose"]
+    return sp
 
 
 def osna_method(staypoints):
@@ -286,7 +315,7 @@ def osna_method(staypoints):
     sp["duration"] = sp["finished_at"] - sp["started_at"]
     sp["mean_time"] = sp["started_at"] + sp["duration"] / 2
 
-    sp["label"] = sp["mean_time"].apply(_osna_label_timeframes)
+    sp["label"] = _osna_label_timeframes_array(sp["mean_time"])
     sp.loc[sp["label"] == "rest", "duration"] *= 0.739  # weight given in paper
     sp.loc[sp["label"] == "leisure", "duration"] *= 0.358  # weight given in paper
 
@@ -311,7 +340,7 @@ def osna_method(staypoints):
     sp_pivot /= pd.Timedelta("1ns")
     # get index of maximum for columns "work" and "home"
     # looks over locations to find maximum for columns
-    sp_idxmax = sp_pivot.groupby(["user_id"]).idxmax(axis="index")
+    sp_idxmax = pd.DataFrame({col: _idxmax_per_user(sp_pivot[col]) for col in sp_pivot.columns})
     # first assign labels
     for col in sp_idxmax.columns:
         sp_pivot.loc[sp_idxmax[col].dropna(), "purpose"] = col
@@ -322,7 +351,7 @@ def osna_method(staypoints):
         redo_work = sp_idxmax[sp_idxmax["home"] == sp_idxmax["work"]]
         sp_pivot.loc[redo_work["work"], "purpose"] = "home"
         sp_pivot.loc[redo_work["work"], "work"] = np.nan
-        sp_idxmax_work = sp_pivot.groupby(["user_id"])["work"].idxmax()
+        sp_idxmax_work = _idxmax_per_user(sp_pivot["work"])
         sp_pivot.loc[sp_idxmax_work.dropna(), "purpose"] = "work"
 
     # now join it back together
@@ -336,12 +365,46 @@ def osna_method(staypoints):
     )
 
 
-def _osna_label_timeframes(dt, weekend=[5, 6], start_rest=2, start_work=8, start_leisure=19):
-    """Help function to assign "weekend", "rest", "work", "leisure"."""
-    if dt.weekday() in weekend:
-        return "weekend"
-    if start_rest <= dt.hour < start_work:
-        return "rest"
-    if start_work <= dt.hour < start_leisure:
-        return "work"
-    return "leisure"
+def _idxmax_per_user(values):
+    """Index label of the first maximum per user, equal to `values.groupby("user_id").idxmax()`.
+
+    Sorting once avoids the slow python loop over the groups in pandas. NaN values are skipped and users with only
+    NaN values are left out.
+
+    Parameters
+    ----------
+    values : pd.Series
+        Values with the index level "user_id".
+
+    Returns
+    -------
+    pd.Series
+        Index labels (as tuples) of the maxima, indexed by "user_id".
+    """
+    values = values.dropna()
+    user = values.index.get_level_values("user_id")
+    codes = pd.factorize(user)[0]
+    # lexsort is stable -> the first of equal maxima stays in front
+    order = np.lexsort((-values.to_numpy(), codes))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = codes[order][1:] != codes[order][:-1]
+    first = order[is_first]
+    return pd.Series(values.index[first].to_flat_index(), index=user[first], dtype=object)
+
+
+def _osna_label_timeframes_array(dt, weekend=[5, 6], start_rest=2, start_work=8, start_leisure=19):
+    """Assign "weekend", "rest", "work", "leisure" to a Series of timestamps.
+
+    Returns
+    -------
+    np.array
+        dtype : object
+    """
+    weekday = dt.dt.weekday.to_numpy()
+    hour = dt.dt.hour.to_numpy()
+    conditions = [
+        np.isin(weekday, weekend),
+        (start_rest <= hour) & (hour < start_work),
+        (start_work <= hour) & (hour < start_leisure),
+    ]
+    return np.select(conditions, ["weekend", "rest", "work"], default="leisure").astype(object)
@@ -0,0 +1,385 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed, effective_n_jobs
+
+from trackintel.analysis.modal_split import _get_time_bins
+from trackintel.geogr.distances import check_gdf_planar
+from trackintel.geogr.point_distances import haversine_dist
+
+METRICS = ["radius_of_gyration", "jump_length", "n_locations", "random_entropy", "uncorrelated_entropy", "real_entropy"]
+ENTROPY_METHODS = ["random", "uncorrelated", "real"]
+_LOCATION_METRICS = ["n_locations", "random_entropy", "uncorrelated_entropy", "real_entropy"]
+
+
+def mobility_metrics(staypoints, metrics=None, freq=None, n_jobs=1, chunk_size=100000):
+    """Calculate mobility indicators per user and (optionally) per time window.
+
+    The staypoints are sorted once by user and time and all metrics are computed in a single grouped pass. The
+    users are processed in chunks that can be evaluated in parallel.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints with point geometries. The column "location_id" is required for the location based metrics.
+
+    metrics : list of str, optional
+        The metrics to calculate, by default all of them:
+
+        - 'radius_of_gyration': root mean square distance of the staypoints to their center of mass.
+        - 'jump_length': mean distance between consecutive staypoints.
+        - 'n_locations': number of unique locations.
+        - 'random_entropy': log2 of the number of unique locations.
+        - 'uncorrelated_entropy': Shannon entropy of the visitation frequencies of the locations.
+        - 'real_entropy': entropy of the location sequence including its temporal order, estimated with the
+          Lempel-Ziv estimator of [1].
+
+    freq : str, optional
+        Frequency string of the time windows, passed on as `freq` to the pandas.Grouper class and applied on
+        "started_at". If `freq=None` the metrics are calculated on all data of a user.
+
+    n_jobs : int, default 1
+        Number of jobs used to process the chunks in parallel.
+
+    chunk_size : int, default 100000
+        Approximate number of staypoints per chunk. The staypoints of a user (and time window) are never split.
+
+    Returns
+    -------
+    pd.DataFrame
+        One column per metric. The index has the levels `('user_id', 'timestamp')` if `freq` is given and is the
+        "user_id" otherwise. Distances are in meters for geographic and in the unit of the crs for planar
+        coordinates, entropies are in bits.
+
+    Notes
+    -----
+    The jumps are taken between consecutive staypoints of a user and belong to the time window of the staypoint
+    they end at. Staypoints without location are ignored by the location based metrics.
+
+    References
+    ----------
+    [1] Song, C., Qu, Z., Blumm, N., & Barabási, A. L. (2010). Limits of predictability in human mobility.
+    Science, 327(5968), 1018-1021.
+
+    Examples
+    --------
+    >>> from trackintel.analysis.metrics import mobility_metrics
+    >>> mobility_metrics(staypoints, ["radius_of_gyration", "real_entropy"], freq="W-MON", n_jobs=4)
+    """
+    metrics = list(METRICS) if metrics is None else list(metrics)
+    for metric in metrics:
+        if metric not in METRICS:
+            raise AttributeError(f"metric '{metric}' is unknown. Supported values are {METRICS}.")
+    if "location_id" not in staypoints.columns and any(m in _LOCATION_METRICS for m in metrics):
+        raise KeyError(
+            "To calculate location based metrics the staypoints must have a column named 'location_id' but it has "
+            f"[{', '.join(staypoints.columns)}]"
+        )
+
+    # sort once by user and time
+    user_codes, users = pd.factorize(staypoints["user_id"], sort=True)
+    started_at = pd.DatetimeIndex(staypoints["started_at"])
+    order = np.lexsort((started_at.asi8, user_codes))
+    user_codes = user_codes[order]
+    x, y = staypoints.geometry.x.to_numpy()[order], staypoints.geometry.y.to_numpy()[order]
+    if "location_id" in staypoints.columns:
+        loc_codes = pd.factorize(staypoints["location_id"])[0][order]
+    else:
+        loc_codes = np.full(len(order), -1)
+    geographic = not check_gdf_planar(staypoints)
+    jumps = _jump_lengths(x, y, user_codes, geographic)
+
+    # a new group starts with every user and (optionally) time window, groups are sorted as the staypoints are
+    if freq is not None:
+        bin_codes, bins = _get_time_bins(started_at[order], freq)
+    else:
+        bin_codes, bins = np.zeros(len(order), dtype=int), None
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = (user_codes[1:] != user_codes[:-1]) | (bin_codes[1:] != bin_codes[:-1])
+    group_starts = np.flatnonzero(new_group)
+    group = np.cumsum(new_group) - 1
+
+    # cut the chunks at the group start closest after every multiple of chunk_size
+    cuts = np.unique(np.searchsorted(group_starts, np.arange(0, len(order), chunk_size)))
+    cuts = group_starts[cuts[cuts < len(group_starts)]]
+    bounds = np.append(cuts, len(order))
+    res = Parallel(n_jobs=effective_n_jobs(n_jobs))(
+        delayed(_metrics_chunk)(
+            x[start:end], y[start:end], jumps[start:end], loc_codes[start:end], group[start:end], geographic, metrics
+        )
+        for start, end in zip(bounds[:-1], bounds[1:])
+    )
+    values = {metric: np.concatenate([r[metric] for r in res]) if res else np.empty(0) for metric in metrics}
+
+    index = users[user_codes[group_starts]].rename("user_id")
+    if freq is not None:
+        index = pd.MultiIndex.from_arrays([index, bins[bin_codes[group_starts]]], names=["user_id", "timestamp"])
+    return pd.DataFrame(values, index=index, columns=metrics)
+
+
+def radius_of_gyration(staypoints, freq=None):
+    """Calculate the radius of gyration per user.
+
+    The radius of gyration is the root mean square distance of the staypoints to their center of mass.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+
+    freq : str, optional
+        Frequency string of time windows, see :func:`mobility_metrics`.
+
+    Returns
+    -------
+    pd.Series
+        The radius of gyration in meters (or in the unit of a planar crs).
+
+    Examples
+    --------
+    >>> from trackintel.analysis.metrics import radius_of_gyration
+    >>> radius_of_gyration(staypoints, freq="W-MON")
+    """
+    return mobility_metrics(staypoints, ["radius_of_gyration"], freq=freq)["radius_of_gyration"]
+
+
+def location_entropy(staypoints, method="real", freq=None, n_jobs=1):
+    """Calculate the entropy of the visited locations per user.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints with the column "location_id".
+
+    method : {'random', 'uncorrelated', 'real'}, default 'real'
+        'random': log2 of the number of unique locations.
+        'uncorrelated': Shannon entropy of the visitation frequencies of the locations.
+        'real': entropy of the location sequence including its temporal order (Lempel-Ziv estimator).
+
+    freq : str, optional
+        Frequency string of time windows, see :func:`mobility_metrics`.
+
+    n_jobs : int, default 1
+        Number of jobs used to calculate the real entropy in parallel.
+
+    Returns
+    -------
+    pd.Series
+        The entropy in bits.
+
+    Examples
+    --------
+    >>> from trackintel.analysis.metrics import location_entropy
+    >>> location_entropy(staypoints, method="uncorrelated")
+    """
+    if method not in ENTROPY_METHODS:
+        raise AttributeError(f"method '{method}' is unknown. Supported values are {ENTROPY_METHODS}.")
+    metric = f"{method}_entropy"
+    return mobility_metrics(staypoints, [metric], freq=freq, n_jobs=n_jobs)[metric]
+
+
+def unique_locations(staypoints, freq=None):
+    """Count the unique locations visited per user.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints with the column "location_id".
+
+    freq : str, optional
+        Frequency string of time windows, see :func:`mobility_metrics`.
+
+    Returns
+    -------
+    pd.Series
+        The number of unique locations.
+    """
+    return mobility_metrics(staypoints, ["n_locations"], freq=freq)["n_locations"]
+
+
+def jump_lengths(staypoints):
+    """Calculate the distance of every staypoint to the previous staypoint of the same user.
+
+    The jump lengths of all staypoints form the jump length distribution of the users.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+
+    Returns
+    -------
+    pd.Series
+        The jump length in meters (or in the unit of a planar crs) aligned with the staypoints. The first staypoint
+        of every user has no jump (NaN).
+
+    Examples
+    --------
+    >>> from trackintel.analysis.metrics import jump_lengths
+    >>> staypoints["jump_length"] = jump_lengths(staypoints)
+    >>> staypoints.groupby("user_id")["jump_length"].describe()
+    """
+    user_codes = pd.factorize(staypoints["user_id"])[0]
+    order = np.lexsort((pd.DatetimeIndex(staypoints["started_at"]).asi8, user_codes))
+    x, y = staypoints.geometry.x.to_numpy()[order], staypoints.geometry.y.to_numpy()[order]
+    jumps = np.empty(len(order))
+    jumps[order] = _jump_lengths(x, y, user_codes[order], not check_gdf_planar(staypoints))
+    return pd.Series(jumps, index=staypoints.index, name="jump_length")
+
+
+def visitation_frequency(staypoints):
+    """Count the visits of every location per user.
+
+    Parameters
+    ----------
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints with the column "location_id".
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by `('user_id', 'location_id')` with the columns "n_visits", "frequency" (share of the visits of the
+        user) and "rank" (1 for the most visited location of a user). Sorted by user and rank.
+
+    Examples
+    --------
+    >>> from trackintel.analysis.metrics import visitation_frequency
+    >>> freq = visitation_frequency(staypoints)
+    >>> freq.groupby("rank")["frequency"].mean()  # Zipf's law
+    """
+    visits = staypoints.groupby(["user_id", "location_id"]).size().rename("n_visits").to_frame()
+    visits["frequency"] = visits["n_visits"] / visits.groupby(level="user_id")["n_visits"].transform("sum")
+    visits["rank"] = visits.groupby(level="user_id")["n_visits"].rank(method="first", ascending=False).astype(int)
+    return visits.sort_values(["user_id", "rank"])
+
+
+def _jump_lengths(x, y, user_codes, geographic):
+    """Distance between consecutive points of the same user, NaN for the first point of every user."""
+    jumps = np.full(len(x), np.nan)
+    if len(x) < 2:
+        return jumps
+    if geographic:
+        d = haversine_dist(x[:-1], y[:-1], x[1:], y[1:])
+    else:
+        d = np.hypot(x[1:] - x[:-1], y[1:] - y[:-1])
+    jumps[1:] = np.where(user_codes[1:] == user_codes[:-1], d, np.nan)
+    return jumps
+
+
+def _metrics_chunk(x, y, jumps, loc_codes, group, geographic, metrics):
+    """Calculate the metrics of the consecutive groups of a chunk with grouped numpy reductions."""
+    group = group - group[0]
+    n_groups = group[-1] + 1
+    n = np.bincount(group, minlength=n_groups)
+    res = {}
+
+    if "radius_of_gyration" in metrics:
+        # center of mass in the coordinates (geographic: mean of longitude and latitude)
+        cx = np.bincount(group, weights=x, minlength=n_groups) / n
+        cy = np.bincount(group, weights=y, minlength=n_groups) / n
+        if geographic:
+            d = haversine_dist(x, y, cx[group], cy[group])
+        else:
+            d = np.hypot(x - cx[group], y - cy[group])
+        res["radius_of_gyration"] = np.sqrt(np.bincount(group, weights=d**2, minlength=n_groups) / n)
+
+    if "jump_length" in metrics:
+        has_jump = ~np.isnan(jumps)
+        jump_sum = np.bincount(group[has_jump], weights=jumps[has_jump], minlength=n_groups)
+        n_jumps = np.bincount(group[has_jump], minlength=n_groups)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            res["jump_length"] = jump_sum / n_jumps
+
+    if any(m in _LOCATION_METRICS for m in metrics):
+        has_loc = loc_codes >= 0
+        # visits per (group, location)
+        pairs, visits = np.unique(np.stack([group[has_loc], loc_codes[has_loc]]), axis=1, return_counts=True)
+        n_visits = np.bincount(pairs[0], weights=visits, minlength=n_groups)
+        n_locations = np.bincount(pairs[0], minlength=n_groups)
+        if "n_locations" in metrics:
+            res["n_locations"] = n_locations
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if "random_entropy" in metrics:
+                res["random_entropy"] = np.where(n_locations > 0, np.log2(n_locations), np.nan)
+            if "uncorrelated_entropy" in metrics:
+                p = visits / n_visits[pairs[0]]
+                entropy = -np.bincount(pairs[0], weights=p * np.log2(p), minlength=n_groups)
+                res["uncorrelated_entropy"] = np.where(n_visits > 0, entropy + 0.0, np.nan)
+        if "real_entropy" in metrics:
+            starts = np.searchsorted(group, np.arange(n_groups + 1))
+            sequences = (loc_codes[start:end] for start, end in zip(starts[:-1], starts[1:]))
+            res["real_entropy"] = np.array([_real_entropy(seq[seq >= 0].tolist()) for seq in sequences])
+    return res
+
+
+def _real_entropy(sequence):
+    """Lempel-Ziv estimate of the entropy rate of a sequence in bits.
+
+    The estimator is ``n log2(n) / sum(lambda_i)`` where lambda_i is the length of the shortest substring starting at
+    position i that does not appear in ``sequence[:i]`` [1].
+
+    The longest match of every position in its prefix is found with a suffix automaton of the prefix that is extended
+    by one element per position. The match of position i + 1 is the match of position i without its first element,
+    such that the matching and the construction take linear time together.
+
+    Parameters
+    ----------
+    sequence : list
+        Sequence of hashable elements.
+
+    Returns
+    -------
+    float
+
+    References
+    ----------
+    [1] Kontoyiannis, I., Algoet, P. H., Suhov, Y. M., & Wyner, A. J. (1998). Nonparametric entropy estimation for
+    stationary processes and random fields, with applications to English text. IEEE Transactions on Information
+    Theory, 44(3), 1319-1327.
+    """
+    n = len(sequence)
+    if n == 0:
+        return np.nan
+    # suffix automaton: length of the longest substring, suffix link and transitions of every state
+    length, link, trans = [0], [-1], [{}]
+    last = 0
+    v, l = 0, 0  # state and length of the match starting at position i
+    sum_lambda = 0
+    for i in range(n):
+        # extend the match of position i in the automaton of sequence[:i]
+        while i + l < n and sequence[i + l] in trans[v]:
+            v = trans[v][sequence[i + l]]
+            l += 1
+        sum_lambda += l + 1
+        # drop the first element -> match of position i + 1
+        if l > 0:
+            l -= 1
+            if l == length[link[v]]:
+                v = link[v]
+
+        # add sequence[i] to the automaton
+        c = sequence[i]
+        cur = len(length)
+        length.append(length[last] + 1)
+        link.append(0)
+        trans.append({})
+        p = last
+        while p != -1 and c not in trans[p]:
+            trans[p][c] = cur
+            p = link[p]
+        if p != -1:
+            q = trans[p][c]
+            if length[p] + 1 == length[q]:
+                link[cur] = q
+            else:
+                clone = len(length)
+                length.append(length[p] + 1)
+                link.append(link[q])
+                trans.append(dict(trans[q]))
+                while p != -1 and trans[p].get(c) == q:
+                    trans[p][c] = clone
+                    p = link[p]
+                link[q] = clone
+                link[cur] = clone
+                # the shorter substrings of q now belong to the clone
+                if v == q and l <= length[clone]:
+                    v = clone
+        last = cur
+    return n * np.log2(n) / sum_lambda
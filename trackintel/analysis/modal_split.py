@@ -1,9 +1,11 @@
+import numpy as np
 import pandas as pd
+from pandas.tseries.frequencies import is_superperiod
 
 from trackintel.geogr.distances import check_gdf_planar, calculate_haversine_length
 
 
-def calculate_modal_split(tpls, freq=None, metric="count", per_user=False, norm=False):
+def calculate_modal_split(tpls, freq=None, metric="count", per_user=False, norm=False, coordinates=None):
     """Calculate the modal split of triplegs
 
     Parameters
@@ -22,6 +24,9 @@ def calculate_modal_split(tpls, freq=None, metric="count", per_user=False, norm=
         If True the modal split is calculated per user
     norm : bool, default: False
         If True every row of the modal split is normalized to 1
+    coordinates : LineCoordinates, optional
+        The coordinates of the triplegs extracted with :func:`trackintel.geogr.coordinates.get_line_coordinates`, to
+        reuse them for the metric 'distance' of triplegs in WGS84. If None, they are extracted from the triplegs.
 
     Returns
     -------
@@ -35,6 +40,8 @@ def calculate_modal_split(tpls, freq=None, metric="count", per_user=False, norm=
 
         If `freq=None` and `per_user=False` are passed the modal split collapses to a single column.
 
+        Only the rows (users and time bins) that contain triplegs are returned, sorted by their index.
+
         The modal split can be visualized using :func:`trackintel.visualization.modal_split.plot_modal_split`
 
     Examples
@@ -43,41 +50,116 @@ def calculate_modal_split(tpls, freq=None, metric="count", per_user=False, norm=
     >>> tripleg.calculate_modal_split(freq='W-MON', metric='distance')
 
     """
-    tpls = tpls.copy()  # copy as we add additional columns on tpls
-
-    # count on mode, sum on length and duration
-    agg = "sum"
-    # calculate distance and duration if required
+    # only the needed columns are read, the triplegs (and their geometry) are never copied
     if metric == "distance":
-        tpls[metric] = _calculate_length(tpls)
+        values = np.asarray(_calculate_length(tpls, coordinates), dtype="float64")
     elif metric == "duration":
-        tpls[metric] = (tpls["finished_at"] - tpls["started_at"]).dt.total_seconds()
+        values = (tpls["finished_at"] - tpls["started_at"]).dt.total_seconds().to_numpy()
     elif metric == "count":
-        agg = "count"
-        metric = "mode"  # count on mode
+        values = None
     else:
         error_msg = f"Metric {metric} unknown, only metrics {{'count', 'distance', 'duration'}} are supported."
         raise AttributeError(error_msg)
 
-    group = []
+    mode_codes, modes = pd.factorize(tpls["mode"], sort=True)
+    valid = mode_codes >= 0
+    codes, levels, names = [], [], []
     if per_user:
-        group = ["user_id"]
-
+        user_codes, users = pd.factorize(tpls["user_id"], sort=True)
+        valid &= user_codes >= 0
+        codes.append(user_codes)
+        levels.append(users)
+        names.append("user_id")
     if freq is not None:
-        tpls.set_index("started_at", inplace=True)
-        tpls.index.name = "timestamp"
-        group.append(pd.Grouper(freq=freq))
-
-    modal_split = pd.pivot_table(tpls, index=group, columns=["mode"], aggfunc={metric: agg}, fill_value=0)
-    if group:  # non-empty group creates MultiIndex that we need to handle
-        modal_split.columns = modal_split.columns.droplevel(0)
+        bin_codes, bins = _get_time_bins(tpls["started_at"], freq)
+        valid &= bin_codes >= 0
+        codes.append(bin_codes)
+        levels.append(bins)
+        names.append("timestamp")
+
+    # combine user and time bin into a single row key
+    row = np.zeros(len(tpls), dtype="int64")
+    n_rows = 1
+    for code, level in zip(codes, levels):
+        row = row * len(level) + code
+        n_rows *= len(level)
+    row, mode_codes = row[valid], mode_codes[valid]
+    if values is not None:
+        values = np.nan_to_num(values[valid])
+
+    # only keep the rows with triplegs
+    if n_rows > 4 * len(row):  # sparse -> sort
+        row_ids, row = np.unique(row, return_inverse=True)
+    else:
+        observed = np.bincount(row, minlength=n_rows) > 0
+        row_ids = np.flatnonzero(observed)
+        row = (np.cumsum(observed) - 1)[row]
+
+    # count, sum of distance and duration with a single bincount over (row, mode)
+    modal_split = np.bincount(row * len(modes) + mode_codes, weights=values, minlength=len(row_ids) * len(modes))
+    modal_split = modal_split.reshape(len(row_ids), len(modes))
+    if values is None:  # counts are integers
+        modal_split = modal_split.astype("int64")
+
+    if levels:
+        arrays = []
+        for level in reversed(levels):
+            arrays.append(level[row_ids % len(level)])
+            row_ids = row_ids // len(level)
+        index = pd.MultiIndex.from_arrays(arrays[::-1], names=names) if len(arrays) > 1 else arrays[0].rename(names[0])
+    else:
+        # modal split collapses to a single row
+        index = pd.Index(["mode" if metric == "count" else metric])
+    modal_split = pd.DataFrame(modal_split, index=index, columns=pd.Index(modes, name="mode"))
 
     if norm:  # norm rows to 1
         return modal_split.div(modal_split.sum(axis=1), axis=0)
     return modal_split
 
 
-def _calculate_length(tpls):
+def _get_time_bins(started_at, freq):
+    """Assign the timestamps to the bins that `pd.Grouper(freq=freq)` would use.
+
+    Only the first and the last timestamp are resampled to get the bins, the timestamps are assigned with a binary
+    search instead of sorting them.
+
+    Parameters
+    ----------
+    started_at : pd.Series
+        Timestamps to bin.
+
+    freq : str
+        Frequency string passed to `pd.Grouper`.
+
+    Returns
+    -------
+    codes : np.array
+        Position of the bin of every timestamp, -1 for NaT.
+
+    bins : pd.DatetimeIndex
+        Labels of the bins.
+    """
+    started_at = pd.DatetimeIndex(started_at)
+    is_nat = started_at.isna()
+    if is_nat.all():
+        return np.full(len(started_at), -1), started_at[:0]
+    bounds = pd.Series(0, index=[started_at.min(), started_at.max()])
+    bins = bounds.resample(freq).size().index
+    grouper = pd.Grouper(freq=freq)
+    # bins are [label, next label) for closed="left" and (previous label, label] for closed="right"
+    if grouper.closed == "right":
+        edges = bins
+        if grouper.freq != "D" and is_superperiod(grouper.freq, "D"):
+            # like pandas, the whole day of the label belongs to the bin (e.g., Monday for "W-MON")
+            edges = (bins.tz_localize(None) + pd.Timedelta("1D") - pd.Timedelta("1ns")).tz_localize(bins.tz)
+        codes = np.searchsorted(edges.asi8, started_at.asi8, side="left")
+    else:
+        codes = np.searchsorted(bins.asi8, started_at.asi8, side="right") - 1
+    codes[is_nat] = -1
+    return codes, bins
+
+
+def _calculate_length(tpls, coordinates=None):
     """Help function to calculate length of tripleg.
 
     Checks if crs is planar or if not. If not uses ``calculate_haversine_length``.
@@ -85,7 +167,9 @@ def _calculate_length(tpls):
     Parameters
     ----------
     tpls : GeoDataFrame (as trackintel triplegs)
+    coordinates : LineCoordinates, optional
+        The coordinates of the triplegs, see :func:`trackintel.geogr.coordinates.get_line_coordinates`.
     """
     if check_gdf_planar(tpls):
         return tpls.length  # if planar use geopandas function
-    return pd.Series(calculate_haversine_length(tpls), index=tpls.index)
+    return calculate_haversine_length(tpls, coordinates=coordinates)
@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+
+from trackintel.analysis.modal_split import _get_time_bins
+
+
+def od_matrix(trips, staypoints, zones=None, freq=None, return_type="long", chunk_size=10000000):
+    """Aggregate trips into an origin-destination matrix between locations or zones.
+
+    Parameters
+    ----------
+    trips : GeoDataFrame (as trackintel trips) or iterable of DataFrames
+        Trips with the columns "origin_staypoint_id", "destination_staypoint_id" and (if `freq` is given)
+        "started_at". An iterable of DataFrames, e.g., from ``pd.read_csv(..., chunksize=...)``, is processed chunk by
+        chunk.
+
+    staypoints : GeoDataFrame (as trackintel staypoints)
+        Staypoints indexed by their id. Requires the column "location_id" if `zones` is not given.
+
+    zones : GeoDataFrame, optional
+        Zones (e.g., polygons of districts or grid cells) indexed by their id. The staypoints are assigned to the
+        zone they intersect with, staypoints on the border of several zones to the first of them. If not given the
+        trips are aggregated between the locations of the staypoints.
+
+    freq : str, optional
+        Frequency string of time windows, passed on as `freq` to the pandas.Grouper class and applied on
+        "started_at" of the trips. If `freq=None` all trips are aggregated together.
+
+    return_type : {'long', 'sparse'}, default 'long'
+        - 'long' : A DataFrame with one row per origin, destination (and time window) pair with trips.
+        - 'sparse' : A tuple of the zone ids and a ``scipy.sparse.csr_matrix`` of shape (len(ids), len(ids)), or
+          a dict of matrices per time window if `freq` is given.
+
+    chunk_size : int, default 10000000
+        Number of trips that are processed at once. The memory only grows with the chunk size and the number of
+        distinct origin-destination pairs.
+
+    Returns
+    -------
+    pd.DataFrame or tuple
+        For 'long' the columns ``['origin', 'destination', 'count']`` with the location or zone ids (and
+        'timestamp' after 'destination' if `freq` is given). Trips whose origin or destination has no location or
+        zone are not counted.
+
+    Examples
+    --------
+    >>> from trackintel.analysis.origin_destination import od_matrix
+    >>> od = od_matrix(trips, staypoints, zones=districts, freq="W-MON")
+    >>> ids, matrix = od_matrix(trips, staypoints, return_type="sparse")
+    """
+    if return_type not in ["long", "sparse"]:
+        raise AttributeError(f"return_type '{return_type}' is unknown. Supported values are ['long', 'sparse'].")
+    zone_ids, sp_zone = _get_staypoint_zones(staypoints, zones)
+    # -1 at the end for trips with unknown staypoints (get_indexer returns -1)
+    sp_zone = np.append(sp_zone, -1)
+    n_zones = len(zone_ids)
+
+    if isinstance(trips, pd.DataFrame):
+        chunks = (trips.iloc[start : start + chunk_size] for start in range(0, len(trips), chunk_size))
+    else:
+        chunks = iter(trips)
+
+    bins, origins, destinations, counts = [], [], [], []
+    for chunk in chunks:
+        origin = sp_zone[staypoints.index.get_indexer(chunk["origin_staypoint_id"])]
+        destination = sp_zone[staypoints.index.get_indexer(chunk["destination_staypoint_id"])]
+        if freq is not None:
+            bin_codes, bin_labels = _get_time_bins(chunk["started_at"], freq)
+        else:
+            bin_codes, bin_labels = np.zeros(len(chunk), dtype="int64"), pd.Index([0])
+        valid = (origin >= 0) & (destination >= 0) & (bin_codes >= 0)
+        # count the distinct (bin, origin, destination) triples of the chunk
+        key = (bin_codes[valid] * n_zones + origin[valid]) * n_zones + destination[valid]
+        key, count = np.unique(key, return_counts=True)
+        bins.append(bin_labels[key // (n_zones * n_zones)])
+        origins.append(key // n_zones % n_zones)
+        destinations.append(key % n_zones)
+        counts.append(count)
+
+    # merge the counts of the chunks
+    bins = bins[0].append(bins[1:]) if bins else pd.Index([])
+    bin_codes, bin_labels = pd.factorize(bins, sort=True)
+    key = (bin_codes.astype("int64") * n_zones + np.concatenate(origins or [[]]).astype("int64")) * n_zones
+    key += np.concatenate(destinations or [[]]).astype("int64")
+    key, inverse = np.unique(key, return_inverse=True)
+    count = np.bincount(inverse, weights=np.concatenate(counts or [[]]), minlength=len(key)).astype("int64")
+    bin_codes, origin, destination = key // (n_zones * n_zones), key // n_zones % n_zones, key % n_zones
+
+    if return_type == "sparse":
+        shape = (n_zones, n_zones)
+        if freq is None:
+            return zone_ids, coo_matrix((count, (origin, destination)), shape=shape).tocsr()
+        matrices = {}
+        for i, label in enumerate(bin_labels):
+            sel = bin_codes == i
+            matrices[label] = coo_matrix((count[sel], (origin[sel], destination[sel])), shape=shape).tocsr()
+        return zone_ids, matrices
+
+    # keys are sorted -> rows are sorted by time window and the positions of origin and destination
+    od = pd.DataFrame({"origin": zone_ids[origin], "destination": zone_ids[destination]})
+    if freq is not None:
+        od["timestamp"] = bin_labels[bin_codes]
+    od["count"] = count
+    return od
+
+
+def _get_staypoint_zones(staypoints, zones):
+    """Ids of the zones and the zone position of every staypoint (-1 if it has none)."""
+    if zones is None:
+        if "location_id" not in staypoints.columns:
+            raise KeyError(
+                "To aggregate trips between locations the staypoints must have a column named 'location_id' but it "
+                f"has [{', '.join(staypoints.columns)}]"
+            )
+        sp_zone, zone_ids = pd.factorize(staypoints["location_id"], sort=True)
+        return zone_ids, sp_zone
+
+    if staypoints.crs is not None and zones.crs is not None and staypoints.crs != zones.crs:
+        zones = zones.to_crs(staypoints.crs)
+    # bulk query of the spatial index of the zones with all staypoints
+    sp_pos, zone_pos = zones.sindex.query_bulk(staypoints.geometry, predicate="intersects")
+    sp_zone = np.full(len(staypoints), -1)
+    # sort by staypoint and zone -> reversed assignment keeps the first zone of every staypoint
+    order = np.lexsort((zone_pos, sp_pos))[::-1]
+    sp_zone[sp_pos[order]] = zone_pos[order]
+    return zones.index, sp_zone
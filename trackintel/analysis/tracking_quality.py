@@ -30,7 +30,9 @@ def temporal_tracking_quality(source, granularity="all"):
     Requires at least the following columns:
     ``['user_id', 'started_at', 'finished_at']``
     which means the function supports trackintel ``staypoints``, ``triplegs``, ``trips`` and ``tours``
-    datamodels and their combinations (e.g., staypoints and triplegs sequence).
+    datamodels and their combinations (e.g., staypoints and triplegs sequence). The durations of overlapping
+    records are summed up, use :class:`trackintel.analysis.coverage.CoverageIndex` to count overlaps only once and
+    to query the tracked time of arbitrary time windows.
 
     The temporal tracking quality is the ratio of tracking time and the total time extent. It is
     calculated and returned per-user in the defined ``granularity``. The time extents
@@ -76,104 +78,72 @@ def temporal_tracking_quality(source, granularity="all"):
             % (", ".join(required_columns), ", ".join(source.columns))
         )
 
-    df = source.copy()
-    df.reset_index(inplace=True)
-
     # filter out records with duration <= 0
-    df["duration"] = (df["finished_at"] - df["started_at"]).dt.total_seconds()
-    df = df.loc[df["duration"] > 0].copy()
+    df = source[required_columns]
+    df = df.loc[df["finished_at"] > df["started_at"]]
     # ensure proper handle of empty dataframes
     if len(df) == 0:
         warnings.warn(f"The input dataframe does not contain any record with positive duration. Please check.")
         return None
 
     if granularity == "all":
-        quality = df.groupby("user_id", as_index=False).apply(_get_tracking_quality_user, granularity)
-        return quality
-
-    # split records that span several days
-    df = _split_overlaps(df, granularity="day")
-    if granularity == "day":
-        grouper = pd.Grouper(key="started_at", freq="D")
-        column_name = "day"
-
-    elif granularity == "week":
-        grouper = pd.Grouper(key="started_at", freq="W")
-        column_name = "week_monday"
-
-    elif granularity == "weekday":
-        # get the tracked week relative to the first day
-        start_date = df["started_at"].min().date()
-        df["week"] = df["started_at"].apply(lambda x: (x.date() - start_date).days // 7)
-
-        grouper = df["started_at"].dt.weekday
-        column_name = "weekday"
-
-    elif granularity == "hour":
-        df = _split_overlaps(df, granularity="hour")
-        # get the tracked day relative to the first day
-        start_date = df["started_at"].min().date()
-        df["day"] = df["started_at"].apply(lambda x: (x.date() - start_date).days)
-
-        grouper = df["started_at"].dt.hour
-        column_name = "hour"
+        duration = (df["finished_at"] - df["started_at"]).dt.total_seconds()
+        grouped = df.assign(duration=duration).groupby("user_id")
+        extent = (grouped["finished_at"].max() - grouped["started_at"].min()).dt.total_seconds()
+        quality = grouped["duration"].sum() / extent
+        return quality.rename("quality").reset_index()
 
-    else:
+    if granularity not in ["day", "week", "weekday", "hour"]:
         raise AttributeError(
             f"granularity unknown. We only support ['all', 'day', 'week', 'weekday', 'hour']. You passed {granularity}"
         )
 
-    # calculate per-user per-grouper tracking quality
-    quality = df.groupby(["user_id", grouper]).apply(_get_tracking_quality_user, granularity).reset_index()
-
-    # rename and reorder
-    quality.rename(columns={"started_at": column_name}, inplace=True)
-    quality = quality[["user_id", column_name, "quality"]]
-
-    return quality
-
-
-def _get_tracking_quality_user(df, granularity="all"):
-    """
-    Tracking quality per-user per-granularity.
-
-    Parameters
-    ----------
-    df : GeoDataFrame (as trackintel datamodels)
-        The source dataframe
-
-    granularity : {"all", "day", "weekday", "week", "hour"}, default "all"
-        Determines the extent of the tracking. "all" the entire tracking period,
-        "day" and "weekday" a whole day, "week" a whole week, and "hour" a whole hour.
-
-    Returns
-    -------
-    pandas.Series
-        A pandas.Series object containing the tracking quality
-    """
-    tracked_duration = (df["finished_at"] - df["started_at"]).dt.total_seconds().sum()
-    if granularity == "all":
-        # the whole tracking period
-        extent = (df["finished_at"].max() - df["started_at"].min()).total_seconds()
-    elif granularity == "day":
-        # total seconds in a day
-        extent = 60 * 60 * 24
-    elif granularity == "weekday":
-        # total seconds in an day * number of tracked weeks
-        # (entries from multiple weeks may be grouped together)
-        extent = 60 * 60 * 24 * (df["week"].max() - df["week"].min() + 1)
+    # split records that span several days (or hours) into one piece per day (or hour)
+    freq = "H" if granularity == "hour" else "D"
+    record, time_bin, piece_start, piece_end = _split_into_bins(df["started_at"], df["finished_at"], freq)
+    duration = (piece_end - piece_start) / 1e9
+    day = time_bin // 24 if granularity == "hour" else time_bin
+    user_codes, users = pd.factorize(df["user_id"], sort=True)
+    user = user_codes[record]
+
+    # the key of each piece, and for weekday and hour the tracked week or day relative to the first day
+    relative = None
+    if granularity == "day":
+        key, column_name, extent = day, "day", 60 * 60 * 24
     elif granularity == "week":
-        # total seconds in a week
-        extent = 60 * 60 * 24 * 7
-    elif granularity == "hour":
-        # total seconds in an hour * number of tracked days
-        # (entries from multiple days may be grouped together)
-        extent = (60 * 60) * (df["day"].max() - df["day"].min() + 1)
+        # pieces are grouped into weeks from Monday to Sunday labelled by the Sunday (1970-01-01 is a Thursday)
+        key, column_name, extent = day + 6 - (day + 3) % 7, "week_monday", 60 * 60 * 24 * 7
+    elif granularity == "weekday":
+        key, column_name, extent = (day + 3) % 7, "weekday", 60 * 60 * 24
+        relative = (day - day.min()) // 7
     else:
-        raise AttributeError(
-            f"granularity unknown. We only support ['all', 'day', 'week', 'weekday', 'hour']. You passed {granularity}"
-        )
-    return pd.Series([tracked_duration / extent], index=["quality"])
+        key, column_name, extent = time_bin % 24, "hour", 60 * 60
+        relative = day - day.min()
+
+    # calculate per-user per-key tracking quality on the pieces sorted by group
+    key_min = key.min()
+    group = user.astype(np.int64) * (key.max() - key_min + 1) + (key - key_min)
+    order = np.argsort(group, kind="stable") if relative is None else np.lexsort((relative, group))
+    group = group[order]
+    first = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    last = np.r_[first[1:], len(group)] - 1
+    tracked = np.add.reduceat(duration[order], first)
+    if relative is not None:
+        # number of tracked weeks (days) between the first and the last one
+        relative = relative[order]
+        extent = extent * (relative[last] - relative[first] + 1)
+
+    group_key = key[order][first]
+    if granularity in ["day", "week"]:
+        group_key = _localize(group_key * NS_PER_BIN["D"], df["started_at"].dt.tz)
+    quality = pd.DataFrame(
+        {
+            "user_id": users[user[order][first]],
+            column_name: group_key,
+            "quality": tracked / extent,
+        }
+    )
+    return quality
 
 
 def _split_overlaps(source, granularity="day"):
@@ -195,38 +165,83 @@ def _split_overlaps(source, granularity="day"):
         The GeoDataFrame object after the splitting
     """
     freq = "H" if granularity == "hour" else "D"
-    gdf = source.copy()
-    gdf[["started_at", "finished_at"]] = gdf.apply(_get_times, axis="columns", result_type="expand", freq=freq)
-    # must call DataFrame.explode directly because GeoDataFrame.explode cannot be used on multiple columns
-    gdf = super(type(gdf), gdf).explode(["started_at", "finished_at"], ignore_index=True)
+    record, _, piece_start, piece_end = _split_into_bins(source["started_at"], source["finished_at"], freq)
+    gdf = source.iloc[record].reset_index(drop=True)
+    gdf["started_at"] = _localize_real(piece_start, source["started_at"].dt.tz)
+    gdf["finished_at"] = _localize_real(piece_end, source["finished_at"].dt.tz)
     if "duration" in gdf.columns:
         gdf["duration"] = gdf["finished_at"] - gdf["started_at"]
     return gdf
 
 
-def _get_times(row, freq="D"):
+NS_PER_BIN = {"D": 24 * 60 * 60 * 10**9, "H": 60 * 60 * 10**9}
+
+
+def _split_into_bins(started_at, finished_at, freq="D"):
     """
-    Returns the times for splitting range (start-finish) at frequency borders.
+    Split time ranges at the borders of days or hours.
 
-    Use it with `.apply()` for a single row of a DataFrame. Set result_type="expand".
+    The borders are the ones of the local (wall) time of the timestamps. All operations are vectorized
+    on int64 nanoseconds.
 
     Parameters
     ----------
-    row : Series
-        Row of dataframe with columns ["started_at", "finished_at"].
+    started_at, finished_at : Series of timestamps
+        Start and end of the time ranges.
 
-    freq : str or DateOffset, default 'D'
-        Pandas frequency string.
+    freq : {'D', 'H'}, default 'D'
+        Split at the borders of days or hours.
 
     Returns
     -------
-    Tuple of lists
-        Tuple of (start, end) times.
+    record : np.array
+        The position of the time range of every piece.
+
+    time_bin : np.array
+        The number of the day (hour) of every piece since 1970-01-01 in local time.
+
+    piece_start, piece_end : np.array
+        Start and end of every piece as nanoseconds since the epoch (UTC).
     """
-    result = []
-    if row["started_at"] != row["started_at"].ceil(freq):
-        result.append(row["started_at"])  # is not on border -> not included in date_range
-    result.extend(pd.date_range(row["started_at"].ceil(freq), row["finished_at"], freq=freq).to_list())
-    if (row["finished_at"] != result[-1]) or (len(result) == 1):  # len check for started_at == finished_at
-        result.append(row["finished_at"])  # is not on border -> not included in data_range
-    return result[:-1], result[1:]
+    bin_ns = NS_PER_BIN[freq]
+    tz = started_at.dt.tz
+    wall_start = _to_ns(started_at.dt.tz_localize(None) if tz is not None else started_at)
+    wall_end = _to_ns(finished_at.dt.tz_localize(None) if finished_at.dt.tz is not None else finished_at)
+    first_bin = wall_start // bin_ns
+    # a range that ends on a border does not reach into the next bin, empty ranges are kept as one piece
+    n_pieces = np.maximum((wall_end - 1) // bin_ns - first_bin + 1, 1)
+    record = np.repeat(np.arange(len(first_bin)), n_pieces)
+    piece_offset = np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+    time_bin = first_bin[record] + np.arange(len(record)) - piece_offset
+
+    # all pieces but the first start at a border, all but the last end at one
+    is_first = np.arange(len(record)) == piece_offset
+    piece_start = _to_ns(started_at)[record]
+    piece_start[~is_first] = _to_ns(_localize(time_bin[~is_first] * bin_ns, tz))
+    piece_end = _to_ns(finished_at)[record]
+    piece_end[:-1][~is_first[1:]] = piece_start[1:][~is_first[1:]]
+
+    # borders that do not exist in local time (change to daylight saving time) lead to empty pieces
+    keep = is_first | (piece_end > piece_start)
+    return record[keep], time_bin[keep], piece_start[keep], piece_end[keep]
+
+
+def _to_ns(timestamps):
+    """Nanoseconds since the epoch (UTC for timezone aware timestamps)."""
+    return np.asarray(timestamps.to_numpy(dtype="datetime64[ns]")).view(np.int64).copy()
+
+
+def _localize(wall_ns, tz):
+    """Timestamps from nanoseconds in local (wall) time, borders in a DST change are moved forward."""
+    timestamps = pd.DatetimeIndex(wall_ns.astype("datetime64[ns]"))
+    if tz is None:
+        return timestamps
+    return timestamps.tz_localize(tz, ambiguous=np.ones(len(timestamps), dtype=bool), nonexistent="shift_forward")
+
+
+def _localize_real(ns, tz):
+    """Timestamps from nanoseconds since the epoch in UTC, in timezone tz."""
+    timestamps = pd.DatetimeIndex(ns.astype("datetime64[ns]"))
+    if tz is None:
+        return timestamps
+    return timestamps.tz_localize("UTC").tz_convert(tz)
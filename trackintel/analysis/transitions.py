@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix, diags
+
+
+class LocationTransitions:
+    """Sparse location transition counts of a Markov model for next place prediction.
+
+    Every row of the matrix is a context: the last ``order`` visited locations and, optionally, the user and the time
+    of day. Every column is a location. The entry counts how often a context was followed by the location. Only the
+    observed contexts are stored, such that the matrix stays small for hundreds of thousands of locations.
+
+    Parameters
+    ----------
+    locations : array-like
+        Ids of the locations, in the order of the columns.
+
+    contexts : pd.MultiIndex
+        The contexts in the order of the rows with the levels ``['user_id']`` (if per user), ``['location_1', ...,
+        'location_k']`` (the last k locations, the most recent last) and ``['time_bin']`` (if time of day conditioned).
+        Must be sorted.
+
+    counts : scipy.sparse.csr_matrix
+        The transition counts of shape (len(contexts), len(locations)).
+
+    order : int, default 1
+        The number of previous locations of the context.
+
+    time_bins : int, optional
+        The number of equally long bins the day is divided into.
+
+    Examples
+    --------
+    >>> model = LocationTransitions.from_trips(trips, staypoints, order=2, per_user=True)
+    >>> model.predict_next([[home, work], [work, gym]], user_id=[0, 1], k=3)
+    """
+
+    def __init__(self, locations, contexts, counts, order=1, time_bins=None):
+        self.locations = pd.Index(locations)
+        self.contexts = contexts
+        self.counts = counts.tocsr()
+        self.order = order
+        self.time_bins = time_bins
+        if self.counts.shape != (len(contexts), len(self.locations)):
+            raise ValueError("The shape of counts must be (len(contexts), len(locations)).")
+        if contexts.nlevels != order + ("user_id" in contexts.names) + ("time_bin" in contexts.names):
+            raise ValueError("contexts must have one level per previous location plus 'user_id' and 'time_bin'.")
+
+    @property
+    def per_user(self):
+        return "user_id" in self.contexts.names
+
+    @classmethod
+    def from_trips(cls, trips, staypoints, order=1, time_bins=None, per_user=False):
+        """Count the location transitions of the trips.
+
+        The origin and destination locations of the trips are looked up with the origin and destination staypoints.
+        The context of a trip are the origins of the ``order`` last trips of the user (including the trip itself),
+        the trip is followed by its destination.
+
+        Parameters
+        ----------
+        trips : GeoDataFrame (as trackintel trips)
+
+        staypoints : GeoDataFrame (as trackintel staypoints)
+            Staypoints with the column "location_id".
+
+        order : int, default 1
+            The number of previous locations of the context.
+
+        time_bins : int, optional
+            If given, the day is divided into `time_bins` equally long bins of the local time and the transitions
+            are conditioned on the bin of the start of the trip.
+
+        per_user : bool, default False
+            If True the transitions are counted per user, otherwise over all users.
+
+        Returns
+        -------
+        LocationTransitions
+        """
+        if order < 1:
+            raise ValueError(f"order must be at least 1 but is {order}.")
+        if "location_id" not in staypoints.columns:
+            raise KeyError(
+                "To count transitions the staypoints must have a column named 'location_id' but it has "
+                f"[{', '.join(staypoints.columns)}]"
+            )
+        # sort by user and time
+        user_codes, users = pd.factorize(trips["user_id"], sort=True)
+        started_at = pd.DatetimeIndex(trips["started_at"])
+        trip_order = np.lexsort((started_at.asi8, user_codes))
+        user_codes, started_at = user_codes[trip_order], started_at[trip_order]
+
+        sp_locations = staypoints["location_id"]
+        origin = sp_locations.reindex(trips["origin_staypoint_id"]).to_numpy()[trip_order]
+        destination = sp_locations.reindex(trips["destination_staypoint_id"]).to_numpy()[trip_order]
+        codes, locations = pd.factorize(np.concatenate([origin, destination]), sort=True)
+        origin, destination = codes[: len(trips)], codes[len(trips) :]
+
+        # the context of trip j are the origins of the trips j - order + 1, ..., j of the same user
+        valid = destination >= 0
+        valid[: order - 1] = False
+        history = []
+        for lag in range(order - 1, -1, -1):
+            lagged = np.roll(origin, lag)
+            same_user = np.roll(user_codes, lag) == user_codes
+            valid &= (lagged >= 0) & same_user
+            history.append(lagged)
+
+        keys, names, levels = [], [], []
+        if per_user:
+            keys.append(user_codes)
+            names.append("user_id")
+            levels.append(users)
+        keys += history
+        names += [f"location_{i}" for i in range(1, order + 1)]
+        levels += [locations] * order
+        if time_bins is not None:
+            keys.append(_get_time_of_day_bin(started_at, time_bins))
+            names.append("time_bin")
+            levels.append(pd.RangeIndex(time_bins))
+
+        # one row per observed context, sorted
+        keys = np.stack([k[valid] for k in keys], axis=1)
+        context_keys, row = _unique_rows(keys, [len(level) for level in levels])
+        contexts = pd.MultiIndex.from_arrays(
+            [level[context_keys[:, i]] for i, level in enumerate(levels)],
+            names=names,
+        )
+        # duplicates are summed up during the conversion -> transition counts
+        counts = coo_matrix(
+            (np.ones(len(row), dtype="int64"), (row, destination[valid])),
+            shape=(len(contexts), len(locations)),
+        )
+        return cls(locations, contexts, counts, order=order, time_bins=time_bins)
+
+    def probabilities(self):
+        """Return the transition probabilities, i.e., the counts normalized per row.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+        """
+        row_sum = np.asarray(self.counts.sum(axis=1)).ravel()
+        return (diags(1 / row_sum) @ self.counts).tocsr()
+
+    def get_matrix(self, user_id=None, normalize=True):
+        """Return the transition matrix of a single user or of all contexts.
+
+        Parameters
+        ----------
+        user_id : optional
+            Only select the contexts of this user, requires a model per user.
+
+        normalize : bool, default True
+            If True return probabilities, otherwise counts.
+
+        Returns
+        -------
+        contexts : pd.MultiIndex
+            The contexts of the rows.
+
+        matrix : scipy.sparse.csr_matrix
+            Of shape (len(contexts), len(locations)).
+        """
+        matrix = self.probabilities() if normalize else self.counts
+        if user_id is None:
+            return self.contexts, matrix
+        if not self.per_user:
+            raise ValueError("The transitions are not counted per user, create them with per_user=True.")
+        # contexts are sorted by user -> rows of a user are consecutive
+        user_level = self.contexts.get_level_values("user_id")
+        start, end = user_level.searchsorted(user_id, side="left"), user_level.searchsorted(user_id, side="right")
+        return self.contexts[start:end], matrix[start:end]
+
+    def predict_next(self, history, user_id=None, time=None, k=1):
+        """Predict the most likely next locations for a batch of queries.
+
+        Parameters
+        ----------
+        history : array-like of shape (n,) or (n, order)
+            The last ``order`` locations of every query, the most recent last.
+
+        user_id : array-like of shape (n,), optional
+            The user of every query, required if the transitions are counted per user.
+
+        time : array-like of Timestamps of shape (n,), optional
+            The time of every query, required if the transitions are conditioned on the time of day.
+
+        k : int, default 1
+            Number of locations to predict per query.
+
+        Returns
+        -------
+        pd.DataFrame
+            The columns ``['next_location_1', ..., 'next_location_k']`` with the k most likely next locations (ties
+            are broken by the order of the locations) and ``['probability_1', ..., 'probability_k']`` with their
+            probabilities. Queries with an unknown context and contexts with less than k successors are filled
+            with NaN.
+        """
+        history = np.asarray(history, dtype=object)
+        if history.ndim == 1:
+            history = history[:, np.newaxis]
+        if history.shape[1] != self.order:
+            raise ValueError(f"history must contain the last {self.order} locations of every query.")
+        n = len(history)
+
+        query = [history[:, i] for i in range(self.order)]
+        if self.per_user:
+            if user_id is None:
+                raise ValueError("user_id is required as the transitions are counted per user.")
+            query.insert(0, np.broadcast_to(np.asarray(user_id, dtype=object), n))
+        if self.time_bins is not None:
+            if time is None:
+                raise ValueError("time is required as the transitions are conditioned on the time of day.")
+            query.append(_get_time_of_day_bin(pd.Series(time), self.time_bins))
+        rows = self.contexts.get_indexer(pd.MultiIndex.from_arrays(query))
+
+        # gather the successors of all found contexts and sort them by decreasing count
+        found = np.flatnonzero(rows >= 0)
+        starts, ends = self.counts.indptr[rows[found]], self.counts.indptr[rows[found] + 1]
+        n_successors = ends - starts
+        query_id = np.repeat(found, n_successors)
+        offsets = np.repeat(starts - np.cumsum(n_successors) + n_successors, n_successors)
+        pos = offsets + np.arange(n_successors.sum())
+        counts, columns = self.counts.data[pos], self.counts.indices[pos]
+        order = np.lexsort((columns, -counts, query_id))
+        rank = np.arange(len(order)) - np.repeat(np.cumsum(n_successors) - n_successors, n_successors)
+        keep = order[rank < k]
+        rank = rank[rank < k]
+
+        total = np.asarray(self.counts.sum(axis=1)).ravel()
+        next_location = np.full((n, k), -1)
+        probability = np.full((n, k), np.nan)
+        next_location[query_id[keep], rank] = columns[keep]
+        probability[query_id[keep], rank] = counts[keep] / total[rows[query_id[keep]]]
+
+        result = {}
+        locations = self.locations.to_numpy()
+        for i in range(k):
+            result[f"next_location_{i + 1}"] = np.where(
+                next_location[:, i] >= 0, locations[next_location[:, i]], np.nan
+            )
+        for i in range(k):
+            result[f"probability_{i + 1}"] = probability[:, i]
+        return pd.DataFrame(result)
+
+
+def _get_time_of_day_bin(timestamps, time_bins):
+    """Bin of the local time of day, the day is divided into time_bins equally long bins."""
+    timestamps = pd.DatetimeIndex(timestamps)
+    wall_ns = timestamps.tz_localize(None).asi8 if timestamps.tz is not None else timestamps.asi8
+    ns_of_day = wall_ns % (24 * 3600 * 10**9)
+    return ns_of_day * time_bins // (24 * 3600 * 10**9)
+
+
+def _unique_rows(keys, sizes):
+    """Sorted unique rows of non-negative integer keys and the position of every row in them.
+
+    The columns are combined into a single integer if the product of their sizes fits into int64, which is much
+    faster than ``np.unique(keys, axis=0)``.
+    """
+    if np.prod(np.asarray(sizes, dtype=float)) >= 2**63:
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        return unique, inverse.ravel()
+    combined = np.zeros(len(keys), dtype="int64")
+    for i, size in enumerate(sizes):
+        combined = combined * size + keys[:, i]
+    unique, inverse = np.unique(combined, return_inverse=True)
+    unique_keys = np.empty((len(unique), len(sizes)), dtype="int64")
+    for i, size in reversed(list(enumerate(sizes))):
+        unique_keys[:, i] = unique % size
+        unique //= size
+    return unique_keys, inverse
@@ -1,6 +1,12 @@
 from .distances import calculate_distance_matrix
+from .distances import neighbors
+from .distances import to_local_crs
+from .trajectory_distances import trajectory_similarity_search
 
 
 __all__ = [
     "calculate_distance_matrix",
+    "neighbors",
+    "to_local_crs",
+    "trajectory_similarity_search",
 ]
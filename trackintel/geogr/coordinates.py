@@ -0,0 +1,57 @@
+from collections import namedtuple
+
+import numpy as np
+import pygeos
+
+LineCoordinates = namedtuple("LineCoordinates", ["coords", "offsets", "segments"])
+
+
+def get_line_coordinates(gdf):
+    """
+    Extract the coordinates of all (Multi)LineStrings (or Points) into one flat array.
+
+    Pass the result as `coordinates` to several measures of the same geometries, e.g.,
+    :func:`trackintel.geogr.distances.calculate_haversine_length` and
+    :func:`trackintel.geogr.distances.calculate_bearing`, to extract the coordinates only once. The returned arrays
+    are read-only.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame or GeoSeries with LineString, MultiLineString or Point geometry
+
+    Returns
+    -------
+    LineCoordinates
+        Named tuple with the fields
+
+        - coords : np.array of shape (n_coordinates, 2), the coordinates of all geometries one after another.
+        - offsets : np.array of shape (len(gdf) + 1,), the coordinates of the i-th geometry are
+          ``coords[offsets[i]:offsets[i + 1]]``.
+        - segments : boolean np.array of shape (n_coordinates - 1,), True where ``coords[j]`` and ``coords[j + 1]``
+          are consecutive points of the same LineString.
+
+    Examples
+    --------
+    >>> from trackintel.geogr.coordinates import get_line_coordinates
+    >>> coords, offsets, segments = get_line_coordinates(triplegs)
+    >>> coordinates = get_line_coordinates(triplegs)
+    >>> length = calculate_haversine_length(triplegs, coordinates=coordinates)
+    >>> bearing = calculate_bearing(triplegs, coordinates=coordinates)
+    """
+    data = gdf.geometry.values.data
+    geoms = data if pygeos.is_geometry(data).any() else pygeos.from_shapely(data)
+    coords = pygeos.get_coordinates(geoms)
+    offsets = np.zeros(len(geoms) + 1, dtype=np.int64)
+    np.cumsum(pygeos.get_num_coordinates(geoms), out=offsets[1:])
+
+    # the last coordinate of every part does not start a segment
+    if (pygeos.get_type_id(geoms) >= 4).any():  # multi-part geometries
+        part_ends = np.cumsum(pygeos.get_num_coordinates(pygeos.get_parts(geoms)))
+    else:
+        part_ends = offsets[1:]
+    segments = np.ones(max(len(coords) - 1, 0), dtype=bool)
+    segments[part_ends[(part_ends > 0) & (part_ends < len(coords))] - 1] = False
+
+    for arr in (coords, offsets, segments):
+        arr.setflags(write=False)
+    return LineCoordinates(coords, offsets, segments)
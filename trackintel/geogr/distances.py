@@ -1,19 +1,32 @@
-import multiprocessing
 import warnings
-from functools import partial
-from math import cos, pi
+from math import pi
 
 import numpy as np
 import pandas as pd
 import pygeos
+import pyproj
+from scipy.sparse import csr_matrix
 from scipy.spatial.distance import cdist
 from sklearn.metrics import pairwise_distances
-import similaritymeasures
+from sklearn.neighbors import BallTree, KDTree
 
+from trackintel.geogr.coordinates import get_line_coordinates
 from trackintel.geogr.point_distances import haversine_dist
-
-
-def calculate_distance_matrix(X, Y=None, dist_metric="haversine", n_jobs=0, **kwds):
+from trackintel.geogr.trajectory_distances import trajectory_distance_matrix
+
+
+def calculate_distance_matrix(
+    X,
+    Y=None,
+    dist_metric="haversine",
+    n_jobs=0,
+    out=None,
+    dtype=np.float64,
+    block_size=1024,
+    max_distance=None,
+    window=None,
+    **kwds,
+):
     """
     Calculate a distance matrix based on a specific distance metric.
 
@@ -41,29 +54,63 @@ def calculate_distance_matrix(X, Y=None, dist_metric="haversine", n_jobs=0, **kw
         ‘kulsinski’, ‘mahalanobis’, ‘minkowski’, ‘rogerstanimoto’, ‘russellrao’, ‘seuclidean’, ‘sokalmichener’,
         ‘sokalsneath’, ‘sqeuclidean’, ‘yule’]`
 
-        For triplegs, common choice is 'dtw' or 'frechet'. This function uses the implementation
-        from similaritymeasures.
+        For triplegs, common choice is 'dtw' or 'frechet' (discrete Fréchet distance), both with the euclidean
+        distance between the coordinates. The coordinates are extracted once and all pairs are computed by a
+        vectorized kernel, see :func:`trackintel.geogr.trajectory_distances.trajectory_distances`.
 
     n_jobs: int
         Number of cores to use: 'dtw', 'frechet' and all distance metrics from `pairwise_distance` (only available
         if only X is given) are parallelized.
 
+    out: np.array or np.memmap, optional
+        Only for 'haversine', 'dtw' and 'frechet'. Array of shape (len(X), len(Y)) the distances are written into.
+        Pass a ``np.memmap`` to compute distance matrices that do not fit into memory.
+
+    dtype: np.dtype, default np.float64
+        Only for 'haversine', 'dtw' and 'frechet'. The precision of the returned matrix (and of the calculation for
+        'haversine'). ``np.float32`` halves the memory footprint.
+
+    block_size: int, default 1024
+        Only for 'haversine'. The matrix is computed in tiles of (block_size, block_size) to bound the memory used
+        for intermediate results.
+
+    max_distance: float, optional
+        Only for 'haversine', 'dtw' and 'frechet'. If given, a sparse matrix (``scipy.sparse.csr_matrix``) is
+        returned that only contains the pairs with a distance smaller or equal to `max_distance` (in meters for
+        'haversine'). Pairs with a distance of zero are stored explicitly. For 'dtw' and 'frechet', the computation
+        of a pair is abandoned early as soon as its distance is known to exceed `max_distance`.
+
+    window: int, optional
+        Only for 'dtw' and 'frechet'. Radius of the Sakoe-Chiba band in number of points, i.e., how far the warping
+        path may deviate from the diagonal. Restricting the warping path makes the calculation faster.
+
     **kwds:
-        optional keywords passed to the distance functions.
+        optional keywords passed to the distance functions. For 'dtw', `metric` sets the distance between two
+        coordinates, out of {'euclidean', 'cityblock', 'chebyshev', 'minkowski'} (with the order `p`). For 'frechet',
+        `p` sets the order of the Minkowski distance between two coordinates. Other keywords raise a TypeError.
 
     Returns
     -------
-    D: np.array
+    D: np.array or scipy.sparse.csr_matrix
         matrix of shape (len(X), len(X)) or of shape (len(X), len(Y)) if Y is provided.
 
     Examples
     --------
     >>> calculate_distance_matrix(staypoints, dist_metric="haversine")
     >>> calculate_distance_matrix(triplegs_1, triplegs_2, dist_metric="dtw")
+    >>> out = np.memmap("distances.dat", dtype=np.float32, mode="w+", shape=(len(staypoints), len(staypoints)))
+    >>> calculate_distance_matrix(staypoints, dist_metric="haversine", out=out, dtype=np.float32)
+    >>> calculate_distance_matrix(staypoints, dist_metric="haversine", max_distance=500)
     """
     geom_type = X.geometry.iat[0].geom_type
+    symmetric = Y is None
     if Y is None:
         Y = X
+    if dist_metric not in ["haversine", "dtw", "frechet"] and (out is not None or max_distance is not None):
+        raise AttributeError(
+            "The arguments 'out' and 'max_distance' are only supported for dist_metric 'haversine', 'dtw' and "
+            "'frechet'."
+        )
     assert Y.geometry.iat[0].geom_type == Y.geometry.iat[0].geom_type, (
         "x and y need same geometry type " "(only first column checked)"
     )
@@ -75,32 +122,7 @@ def calculate_distance_matrix(X, Y=None, dist_metric="haversine", n_jobs=0, **kw
         y2 = Y.geometry.y.values
 
         if dist_metric == "haversine":
-            # create point pairs for distance calculation
-            nx = len(X)
-            ny = len(Y)
-
-            # if y != x they could have different dimensions
-            if ny >= nx:
-                ix_1, ix_2 = np.triu_indices(nx, k=1, m=ny)
-                trilix = np.tril_indices(nx, k=-1, m=ny)
-            else:
-                ix_1, ix_2 = np.tril_indices(nx, k=-1, m=ny)
-                trilix = np.triu_indices(nx, k=1, m=ny)
-
-            x1 = x1[ix_1]
-            y1 = y1[ix_1]
-            x2 = x2[ix_2]
-            y2 = y2[ix_2]
-
-            d = haversine_dist(x1, y1, x2, y2)
-
-            D = np.zeros((nx, ny))
-            D[(ix_1, ix_2)] = d
-
-            # mirror triangle matrix to be conform with scikit-learn format and to
-            # allow for non-symmetric distances in the future
-            D[trilix] = D.T[trilix]
-
+            D = _haversine_matrix_blockwise(x1, y1, x2, y2, symmetric, out, dtype, block_size, max_distance)
         else:
             xy1 = np.concatenate((x1.reshape(-1, 1), y1.reshape(-1, 1)), axis=1)
 
@@ -115,49 +137,33 @@ def calculate_distance_matrix(X, Y=None, dist_metric="haversine", n_jobs=0, **kw
     elif geom_type == "LineString":
 
         if dist_metric in ["dtw", "frechet"]:
-            # these are the preparation steps for all distance functions based only on coordinates
-
-            if dist_metric == "dtw":
-                d_fun = partial(similaritymeasures.dtw, **kwds)
-            else:
-                d_fun = partial(similaritymeasures.frechet_dist, **kwds)
-
-            # get combinations of distances that have to be calculated
-            nx = len(X)
-            ny = len(Y)
-
-            if ny >= nx:
-                ix_1, ix_2 = np.triu_indices(nx, k=1, m=ny)
-                trilix = np.tril_indices(nx, k=-1, m=ny)
-            else:
-                ix_1, ix_2 = np.tril_indices(nx, k=-1, m=ny)
-                trilix = np.triu_indices(nx, k=1, m=ny)
-
-            # get the coordinates as list of each LineString
-            left = list(X.iloc[ix_1].geometry.apply(lambda x: x.coords))
-            right = list(Y.iloc[ix_2].geometry.apply(lambda x: x.coords))
-
-            # map the combinations to the distance function
-            if n_jobs == -1 or n_jobs > 1:
-                if n_jobs == -1:
-                    n_jobs = multiprocessing.cpu_count()
-                with multiprocessing.Pool(processes=n_jobs) as pool:
-                    left_right = list(zip(left, right))
-                    res = list(pool.starmap(d_fun, left_right))
-            else:
-                res = list(map(d_fun, left, right))
-
-            if dist_metric == "dtw":
-                # the first return is the dtw distance, see docs of similaritymeasures.dtw
-                d = [dist[0] for dist in res]
-            else:
-                d = res
+            p = _get_trajectory_p(dist_metric, **kwds)
+            nx, ny = len(X), len(Y)
+            n_jobs = 1 if n_jobs == 0 else n_jobs
+            if max_distance is None:
+                # the workers write their rows (and the mirrored columns) directly into the matrix
+                D = _get_out(out, (nx, ny), dtype)
+                return trajectory_distance_matrix(
+                    X, None if symmetric else Y, metric=dist_metric, n_jobs=n_jobs, window=window, p=p, out=D
+                )
+
+            rows, cols, d = trajectory_distance_matrix(
+                X,
+                None if symmetric else Y,
+                metric=dist_metric,
+                n_jobs=n_jobs,
+                window=window,
+                max_distance=max_distance,
+                p=p,
+            )
+            if symmetric:
+                # mirror the upper triangle and add the diagonal
+                diag = np.arange(nx)
+                rows, cols = np.concatenate([rows, cols, diag]), np.concatenate([cols, rows, diag])
+                d = np.concatenate([d, d, np.zeros(nx)])
 
-            # write results to (symmetric) distance matrix
-            D = np.zeros((nx, ny))
-            D[(ix_1, ix_2)] = d
-            D[trilix] = D.T[trilix]
-            return D
+            within = d <= max_distance
+            return csr_matrix((d[within].astype(dtype), (rows[within], cols[within])), shape=(nx, ny))
 
         else:
             raise AttributeError(
@@ -167,29 +173,228 @@ def calculate_distance_matrix(X, Y=None, dist_metric="haversine", n_jobs=0, **kw
         raise AttributeError(f"We only support 'Point' and 'LineString'. Your geometry is {geom_type}")
 
 
+def _get_trajectory_p(dist_metric, metric=None, p=None, **kwds):
+    """Order of the Minkowski distance between two coordinates for the 'dtw' and 'frechet' options."""
+    if dist_metric == "frechet" and metric is not None:
+        kwds["metric"] = metric
+    if dist_metric == "dtw" and p is not None and metric != "minkowski":
+        kwds["p"] = p
+    if kwds:
+        raise TypeError(f"Unexpected keyword arguments {list(kwds)} for dist_metric '{dist_metric}'.")
+    if dist_metric == "frechet" or metric == "minkowski":
+        return 2 if p is None else p
+    orders = {"euclidean": 2, "cityblock": 1, "chebyshev": np.inf}
+    if metric is not None and metric not in orders:
+        raise AttributeError(f"metric '{metric}' is unknown. Supported values are {list(orders) + ['minkowski']}.")
+    return orders[metric or "euclidean"]
+
+
+def _get_out(out, shape, dtype):
+    """Return a new array of shape or check the shape of the caller-provided array."""
+    if out is None:
+        return np.empty(shape, dtype=dtype)
+    if out.shape != shape:
+        raise ValueError(f"out must be of shape {shape}, but has shape {out.shape}.")
+    return out
+
+
+def _haversine_matrix_blockwise(x1, y1, x2, y2, symmetric, out, dtype, block_size, max_distance, r=6371000):
+    """Compute the haversine distance matrix tile by tile.
+
+    Only the tiles of shape (block_size, block_size) are kept in memory. If the matrix is symmetric, only the tiles
+    of the upper triangle are calculated and mirrored.
+
+    Parameters
+    ----------
+    x1, y1 : np.array
+        Longitude and latitude of the points in X (rows).
+    x2, y2 : np.array
+        Longitude and latitude of the points in Y (columns).
+    symmetric : bool
+        True if X and Y are the same points.
+    out : np.array, optional
+    dtype : np.dtype
+    block_size : int
+    max_distance : float, optional
+    r : float, default 6371000
+        Radius of the reference sphere.
+
+    Returns
+    -------
+    D: np.array or scipy.sparse.csr_matrix
+    """
+    nx, ny = len(x1), len(x2)
+    lon_1, lat_1 = np.deg2rad(x1).astype(dtype), np.deg2rad(y1).astype(dtype)
+    lon_2, lat_2 = np.deg2rad(x2).astype(dtype), np.deg2rad(y2).astype(dtype)
+    cos_lat_1, cos_lat_2 = np.cos(lat_1), np.cos(lat_2)
+
+    if max_distance is None:
+        out = _get_out(out, (nx, ny), dtype)
+    else:
+        rows, cols, data = [], [], []
+
+    for i in range(0, nx, block_size):
+        i_end = min(i + block_size, nx)
+        for j in range(i if symmetric else 0, ny, block_size):
+            j_end = min(j + block_size, ny)
+            # haversine formula, which is (unlike the law of cosines) also precise for small distances in float32
+            sin_lat_d = np.sin((lat_1[i:i_end, None] - lat_2[None, j:j_end]) / 2)
+            sin_lon_d = np.sin((lon_1[i:i_end, None] - lon_2[None, j:j_end]) / 2)
+            tile = sin_lat_d**2 + cos_lat_1[i:i_end, None] * cos_lat_2[None, j:j_end] * sin_lon_d**2
+            # rounding errors can lead to values slightly outside of the domain of arcsin
+            tile = 2 * r * np.arcsin(np.sqrt(np.clip(tile, 0, 1, out=tile), out=tile), out=tile)
+            if symmetric and i == j:
+                np.fill_diagonal(tile, 0)
+
+            if max_distance is None:
+                out[i:i_end, j:j_end] = tile
+                if symmetric and i != j:
+                    out[j:j_end, i:i_end] = tile.T
+                continue
+            tile_rows, tile_cols = np.nonzero(tile <= max_distance)
+            rows.append(tile_rows + i)
+            cols.append(tile_cols + j)
+            data.append(tile[tile_rows, tile_cols])
+            if symmetric and i != j:
+                rows.append(tile_cols + j)
+                cols.append(tile_rows + i)
+                data.append(data[-1])
+
+    if max_distance is None:
+        return out
+    if len(data) == 0:
+        return csr_matrix((nx, ny), dtype=dtype)
+    return csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=(nx, ny))
+
+
+def neighbors(X, Y=None, radius=None, k=None, metric="haversine", return_type="csr"):
+    """
+    Find the neighbors of points within a radius or the k nearest neighbors.
+
+    The neighbors are queried from a KD-tree (for 'haversine' on the points mapped onto the unit sphere) or a
+    BallTree for other metrics. In contrast to :func:`calculate_distance_matrix`, only the distances of the neighbors
+    are calculated and stored.
+
+    Parameters
+    ----------
+    X : GeoDataFrame (as trackintel staypoints or locations)
+        The points to find the neighbors for.
+
+    Y : GeoDataFrame (as trackintel staypoints or locations), optional
+        The candidate neighbors. If not given, the neighbors are searched in X and each point is its own neighbor.
+
+    radius : float, optional
+        Return all neighbors with a distance smaller or equal to radius. For 'haversine' the unit is meters.
+
+    k : int, optional
+        Return the k nearest neighbors. Exactly one of `radius` or `k` must be given.
+
+    metric : str, default 'haversine'
+        'haversine' for WGS84 coordinates, 'euclidean' for projected coordinates or any other metric supported by
+        ``sklearn.neighbors.BallTree``.
+
+    return_type : {'csr', 'list'}, default 'csr'
+        - 'csr' : A ``scipy.sparse.csr_matrix`` of shape (len(X), len(Y)) with the distances to the neighbors. Each \
+            row is sorted by distance, distances of zero are stored explicitly.
+        - 'list' : A tuple (distances, indices) of lists, containing for each point in X the array of distances \
+            and the array of positional indices of its neighbors in Y, sorted by distance.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix or tuple of lists
+
+    Examples
+    --------
+    >>> neighbors(staypoints, radius=100)
+    >>> neighbors(staypoints, locations, k=1, return_type="list")
+    >>> staypoints.as_staypoints.neighbors(radius=100)
+    """
+    if (radius is None) == (k is None):
+        raise ValueError("Exactly one of the arguments 'radius' or 'k' must be given.")
+    if return_type not in ["csr", "list"]:
+        raise AttributeError(f"return_type '{return_type}' is unknown. Supported values are ['csr', 'list'].")
+    if Y is None:
+        Y = X
+
+    # for 'haversine' the query radius is the chord on the unit sphere
+    p_x, chord = _to_cartesian(X.geometry, 0 if radius is None else radius, metric)
+    p_y, _ = _to_cartesian(Y.geometry, 0, metric)
+    if metric in ["haversine", "euclidean"]:
+        tree = KDTree(p_y)
+    else:
+        tree = BallTree(p_y, metric=metric)
+
+    if radius is not None:
+        indices, distances = tree.query_radius(p_x, chord, return_distance=True, sort_results=True)
+        lengths = np.fromiter((len(ind) for ind in indices), dtype=np.int64, count=len(indices))
+        indices = np.concatenate(indices) if len(indices) > 0 else np.empty(0, dtype=np.int64)
+        distances = np.concatenate(distances) if len(distances) > 0 else np.empty(0)
+    else:
+        k = min(k, len(Y))
+        distances, indices = tree.query(p_x, k=k)
+        lengths = np.full(len(X), k, dtype=np.int64)
+        indices, distances = indices.ravel(), distances.ravel()
+
+    if metric == "haversine":
+        # convert chord length to great circle distance
+        distances = 2 * 6371000 * np.arcsin(np.clip(distances / 2, 0, 1))
+
+    indptr = np.append(0, np.cumsum(lengths))
+    if return_type == "list":
+        return np.split(distances, indptr[1:-1]), np.split(indices, indptr[1:-1])
+    return csr_matrix((distances, indices, indptr), shape=(len(X), len(Y)))
+
+
+def _to_cartesian(geometry, epsilon, distance_metric):
+    """Get point coordinates and epsilon for euclidean neighborhood queries.
+
+    For 'haversine', the points are mapped onto the unit sphere. The chord length is monotonous in the great circle
+    distance, therefore an euclidean query with the chord of epsilon returns exactly the haversine neighborhood.
+
+    Parameters
+    ----------
+    geometry : GeoSeries of Points
+    epsilon : float
+    distance_metric : str
+        Coordinates for other metrics than 'haversine' are returned unchanged.
+
+    Returns
+    -------
+    p : np.array of shape (n, 3) for 'haversine' or (n, 2) otherwise
+    radius : float
+    """
+    x = geometry.x.to_numpy()
+    y = geometry.y.to_numpy()
+    if distance_metric == "haversine":
+        lon, lat = np.deg2rad(x), np.deg2rad(y)
+        p = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+        return p, 2 * np.sin(epsilon / 6371000 / 2)
+    return np.column_stack([x, y]), epsilon
+
+
 def meters_to_decimal_degrees(meters, latitude):
     """
     Convert meters to decimal degrees (approximately).
 
     Parameters
     ----------
-    meters : float
+    meters : float or np.array
         The meters to convert to degrees.
 
-    latitude : float
+    latitude : float or np.array
         As the conversion is dependent (approximatively) on the latitude where
         the conversion happens, this needs to be specified. Use 0 for the equator.
 
     Returns
     -------
-    float
+    float or np.array
         An approximation of a distance (given in meters) in degrees.
 
     Examples
     --------
     >>> meters_to_decimal_degrees(500.0, 47.410)
     """
-    return meters / (111.32 * 1000.0 * cos(latitude * (pi / 180.0)))
+    return meters / (111.32 * 1000.0 * np.cos(latitude * (pi / 180.0)))
 
 
 def check_gdf_planar(gdf, transform=False):
@@ -232,28 +437,165 @@ def check_gdf_planar(gdf, transform=False):
     return not (gdf.crs is None or gdf.crs.is_geographic)
 
 
-def calculate_haversine_length(gdf):
+def to_local_crs(gdf):
+    """
+    Project a GeoDataFrame into the UTM zone of its data.
+
+    All functions that check for a planar CRS with :func:`check_gdf_planar` then compute cheap euclidean distances
+    in meters instead of haversine distances. Results can be mapped back with ``.to_crs(gdf.crs)``.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame
+        Input GeoDataFrame. A missing CRS is assumed to be WGS84.
+
+    Returns
+    -------
+    GeoDataFrame
+        The projected GeoDataFrame, or the input if it already has a planar CRS.
+
+    Notes
+    -----
+    A single UTM zone is used for the whole dataset, the zone of the center of its bounds (the same zone as
+    :func:`get_planar_coordinates`). For data spanning several zones, the distortion grows
+    with the distance to the zone, use :func:`get_planar_coordinates` with ``by`` to project groups separately.
+
+    Examples
+    --------
+    >>> pfs_utm = ti.geogr.to_local_crs(pfs)
+    >>> pfs_utm, sp_utm = pfs_utm.as_positionfixes.generate_staypoints(distance_metric="euclidean")
+    >>> sp = sp_utm.to_crs(pfs.crs)
+    """
+    if check_gdf_planar(gdf):
+        return gdf
+    _, gdf = check_gdf_planar(gdf, transform=True)
+    return gdf.to_crs(epsg=_utm_epsg(gdf.total_bounds))
+
+
+def get_planar_coordinates(gdf, by=None):
+    """
+    Get the coordinates of points in a local metric coordinate system.
+
+    Points in a geographic CRS are projected into the UTM zone of the data, optionally per group.
+    Points in a planar CRS are returned as they are.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame with Point geometries
+        Input GeoDataFrame. A missing CRS is assumed to be WGS84.
+
+    by : str or list of str, optional
+        Columns to group the points by, e.g. 'user_id'. Every group is projected into its own UTM zone.
+
+    Returns
+    -------
+    np.array of shape (len(gdf), 2)
+        The x and y coordinates in the order of ``gdf``.
+
+    Examples
+    --------
+    >>> from trackintel.geogr.distances import get_planar_coordinates
+    >>> xy = get_planar_coordinates(pfs, by="user_id")
+    """
+    if check_gdf_planar(gdf):
+        return np.column_stack([gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()])
+    _, gdf = check_gdf_planar(gdf, transform=True)
+
+    lon, lat = gdf.geometry.x.to_numpy(), gdf.geometry.y.to_numpy()
+    groups = [np.arange(len(gdf))] if by is None else gdf.groupby(by, sort=False).indices.values()
+    xy = np.empty((len(gdf), 2))
+    for pos in groups:
+        bounds = [np.nanmin(lon[pos]), np.nanmin(lat[pos]), np.nanmax(lon[pos]), np.nanmax(lat[pos])]
+        transformer = pyproj.Transformer.from_crs(gdf.crs, _utm_epsg(bounds), always_xy=True)
+        xy[pos, 0], xy[pos, 1] = transformer.transform(lon[pos], lat[pos])
+    return xy
+
+
+def _utm_epsg(bounds):
+    """EPSG code of the UTM zone containing the center of the WGS84 bounds (without the zone exceptions).
+
+    The single rule of the local CRS, used by :func:`to_local_crs` and :func:`get_planar_coordinates`.
+    """
+    minx, miny, maxx, maxy = bounds
+    lon_c = (minx + maxx) / 2
+    lat_c = (miny + maxy) / 2
+    zone = min(int((lon_c + 180) // 6) + 1, 60)
+    return (32600 if lat_c >= 0 else 32700) + zone
+
+
+def calculate_haversine_length(gdf, coordinates=None):
     """
     Calculate the length of linestrings using the haversine distance.
 
     Parameters
     ----------
-    gdf : GeoDataFrame with linestring geometry
+    gdf : GeoDataFrame with LineString or MultiLineString geometry
         The coordinates are expected to be in WGS84
 
+    coordinates : LineCoordinates, optional
+        The coordinates of `gdf` extracted with :func:`trackintel.geogr.coordinates.get_line_coordinates`. If None,
+        they are extracted from `gdf`.
+
     Returns
     -------
-    length: np.array
-        The length of each linestring in meters
+    length: pd.Series
+        The length of each linestring in meters, with the index of gdf.
 
     Examples
     --------
     >>> from trackintel.geogr.distances import calculate_haversine_length
     >>> triplegs['length'] = calculate_haversine_length(triplegs)
     """
-    geom = pygeos.from_shapely(gdf.geometry)
-    assert np.any(pygeos.get_type_id(geom) == 1)  # 1 is LineStrings
-    geom, index = pygeos.get_coordinates(geom, return_index=True)
-    no_mix = index[:-1] == index[1:]  # mask where LineStrings are not overlapping
-    dist = haversine_dist(geom[:-1, 0], geom[:-1, 1], geom[1:, 0], geom[1:, 1])
-    return np.bincount((index[:-1])[no_mix], weights=dist[no_mix])
+    coords, offsets, segments = get_line_coordinates(gdf) if coordinates is None else coordinates
+    # dist[j] is the distance from coordinate j - 1 to j if they are in the same LineString
+    dist = np.zeros(len(coords))
+    if len(coords) > 1:
+        dist[1:] = haversine_dist(coords[:-1, 0], coords[:-1, 1], coords[1:, 0], coords[1:, 1])
+        dist[1:][~segments] = 0
+    cum_dist = np.cumsum(dist)
+    non_empty = offsets[1:] > offsets[:-1]
+    length = np.zeros(len(gdf))
+    length[non_empty] = cum_dist[offsets[1:][non_empty] - 1] - cum_dist[offsets[:-1][non_empty]]
+    return pd.Series(length, index=gdf.index)
+
+
+def calculate_bearing(gdf, coordinates=None):
+    """
+    Calculate the bearing from the first to the last point of linestrings.
+
+    Parameters
+    ----------
+    gdf : GeoDataFrame with LineString or MultiLineString geometry
+        For a geographic CRS the initial bearing of the great circle is returned, for a planar CRS the bearing
+        on the plane.
+
+    coordinates : LineCoordinates, optional
+        The coordinates of `gdf` extracted with :func:`trackintel.geogr.coordinates.get_line_coordinates`. If None,
+        they are extracted from `gdf`.
+
+    Returns
+    -------
+    bearing : pd.Series
+        The bearing in degrees clockwise from north in [0, 360), NaN for empty geometries. The index is the one of gdf.
+
+    Examples
+    --------
+    >>> from trackintel.geogr.distances import calculate_bearing
+    >>> triplegs['bearing'] = calculate_bearing(triplegs)
+    """
+    coords, offsets, _ = get_line_coordinates(gdf) if coordinates is None else coordinates
+    non_empty = offsets[1:] > offsets[:-1]
+    start = coords[offsets[:-1][non_empty]]
+    end = coords[offsets[1:][non_empty] - 1]
+    if check_gdf_planar(gdf):
+        angle = np.arctan2(end[:, 0] - start[:, 0], end[:, 1] - start[:, 1])
+    else:
+        lon_1, lat_1 = np.deg2rad(start[:, 0]), np.deg2rad(start[:, 1])
+        lon_2, lat_2 = np.deg2rad(end[:, 0]), np.deg2rad(end[:, 1])
+        d_lon = lon_2 - lon_1
+        y = np.sin(d_lon) * np.cos(lat_2)
+        x = np.cos(lat_1) * np.sin(lat_2) - np.sin(lat_1) * np.cos(lat_2) * np.cos(d_lon)
+        angle = np.arctan2(y, x)
+    bearing = np.full(len(gdf), np.nan)
+    bearing[non_empty] = np.rad2deg(angle) % 360
+    return pd.Series(bearing, index=gdf.index)
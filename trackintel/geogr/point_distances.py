@@ -1,6 +1,10 @@
-import numpy as np
+from collections import namedtuple
 import math
 
+import numpy as np
+
+PreparedPoints = namedtuple("PreparedPoints", ["lon", "lat", "cos_lat"])
+
 
 def haversine_dist(lon_1, lat_1, lon_2, lat_2, r=6371000, float_flag=False):
     """
@@ -34,6 +38,11 @@ def haversine_dist(lon_1, lat_1, lon_2, lat_2, r=6371000, float_flag=False):
     float or numpy.array
         An approximation of the distance between two points in WGS84 given in meters.
 
+    Notes
+    -----
+    The haversine formula is used instead of the spherical law of cosines, as the latter loses
+    precision for distances of a few meters.
+
     Examples
     --------
     >>> haversine_dist(8.5, 47.3, 8.7, 47.2)
@@ -49,22 +58,132 @@ def haversine_dist(lon_1, lat_1, lon_2, lat_2, r=6371000, float_flag=False):
         lat_1 = math.radians(lat_1)
         lon_2 = math.radians(lon_2)
         lat_2 = math.radians(lat_2)
-
-        cos_lat2 = math.cos(lat_2)
-        cos_lat1 = math.cos(lat_1)
-        cos_lat_d = math.cos(lat_1 - lat_2)
-        cos_lon_d = math.cos(lon_1 - lon_2)
-
-        return r * math.acos(cos_lat_d - cos_lat1 * cos_lat2 * (1 - cos_lon_d))
+        return _haversine_scalar(lon_1, lat_1, math.cos(lat_1), lon_2, lat_2, math.cos(lat_2), r)
 
     lon_1 = np.deg2rad(lon_1).ravel()
     lat_1 = np.deg2rad(lat_1).ravel()
     lon_2 = np.deg2rad(lon_2).ravel()
     lat_2 = np.deg2rad(lat_2).ravel()
 
-    cos_lat1 = np.cos(lat_1)
-    cos_lat2 = np.cos(lat_2)
-    cos_lat_d = np.cos(lat_1 - lat_2)
-    cos_lon_d = np.cos(lon_1 - lon_2)
+    a = np.sin((lat_2 - lat_1) / 2) ** 2 + np.cos(lat_1) * np.cos(lat_2) * np.sin((lon_2 - lon_1) / 2) ** 2
+    return 2 * r * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def prepare_points(lon, lat, dtype=np.float64):
+    """
+    Precompute the radians and the cosine of the latitude of points in WGS84.
+
+    The result can be reused across repeated calls of :func:`prepared_dist` to avoid converting
+    the coordinates in every call.
+
+    Parameters
+    ----------
+    lon : float or array-like
+        The longitudes of the points.
+
+    lat : float or array-like
+        The latitudes of the points.
 
-    return r * np.arccos(cos_lat_d - cos_lat1 * cos_lat2 * (1 - cos_lon_d))
+    dtype : numpy.dtype, default np.float64
+        The dtype of the prepared arrays. With np.float32 the distances are also evaluated in single precision,
+        which is faster and accurate to about two meters.
+
+    Returns
+    -------
+    PreparedPoints
+        Named tuple with the arrays ``lon`` and ``lat`` in radians and ``cos_lat``.
+
+    Examples
+    --------
+    >>> pts = prepare_points(pfs.geometry.x, pfs.geometry.y)
+    >>> d = prepared_dist(pts, pts, np.arange(len(pfs) - 1), np.arange(1, len(pfs)))
+    """
+    lon = np.deg2rad(np.asarray(lon, dtype=np.float64)).ravel().astype(dtype, copy=False)
+    lat = np.deg2rad(np.asarray(lat, dtype=np.float64)).ravel().astype(dtype, copy=False)
+    return PreparedPoints(lon, lat, np.cos(lat))
+
+
+def prepared_dist(points_1, points_2, index_1=None, index_2=None, method="haversine", r=6371000, out=None):
+    """
+    Compute the distance between prepared points in WGS84.
+
+    Parameters
+    ----------
+    points_1 : PreparedPoints
+        The first points, see :func:`prepare_points`.
+
+    points_2 : PreparedPoints
+        The second points, see :func:`prepare_points`.
+
+    index_1 : int or numpy.array, optional
+        Positions of the first points to use. If None all points are used.
+
+    index_2 : int or numpy.array, optional
+        Positions of the second points to use. If None all points are used.
+
+    method : {'haversine', 'equirectangular'}, default 'haversine'
+        The haversine formula is exact on the sphere. The equirectangular approximation is cheaper and deviates
+        by less than 0.1% for distances below 10 km outside of the polar regions.
+
+    r : float, default 6371000
+        Radius of the reference sphere for the calculation.
+
+    out : numpy.array, optional
+        Array the distances are written into. Must have the shape of the result.
+
+    Returns
+    -------
+    numpy.array
+        The distances in meters, with the dtype of the prepared points.
+    """
+    if method not in ["haversine", "equirectangular"]:
+        raise AttributeError(f"method '{method}' is unknown. Supported values are ['haversine', 'equirectangular'].")
+    lon_1, lat_1, cos_1 = _take(points_1, index_1)
+    lon_2, lat_2, cos_2 = _take(points_2, index_2)
+    shape, dtype = np.broadcast(lat_1, lat_2).shape, np.result_type(lat_1, lat_2)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+
+    # all temporaries are written into out and a single buffer of the same size
+    dlon = np.subtract(lon_2, lon_1, out=np.empty(shape, dtype=dtype))
+    if method == "haversine":
+        np.multiply(dlon, 0.5, out=dlon)
+        np.sin(dlon, out=dlon)
+        np.square(dlon, out=dlon)
+        np.multiply(dlon, cos_1, out=dlon)
+        np.multiply(dlon, cos_2, out=dlon)
+        np.subtract(lat_2, lat_1, out=out)
+        np.multiply(out, 0.5, out=out)
+        np.sin(out, out=out)
+        np.square(out, out=out)
+        np.add(out, dlon, out=out)
+        np.clip(out, 0, 1, out=out)
+        np.sqrt(out, out=out)
+        np.arcsin(out, out=out)
+        np.multiply(out, 2 * r, out=out)
+        return out
+
+    # wrap the longitude difference around the antimeridian
+    np.add(dlon, np.pi, out=dlon)
+    np.remainder(dlon, 2 * np.pi, out=dlon)
+    np.subtract(dlon, np.pi, out=dlon)
+    # cosine of the mean latitude approximated by the mean of the cosines
+    np.multiply(dlon, np.add(cos_1, cos_2), out=dlon)
+    np.multiply(dlon, 0.5, out=dlon)
+    np.subtract(lat_2, lat_1, out=out)
+    np.hypot(out, dlon, out=out)
+    np.multiply(out, r, out=out)
+    return out
+
+
+def _take(points, index):
+    """Select the points at the positions of index, or all points if index is None."""
+    if index is None:
+        return points
+    return points.lon[index], points.lat[index], points.cos_lat[index]
+
+
+def _haversine_scalar(lon_1, lat_1, cos_lat_1, lon_2, lat_2, cos_lat_2, r=6371000):
+    """Haversine distance of two single points given in radians with precomputed cosine of the latitude."""
+    a = math.sin((lat_2 - lat_1) / 2) ** 2 + cos_lat_1 * cos_lat_2 * math.sin((lon_2 - lon_1) / 2) ** 2
+    return 2 * r * math.asin(math.sqrt(min(a, 1.0)))
@@ -0,0 +1,529 @@
+import os
+import tempfile
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import KDTree
+
+from trackintel.geogr.coordinates import get_line_coordinates
+
+
+def get_flat_coordinates(geometry):
+    """
+    Extract the coordinates of all LineStrings into one flat array.
+
+    Parameters
+    ----------
+    geometry : GeoSeries of LineStrings
+
+    Returns
+    -------
+    coords : np.array of shape (n_coordinates, 2)
+        The coordinates of all LineStrings, one after another.
+
+    offsets : np.array of shape (len(geometry) + 1,)
+        The coordinates of the i-th LineString are ``coords[offsets[i]:offsets[i + 1]]``.
+
+    Examples
+    --------
+    >>> coords, offsets = get_flat_coordinates(triplegs.geometry)
+    """
+    coords, offsets, _ = get_line_coordinates(geometry)
+    return coords, offsets
+
+
+def trajectory_distances(query, candidates, lengths, metric="dtw", window=None, cutoff=None, max_cells=2**22, p=2):
+    """
+    Calculate the DTW or discrete Fréchet distance between one trajectory and a set of candidate trajectories.
+
+    The dynamic programming matrices of all candidates are filled simultaneously along the anti-diagonals, such that
+    every step is a vectorized operation over all candidates.
+
+    Parameters
+    ----------
+    query : np.array of shape (n, 2)
+        The coordinates of the query trajectory.
+
+    candidates : np.array of shape (n_coordinates, 2)
+        The flat coordinates of the candidate trajectories.
+
+    lengths : np.array of int
+        The number of coordinates of each candidate trajectory.
+
+    metric : {'dtw', 'frechet'}
+        Dynamic time warping (with euclidean distance as cost) or discrete Fréchet distance.
+
+    window : int, optional
+        Radius of the Sakoe-Chiba band in number of points (along the shorter trajectory). Only cells of the dynamic
+        programming matrix within the band around the (scaled) diagonal are considered. Must be at least 1.
+
+    cutoff : float, optional
+        If given, the computation of a candidate is abandoned as soon as its distance is known to be larger than
+        cutoff and np.inf is returned instead.
+
+    max_cells : int, default 2**22
+        The maximum number of cells of the dynamic programming matrices that are held in memory at once.
+
+    p : float, default 2
+        The order of the Minkowski distance between two coordinates, e.g., 1 (cityblock), 2 (euclidean) or np.inf
+        (chebyshev).
+
+    Returns
+    -------
+    np.array of shape (len(lengths),)
+        The distances between the query and the candidates.
+
+    Examples
+    --------
+    >>> coords, offsets = get_flat_coordinates(triplegs.geometry)
+    >>> trajectory_distances(coords[offsets[0] : offsets[1]], coords, np.diff(offsets), metric="frechet")
+    """
+    if metric not in ["dtw", "frechet"]:
+        raise AttributeError(f"metric '{metric}' is unknown. Supported values are ['dtw', 'frechet'].")
+    if window is not None and window < 1:
+        raise ValueError("window must be at least 1.")
+    if p < 1:
+        raise ValueError("p must be at least 1.")
+    lengths = np.asarray(lengths, dtype=np.int64)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    result = np.empty(len(lengths))
+    # process candidates sorted by length in batches to reduce padding
+    order = np.argsort(lengths, kind="stable")
+    sorted_lengths = np.maximum(lengths[order], 1)
+    start = 0
+    while start < len(order):
+        # number of cells if the batch ends at the respective candidate
+        cells = np.arange(1, len(order) - start + 1) * len(query) * sorted_lengths[start:]
+        size = max(np.searchsorted(cells, max_cells, side="right"), 1)
+        batch = order[start : start + size]
+        result[batch] = _batch_distances(query, candidates, offsets[batch], lengths[batch], metric, window, cutoff, p)
+        start += size
+    return result
+
+
+def _batch_distances(query, candidates, starts, lengths, metric, window, cutoff, p):
+    """Fill the dynamic programming matrices of a batch of candidates along the anti-diagonals.
+
+    Only the last two anti-diagonals are kept. The cell (i, k - i) of anti-diagonal k is stored at position i + 1,
+    position 0 is the padding row i = -1. Like this all dependencies of an anti-diagonal are contiguous slices.
+    """
+    n, m_max, b = len(query), lengths.max(), len(lengths)
+    # the candidates are stored reversed, such that the points of an anti-diagonal are a contiguous slice. The
+    # padding coordinates are infinite, which makes the cells outside of the candidates unreachable.
+    t = np.arange(m_max)[None, :]
+    idx = starts[:, None] + lengths[:, None] - 1 - (t - (m_max - lengths[:, None]))
+    valid = t >= m_max - lengths[:, None]
+    cand_x = np.where(valid, candidates[np.where(valid, idx, 0), 0], np.inf)
+    cand_y = np.where(valid, candidates[np.where(valid, idx, 0), 1], np.inf)
+    query_x, query_y = query[:, 0], query[:, 1]
+    m = lengths[:, None]
+    last_diagonal = n + lengths - 2
+    if window is not None:
+        band = window * np.maximum(m - 1, n - 1)
+
+    result = np.full(b, np.inf)
+    abandoned = np.zeros(b, dtype=bool)
+    previous_min = np.full(b, np.inf)
+    # diagonal -2 only contains the padding cell (-1, -1) with value 0, diagonal -1 only padding cells
+    prev2 = np.full((b, n + 1), np.inf)
+    prev2[:, 0] = 0
+    prev1 = np.full((b, n + 1), np.inf)
+    current = np.full((b, n + 1), np.inf)
+    for k in range(n + m_max - 1):
+        lo, hi = max(0, k - m_max + 1), min(n - 1, k)
+        # point j = k - i of the candidates is at the reversed position m_max - 1 - k + i
+        t = m_max - 1 - k
+        cost = _minkowski(
+            query_x[None, lo : hi + 1] - cand_x[:, t + lo : t + hi + 1],
+            query_y[None, lo : hi + 1] - cand_y[:, t + lo : t + hi + 1],
+            p,
+        )
+        if window is not None:
+            i = np.arange(lo, hi + 1)[None, :]
+            np.putmask(cost, np.abs(i * (m - 1) - (k - i) * (n - 1)) > band, np.inf)
+
+        best = np.minimum(np.minimum(prev2[:, lo : hi + 1], prev1[:, lo : hi + 1]), prev1[:, lo + 1 : hi + 2])
+        if metric == "dtw":
+            np.add(cost, best, out=current[:, lo + 1 : hi + 2])
+        else:
+            np.maximum(cost, best, out=current[:, lo + 1 : hi + 2])
+        current[:, lo] = np.inf
+        if hi + 2 <= n:
+            current[:, hi + 2] = np.inf
+
+        finished = last_diagonal == k
+        result[finished] = current[finished, n]
+        if cutoff is not None:
+            # every warping path visits at least one of two consecutive anti-diagonals and the accumulated
+            # distance does not decrease along the path
+            current_min = current[:, lo + 1 : hi + 2].min(axis=1)
+            abandoned |= (np.minimum(current_min, previous_min) > cutoff) & (last_diagonal >= k)
+            previous_min = current_min
+            if (abandoned | (last_diagonal <= k)).all():
+                break
+        prev2, prev1, current = prev1, current, prev2
+    result[abandoned] = np.inf
+    return result
+
+
+def _minkowski(dx, dy, p):
+    """Minkowski distance of order p of the coordinate differences."""
+    dx, dy = np.abs(dx), np.abs(dy)
+    if p == 2:
+        return np.sqrt(dx**2 + dy**2)
+    if p == 1:
+        return dx + dy
+    if p == np.inf:
+        return np.maximum(dx, dy)
+    return (dx**p + dy**p) ** (1 / p)
+
+
+def trajectory_distance_matrix(X, Y=None, metric="dtw", n_jobs=1, window=None, max_distance=None, p=2, out=None):
+    """
+    Calculate the DTW or discrete Fréchet distances between all pairs of LineStrings.
+
+    The coordinates are extracted once into a flat array that is shared with the workers (joblib memory maps large
+    arrays), the workers process blocks of rows of the distance matrix. The workers either return the calculated
+    pairs or write their rows directly into the dense matrix `out`.
+
+    Parameters
+    ----------
+    X : GeoDataFrame (as trackintel triplegs)
+
+    Y : GeoDataFrame (as trackintel triplegs), optional
+        If not given, the symmetric distances between all triplegs of X are calculated.
+
+    metric : {'dtw', 'frechet'}
+
+    n_jobs : int, default 1
+        Number of jobs used to fill the rows of the matrix in parallel.
+
+    window : int, optional
+        Radius of the Sakoe-Chiba band, see :func:`trajectory_distances`.
+
+    max_distance : float, optional
+        If given, the computation of pairs is abandoned as soon as their distance is known to be larger than
+        max_distance. These pairs are returned as np.inf.
+
+    p : float, default 2
+        The order of the Minkowski distance between two coordinates, see :func:`trajectory_distances`.
+
+    out : np.array or np.memmap, optional
+        Array of shape (len(X), len(Y)) the distances are written into. If Y is not given, the workers write both
+        triangles and the diagonal is set to zero. With ``n_jobs > 1``, a ``np.memmap`` is shared with the workers,
+        other arrays are filled through a temporary memmap.
+
+    Returns
+    -------
+    rows, cols, distances : np.array
+        If out is None, the row index, column index and distance of every calculated pair. If Y is not given, only
+        the pairs with row < col are returned.
+
+    out : np.array or np.memmap
+        If out is given, the filled array.
+    """
+    coords_x, offsets_x = get_flat_coordinates(X.geometry)
+    symmetric = Y is None
+    coords_y, offsets_y = (coords_x, offsets_x) if symmetric else get_flat_coordinates(Y.geometry)
+
+    n_jobs = effective_n_jobs(n_jobs)
+    row_blocks = [block for block in np.array_split(np.arange(len(X)), 4 * n_jobs) if len(block) > 0]
+    if out is not None:
+        if out.shape != (len(X), len(offsets_y) - 1):
+            raise ValueError(f"out must be of shape {(len(X), len(offsets_y) - 1)}, but has shape {out.shape}.")
+        coordinates = (coords_x, offsets_x, coords_y, offsets_y)
+        if n_jobs == 1 or isinstance(out, np.memmap):
+            _fill_rows(out, row_blocks, n_jobs, *coordinates, symmetric, metric, window, max_distance, p)
+            return out
+        # the workers of other processes can only write into a memory mapped file
+        with tempfile.TemporaryDirectory(prefix="trackintel_") as folder:
+            shared = np.memmap(os.path.join(folder, "distances.dat"), dtype=out.dtype, mode="w+", shape=out.shape)
+            _fill_rows(shared, row_blocks, n_jobs, *coordinates, symmetric, metric, window, max_distance, p)
+            out[:] = shared
+            del shared
+        return out
+
+    res = Parallel(n_jobs=n_jobs)(
+        delayed(_distance_rows)(
+            coords_x, offsets_x, coords_y, offsets_y, block, symmetric, metric, window, max_distance, p
+        )
+        for block in row_blocks
+    )
+    if len(res) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    rows, cols, dists = zip(*res)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(dists)
+
+
+def _distance_rows(coords_x, offsets_x, coords_y, offsets_y, row_block, symmetric, metric, window, cutoff, p, out=None):
+    """Calculate the distances of the rows in row_block to all (or the following if symmetric) columns.
+
+    If out is given, the rows (and if symmetric the mirrored columns) are written into out and nothing is returned.
+    """
+    lengths_y = np.diff(offsets_y)
+    rows, cols, dists = [], [], []
+    for i in row_block:
+        col_start = i + 1 if symmetric else 0
+        if col_start >= len(lengths_y):
+            continue
+        query = coords_x[offsets_x[i] : offsets_x[i + 1]]
+        candidates = coords_y[offsets_y[col_start] :]
+        d = trajectory_distances(query, candidates, lengths_y[col_start:], metric, window, cutoff, p=p)
+        if out is not None:
+            out[i, col_start:] = d
+            if symmetric:
+                out[col_start:, i] = d
+            continue
+        rows.append(np.full(len(d), i, dtype=np.int64))
+        cols.append(np.arange(col_start, len(lengths_y), dtype=np.int64))
+        dists.append(d)
+    if out is not None:
+        if isinstance(out, np.memmap):
+            out.flush()
+        return None
+    if len(rows) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(dists)
+
+
+def _fill_rows(out, row_blocks, n_jobs, coords_x, offsets_x, coords_y, offsets_y, *args):
+    """Let the workers write the blocks of rows into out (a np.memmap if n_jobs > 1).
+
+    The remaining arguments (symmetric, metric, window, cutoff, p) are passed on to :func:`_distance_rows`.
+    """
+    symmetric = args[0]
+    Parallel(n_jobs=n_jobs)(
+        delayed(_distance_rows)(coords_x, offsets_x, coords_y, offsets_y, block, *args, out=out) for block in row_blocks
+    )
+    if symmetric:
+        np.fill_diagonal(out, 0)
+
+
+def trajectory_similarity_search(X, Y=None, k=None, max_distance=None, metric="dtw", window=None, n_jobs=1):
+    """
+    Find the most similar triplegs with respect to the DTW or discrete Fréchet distance.
+
+    Candidate pairs are pruned with cheap lower bounds of the distance before the exact distance is calculated:
+
+    - start and end point distance (for 'dtw' the sum, for 'frechet' the maximum)
+    - distance between the bounding boxes (for 'dtw' multiplied by the number of points of the longer tripleg)
+    - LB_Keogh (only for 'dtw' with `window`)
+
+    With `max_distance`, the candidates are found with a spatial index on the start and end points, such that the
+    work is sub-quadratic. With `k`, the candidates are processed in order of their lower bound, and the exact
+    computation stops as soon as the lower bound exceeds the distance of the k-th best tripleg found so far.
+
+    Parameters
+    ----------
+    X : GeoDataFrame (as trackintel triplegs)
+        The query triplegs.
+
+    Y : GeoDataFrame (as trackintel triplegs), optional
+        The triplegs to search in. If not given, the similar triplegs are searched in X and each tripleg is its own
+        most similar tripleg.
+
+    k : int, optional
+        Return the k most similar triplegs.
+
+    max_distance : float, optional
+        Return all triplegs with a distance smaller or equal to max_distance. At least one of `k` and
+        `max_distance` must be given, if both are given the k most similar triplegs within max_distance are returned.
+
+    metric : {'dtw', 'frechet'}
+        The distances are computed with the euclidean distance between the coordinates (i.e., in the unit of the
+        coordinate reference system).
+
+    window : int, optional
+        Radius of the Sakoe-Chiba band, see :func:`trajectory_distances`.
+
+    n_jobs : int, default 1
+        Number of jobs used to process the query triplegs in parallel.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        Matrix of shape (len(X), len(Y)) with the distances of the found pairs. Each row is sorted by distance,
+        distances of zero are stored explicitly.
+
+    Examples
+    --------
+    >>> trajectory_similarity_search(triplegs, k=5, metric="frechet")
+    >>> triplegs.as_triplegs.similarity_search(other_triplegs, max_distance=0.01, metric="dtw", window=10)
+    """
+    if metric not in ["dtw", "frechet"]:
+        raise AttributeError(f"metric '{metric}' is unknown. Supported values are ['dtw', 'frechet'].")
+    if k is None and max_distance is None:
+        raise ValueError("At least one of the arguments 'k' or 'max_distance' must be given.")
+    if Y is None:
+        Y = X
+    coords_x, offsets_x = get_flat_coordinates(X.geometry)
+    coords_y, offsets_y = get_flat_coordinates(Y.geometry)
+    summary_x = _summarize(coords_x, offsets_x)
+    summary_y = _summarize(coords_y, offsets_y)
+
+    if max_distance is None:
+        candidates = None
+    else:
+        # the start and end point distance is a lower bound for both metrics: the 4 dimensional distance of
+        # (start, end) is at most the sum of both distances (dtw) and at most sqrt(2) * the maximum (frechet)
+        radius = max_distance if metric == "dtw" else np.sqrt(2) * max_distance
+        tree = KDTree(np.column_stack([summary_y["start"], summary_y["end"]]))
+        candidates = tree.query_radius(np.column_stack([summary_x["start"], summary_x["end"]]), radius)
+
+    n_jobs = effective_n_jobs(n_jobs)
+    row_blocks = [block for block in np.array_split(np.arange(len(X)), 4 * n_jobs) if len(block) > 0]
+    res = Parallel(n_jobs=n_jobs)(
+        delayed(_search_rows)(
+            coords_x,
+            offsets_x,
+            summary_x,
+            coords_y,
+            offsets_y,
+            summary_y,
+            block,
+            None if candidates is None else candidates[block],
+            k,
+            max_distance,
+            metric,
+            window,
+        )
+        for block in row_blocks
+    )
+    lengths = np.concatenate([r[0] for r in res]) if len(res) > 0 else np.empty(0, dtype=np.int64)
+    indices = np.concatenate([r[1] for r in res]) if len(res) > 0 else np.empty(0, dtype=np.int64)
+    distances = np.concatenate([r[2] for r in res]) if len(res) > 0 else np.empty(0)
+    indptr = np.append(0, np.cumsum(lengths))
+    return csr_matrix((distances, indices, indptr), shape=(len(X), len(Y)))
+
+
+def _summarize(coords, offsets):
+    """Get start point, end point, bounding box and number of points of every LineString."""
+    return {
+        "start": coords[offsets[:-1]],
+        "end": coords[offsets[1:] - 1],
+        "min": np.minimum.reduceat(coords, offsets[:-1], axis=0),
+        "max": np.maximum.reduceat(coords, offsets[:-1], axis=0),
+        "length": np.diff(offsets),
+    }
+
+
+def _gather(coords, offsets, selection):
+    """Get the flat coordinates and lengths of the selected LineStrings."""
+    lengths = offsets[selection + 1] - offsets[selection]
+    total = lengths.sum()
+    # index of the coordinate = start of its LineString + position within the LineString
+    shift = np.repeat(offsets[selection] - (np.cumsum(lengths) - lengths), lengths)
+    return coords[np.arange(total) + shift], lengths
+
+
+def _lower_bound(summary_x, i, summary_y, candidates, metric):
+    """Lower bounds of the distances between LineString i of X and the candidate LineStrings of Y."""
+    d_start = np.sqrt(((summary_y["start"][candidates] - summary_x["start"][i]) ** 2).sum(axis=1))
+    d_end = np.sqrt(((summary_y["end"][candidates] - summary_x["end"][i]) ** 2).sum(axis=1))
+    gap = np.maximum(
+        np.maximum(
+            summary_y["min"][candidates] - summary_x["max"][i], summary_x["min"][i] - summary_y["max"][candidates]
+        ),
+        0,
+    )
+    d_bbox = np.sqrt((gap**2).sum(axis=1))
+    if metric == "frechet":
+        return np.maximum(np.maximum(d_start, d_end), d_bbox)
+    n, m = summary_x["length"][i], summary_y["length"][candidates]
+    # the first and the last cell are the same if both LineStrings consist of one point
+    d_endpoints = np.where((n > 1) | (m > 1), d_start + d_end, d_start)
+    return np.maximum(d_endpoints, np.maximum(n, m) * d_bbox)
+
+
+def _lb_keogh(query, other, window):
+    """LB_Keogh lower bound of the dtw distance within the Sakoe-Chiba band.
+
+    Every row of the dynamic programming matrix is visited by the warping path, the cost of the visited cell is at
+    least the distance between the query point and the bounding box of the points of the other LineString within
+    the band.
+    """
+    n, m = len(query), len(other)
+    i = np.arange(n)
+    if n == 1:
+        lo, hi = np.zeros(1, dtype=np.int64), np.full(1, m - 1)
+    else:
+        band = window * max(n - 1, m - 1)
+        lo = np.clip(np.ceil((i * (m - 1) - band) / (n - 1)), 0, m - 1).astype(np.int64)
+        hi = np.clip(np.floor((i * (m - 1) + band) / (n - 1)), 0, m - 1).astype(np.int64)
+    # reduce over [lo, hi + 1), every second result is the reduction between two windows and ignored
+    idx = np.column_stack([lo, hi + 1]).ravel()
+    extended = np.vstack([other, other[-1:]])
+    lower = np.minimum.reduceat(extended, idx, axis=0)[::2]
+    upper = np.maximum.reduceat(extended, idx, axis=0)[::2]
+    gap = np.maximum(np.maximum(lower - query, query - upper), 0)
+    return np.sqrt((gap**2).sum(axis=1)).sum()
+
+
+def _search_rows(
+    coords_x,
+    offsets_x,
+    summary_x,
+    coords_y,
+    offsets_y,
+    summary_y,
+    row_block,
+    candidates,
+    k,
+    max_distance,
+    metric,
+    window,
+):
+    """Find the similar LineStrings of Y for the rows in row_block."""
+    n_y = len(offsets_y) - 1
+    lengths, indices, distances = [], [], []
+    for pos, i in enumerate(row_block):
+        query = coords_x[offsets_x[i] : offsets_x[i + 1]]
+        cand = np.arange(n_y) if candidates is None else np.sort(candidates[pos]).astype(np.int64)
+        lb = _lower_bound(summary_x, i, summary_y, cand, metric)
+        if max_distance is not None:
+            keep = lb <= max_distance
+            cand, lb = cand[keep], lb[keep]
+        if metric == "dtw" and window is not None and len(cand) > 0:
+            lb_keogh = np.array(
+                [
+                    max(
+                        _lb_keogh(query, coords_y[offsets_y[c] : offsets_y[c + 1]], window),
+                        _lb_keogh(coords_y[offsets_y[c] : offsets_y[c + 1]], query, window),
+                    )
+                    for c in cand
+                ]
+            )
+            lb = np.maximum(lb, lb_keogh)
+            if max_distance is not None:
+                keep = lb <= max_distance
+                cand, lb = cand[keep], lb[keep]
+
+        cutoff = np.inf if max_distance is None else max_distance
+        if k is None:
+            found = cand
+            d = trajectory_distances(query, *_gather(coords_y, offsets_y, cand), metric, window, cutoff)
+        else:
+            # exact distances in order of the lower bound, until the lower bound exceeds the k-th best distance
+            order = np.argsort(lb, kind="stable")
+            cand, lb = cand[order], lb[order]
+            found, d = np.empty(0, dtype=np.int64), np.empty(0)
+            start, chunk = 0, max(k, 16)
+            while start < len(cand) and lb[start] <= cutoff:
+                batch = cand[start : start + chunk]
+                d_batch = trajectory_distances(query, *_gather(coords_y, offsets_y, batch), metric, window, cutoff)
+                found, d = np.append(found, batch), np.append(d, d_batch)
+                if len(d) >= k:
+                    best = np.argsort(d, kind="stable")[:k]
+                    found, d = found[best], d[best]
+                    cutoff = min(cutoff, d[-1])
+                start += chunk
+        within = d <= cutoff
+        found, d = found[within], d[within]
+        order = np.argsort(d, kind="stable")
+        lengths.append(len(d))
+        indices.append(found[order])
+        distances.append(d[order])
+    return np.array(lengths, dtype=np.int64), np.concatenate(indices), np.concatenate(distances)
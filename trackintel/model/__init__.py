@@ -4,3 +4,5 @@ from .triplegs import TriplegsAccessor
 from .locations import LocationsAccessor
 from .trips import TripsAccessor
 from .tours import ToursAccessor
+from .index import SpatioTemporalIndex
+from .positionfix_array import PositionfixArray
@@ -0,0 +1,294 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely.geometry import box
+
+
+class SpatioTemporalIndex:
+    """Reusable index of the records of a trackintel frame by user, time and space.
+
+    The records are sorted once by user and start time. The records of the i-th user are
+    ``order[offsets[i]:offsets[i + 1]]`` (positions in the frame), such that all records of a user between two
+    timestamps are found with binary searches instead of boolean masks over the whole frame. A spatial index (STRtree)
+    over the geometries is built on the first spatial query.
+
+    The index refers to the positions of the rows in the frame and has to be rebuilt if the frame is modified. The
+    indices built with :meth:`from_frame` or :meth:`read_file` keep a fingerprint of the users, times and geometries
+    of the frame to detect such modifications, see :meth:`is_index_of`.
+
+    Parameters
+    ----------
+    labels : pd.Index
+        The index of the frame.
+
+    user_ids : array-like
+        Ids of the users, in the order of the offsets.
+
+    offsets : array-like of int
+        Start positions of the records of each user in `order` with a trailing entry for the end of the last user.
+        Must have length ``len(user_ids) + 1``.
+
+    order : array-like of int
+        Positions of the records in the frame, sorted by user and start time.
+
+    starts, ends : array-like of int
+        Start and end time of the records in `order` in nanoseconds since the epoch (UTC).
+
+    time_columns : list of str, default ['started_at', 'finished_at']
+        The columns of the start and end time in the frame.
+
+    geometry : GeoSeries, optional
+        The geometries of the frame, required for spatial queries.
+
+    fingerprint : int, optional
+        Hash of the users, times and geometries of the frame, see :meth:`is_index_of`.
+
+    Examples
+    --------
+    >>> index = SpatioTemporalIndex.from_frame(sp)
+    >>> sp.iloc[index.positions_for(user_id, "2021-05-01 00:00:00+00:00", "2021-06-01 00:00:00+00:00")]
+    >>> sp.iloc[index.query_bbox((8.5, 47.3, 8.6, 47.4))]
+    """
+
+    def __init__(
+        self, labels, user_ids, offsets, order, starts, ends, time_columns=None, geometry=None, fingerprint=None
+    ):
+        self.labels = labels
+        self.user_ids = pd.Index(user_ids)
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.order = np.asarray(order, dtype="int64")
+        self.starts = np.asarray(starts, dtype="int64")
+        self.ends = np.asarray(ends, dtype="int64")
+        self.time_columns = ["started_at", "finished_at"] if time_columns is None else list(time_columns)
+        self.geometry = geometry
+        self.fingerprint = fingerprint
+        if len(self.offsets) != len(self.user_ids) + 1:
+            raise ValueError("offsets must have exactly one entry more than user_ids.")
+        if not (self.offsets[-1] == len(self.order) == len(self.starts) == len(self.ends) == len(labels)):
+            raise ValueError("order, starts and ends must have one entry per record of the frame.")
+        # latest end of the records of the user up to the i-th record -> sorted within each user
+        user_codes = np.repeat(np.arange(len(self.user_ids)), np.diff(self.offsets))
+        self._max_end = pd.Series(self.ends).groupby(user_codes).cummax().to_numpy()
+        self._rank = None
+
+    @classmethod
+    def from_frame(cls, source):
+        """Build the index of a trackintel frame.
+
+        Parameters
+        ----------
+        source : GeoDataFrame (as trackintel datamodels)
+            Records with the columns ``['user_id', 'tracked_at']`` or ``['user_id', 'started_at', 'finished_at']``.
+
+        Returns
+        -------
+        SpatioTemporalIndex
+        """
+        time_columns = _get_time_columns(source)
+        user_codes, user_ids = pd.factorize(source["user_id"], sort=True)
+        start = pd.DatetimeIndex(source[time_columns[0]]).asi8
+        end = pd.DatetimeIndex(source[time_columns[1]]).asi8
+        order = np.lexsort((start, user_codes))
+
+        offsets = np.zeros(len(user_ids) + 1, dtype="int64")
+        np.cumsum(np.bincount(user_codes, minlength=len(user_ids)), out=offsets[1:])
+        return cls(
+            source.index,
+            user_ids,
+            offsets,
+            order,
+            start[order],
+            end[order],
+            time_columns=time_columns,
+            geometry=_get_geometry(source),
+            fingerprint=_fingerprint(source, time_columns),
+        )
+
+    @classmethod
+    def read_file(cls, filename, source):
+        """Read an index written with :meth:`to_file` and attach it to its frame.
+
+        Parameters
+        ----------
+        filename : str
+            The path to the file.
+
+        source : GeoDataFrame (as trackintel datamodels)
+            The frame the index was built from, with the rows in the same order.
+
+        Returns
+        -------
+        SpatioTemporalIndex
+        """
+        with np.load(filename) as data:
+            order, offsets = data["order"], data["offsets"]
+            time_columns = list(data["time_columns"])
+            if data["n_records"] != len(source) or data["labels_hash"] != _hash_labels(source.index):
+                raise ValueError("The index does not belong to the frame, the rows of the frame differ.")
+        # the times and the users are gathered from the frame, only the sorting is persisted
+        start = pd.DatetimeIndex(source[time_columns[0]]).asi8[order]
+        end = pd.DatetimeIndex(source[time_columns[1]]).asi8[order]
+        user_ids = source["user_id"].to_numpy()[order[offsets[:-1]]]
+        return cls(
+            source.index,
+            user_ids,
+            offsets,
+            order,
+            start,
+            end,
+            time_columns=time_columns,
+            geometry=_get_geometry(source),
+            fingerprint=_fingerprint(source, time_columns),
+        )
+
+    def to_file(self, filename):
+        """Write the index to a numpy ``.npz`` file, e.g., next to the file of the frame.
+
+        Only the sorting of the records is written, the times and the users are taken from the frame when reading
+        the index with :meth:`read_file`.
+
+        Parameters
+        ----------
+        filename : str
+            The path to the file.
+        """
+        np.savez(
+            filename,
+            order=self.order,
+            offsets=self.offsets,
+            time_columns=np.array(self.time_columns),
+            n_records=len(self.labels),
+            labels_hash=_hash_labels(self.labels),
+        )
+
+    def __len__(self):
+        return len(self.order)
+
+    def positions_for(self, user_id, t0=None, t1=None):
+        """Return the positions of the records of a user that overlap a time window.
+
+        Parameters
+        ----------
+        user_id : scalar
+            Unknown users have no records.
+
+        t0, t1 : Timestamp, optional
+            Start and end of the time window (inclusive). If None the window is unbounded.
+
+        Returns
+        -------
+        np.array
+            The positions of the records in the frame, sorted by start time.
+        """
+        i = self.user_ids.get_indexer([user_id])[0]
+        if i < 0:
+            return np.array([], dtype="int64")
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        if t1 is not None:
+            # records that start after t1 are at the end
+            hi = lo + np.searchsorted(self.starts[lo:hi], pd.Timestamp(t1).value, side="right")
+        if t0 is None:
+            return self.order[lo:hi]
+        # records that end before t0 are at the start (their latest end is before t0 as well)
+        t0 = pd.Timestamp(t0).value
+        lo = lo + np.searchsorted(self._max_end[lo:hi], t0, side="left")
+        return self.order[lo:hi][self.ends[lo:hi] >= t0]
+
+    def query_bbox(self, bounds, user_id=None, t0=None, t1=None):
+        """Return the positions of the records that intersect a bounding box.
+
+        Parameters
+        ----------
+        bounds : tuple of float
+            The bounding box ``(minx, miny, maxx, maxy)`` in the coordinate reference system of the frame.
+
+        user_id : scalar, optional
+            Only return the records of this user.
+
+        t0, t1 : Timestamp, optional
+            Only return the records that overlap the time window, see :meth:`positions_for`.
+
+        Returns
+        -------
+        np.array
+            The positions of the records in the frame, sorted by user and start time.
+        """
+        if self.geometry is None:
+            raise AttributeError("The frame has no geometry, spatial queries are not possible.")
+        bbox = box(*bounds)
+        if user_id is not None:
+            # the records of a single user are few -> test them directly
+            pos = self.positions_for(user_id, t0, t1)
+            return pos[self.geometry.iloc[pos].intersects(bbox).to_numpy()]
+
+        pos = self.geometry.sindex.query(bbox, predicate="intersects")
+        if self._rank is None:
+            self._rank = np.empty(len(self.order), dtype="int64")
+            self._rank[self.order] = np.arange(len(self.order))
+        rank = np.sort(self._rank[pos])
+        if t0 is not None:
+            rank = rank[self.ends[rank] >= pd.Timestamp(t0).value]
+        if t1 is not None:
+            rank = rank[self.starts[rank] <= pd.Timestamp(t1).value]
+        return self.order[rank]
+
+    def is_index_of(self, source):
+        """Return True if the index was built from this frame and the frame was not modified since.
+
+        The index of the frame must not be replaced and, if the index has a fingerprint, the users, times and
+        geometries of the frame must be unchanged. Modifications in place (e.g., ``sp["started_at"] += delta``) keep
+        the index of the frame but change the fingerprint.
+
+        Parameters
+        ----------
+        source : GeoDataFrame (as trackintel datamodels)
+
+        Returns
+        -------
+        bool
+        """
+        if source.index is not self.labels:
+            return False
+        return self.fingerprint is None or self.fingerprint == _fingerprint(source, self.time_columns)
+
+
+def _get_time_columns(source):
+    """Names of the start and end time columns of a trackintel frame."""
+    if "tracked_at" in source.columns:
+        return ["tracked_at", "tracked_at"]
+    if "started_at" in source.columns and "finished_at" in source.columns:
+        return ["started_at", "finished_at"]
+    raise KeyError(
+        "To build the index, the frame must have the column 'tracked_at' or the columns ['started_at', "
+        f"'finished_at'], but it has [{', '.join(source.columns)}]."
+    )
+
+
+def _get_geometry(source):
+    """The active geometry of the frame or None."""
+    if isinstance(source, gpd.GeoDataFrame) and source._geometry_column_name in source.columns:
+        return source.geometry
+    return None
+
+
+def _hash_labels(labels):
+    """Hash of the labels of an index that depends on their order."""
+    hashes = pd.util.hash_pandas_object(labels, index=False).to_numpy()
+    return np.sum(hashes * np.arange(1, len(hashes) + 1, dtype="uint64"), dtype="uint64")
+
+
+def _fingerprint(source, time_columns):
+    """Hash of the users, times and geometries of a frame that depends on their order."""
+    values = [source[c] for c in dict.fromkeys(["user_id", *time_columns]) if c in source.columns]
+    geometry = _get_geometry(source)
+    if geometry is not None:
+        values.append(pd.Series(geometry.to_wkb(), index=source.index))
+    return np.bitwise_xor.reduce([_hash_labels(v) * np.uint64(i + 1) for i, v in enumerate(values)], dtype="uint64")
+
+
+def _attached_index(accessor):
+    """The index attached to an accessor, (re)built if it does not belong to the (possibly modified) frame."""
+    index = getattr(accessor, "_index", None)
+    if index is None or not index.is_index_of(accessor._obj):
+        index = accessor._index = SpatioTemporalIndex.from_frame(accessor._obj)
+    return index
@@ -3,6 +3,7 @@ import trackintel as ti
 import trackintel.io
 from trackintel.io.file import write_locations_csv
 from trackintel.io.postgis import write_locations_postgis
+from trackintel.geogr.distances import neighbors
 from trackintel.model.util import _copy_docstring
 from trackintel.preprocessing.filter import spatial_filter
 from trackintel.visualization.locations import plot_locations
@@ -89,3 +90,12 @@ class LocationsAccessor(object):
         See :func:`trackintel.preprocessing.filter.spatial_filter`.
         """
         return ti.preprocessing.filter.spatial_filter(self._obj, *args, **kwargs)
+
+    @_copy_docstring(neighbors)
+    def neighbors(self, *args, **kwargs):
+        """
+        Find the neighbors of the location centers within a radius or the k nearest neighbors.
+
+        See :func:`trackintel.geogr.distances.neighbors`.
+        """
+        return ti.geogr.distances.neighbors(self._obj.set_geometry("center"), *args, **kwargs)
@@ -0,0 +1,246 @@
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+
+
+class PositionfixArray:
+    """Compact columnar container of positionfixes.
+
+    Instead of one shapely Point per positionfix, the coordinates are stored in two numpy arrays, the times as
+    nanoseconds since the epoch (UTC) and the users as offsets into the rows, which are sorted by user and time.
+    The rows of the i-th user are ``offsets[i]:offsets[i + 1]``. Geometries are only created when needed, e.g., for
+    the positionfixes of a single user in :meth:`iter_users`.
+
+    Parameters
+    ----------
+    x, y : array-like of float
+        The coordinates of the positionfixes.
+
+    time : array-like of int
+        The 'tracked_at' times in nanoseconds since the epoch (UTC), sorted within each user.
+
+    user_ids : array-like
+        Ids of the users, in the order of the offsets.
+
+    offsets : array-like of int
+        Start positions of the rows of each user with a trailing entry for the end of the last user. Must have
+        length ``len(user_ids) + 1``.
+
+    ids : array-like, optional
+        The index of the positionfixes. If None the positions of the rows are used.
+
+    columns : dict, optional
+        Additional columns as arrays with one entry per row, e.g., 'elevation' or 'accuracy'.
+
+    crs : pyproj.CRS or str, optional
+        The coordinate reference system of the coordinates.
+
+    tz : str or tzinfo, optional
+        The timezone of 'tracked_at'.
+
+    geom_col : str, default 'geom'
+        The name of the geometry column of materialized positionfixes.
+
+    index_name : str, optional
+        The name of the index of materialized positionfixes.
+
+    Examples
+    --------
+    >>> pfa = pfs.as_positionfixes.compact(dtype="float32")
+    >>> pfa, sp = ti.preprocessing.generate_staypoints(pfa)
+    >>> pfs = pfa.to_positionfixes()
+    """
+
+    def __init__(
+        self, x, y, time, user_ids, offsets, ids=None, columns=None, crs=None, tz=None, geom_col="geom", index_name=None
+    ):
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.time = np.asarray(time, dtype="int64")
+        self.user_ids = pd.Index(user_ids)
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.ids = np.arange(len(self.x)) if ids is None else np.asarray(ids)
+        self.columns = {} if columns is None else dict(columns)
+        self.crs = crs
+        self.tz = tz
+        self.geom_col = geom_col
+        self.index_name = index_name
+        if len(self.offsets) != len(self.user_ids) + 1:
+            raise ValueError("offsets must have exactly one entry more than user_ids.")
+        lengths = [len(self.y), len(self.time), len(self.ids), self.offsets[-1]]
+        lengths += [len(values) for values in self.columns.values()]
+        if any([length != len(self.x) for length in lengths]):
+            raise ValueError("All arrays must have one entry per positionfix.")
+
+    @classmethod
+    def from_positionfixes(cls, positionfixes, dtype="float64", columns=None):
+        """Create the compact container from positionfixes.
+
+        Parameters
+        ----------
+        positionfixes : GeoDataFrame (as trackintel positionfixes)
+
+        dtype : {'float64', 'float32'}, default 'float64'
+            The dtype of the coordinates. Note that 'float32' has a precision of about 1 meter for longitude and
+            latitude.
+
+        columns : list of str, optional
+            The additional columns to keep. If None all columns are kept.
+
+        Returns
+        -------
+        PositionfixArray
+        """
+        user_codes, user_ids = pd.factorize(positionfixes["user_id"], sort=True)
+        time = pd.DatetimeIndex(positionfixes["tracked_at"]).asi8
+        order = np.lexsort((time, user_codes))
+        offsets = np.zeros(len(user_ids) + 1, dtype="int64")
+        np.cumsum(np.bincount(user_codes, minlength=len(user_ids)), out=offsets[1:])
+
+        geometry = positionfixes.geometry
+        if columns is None:
+            columns = [c for c in positionfixes.columns if c not in ["user_id", "tracked_at", geometry.name]]
+        return cls(
+            geometry.x.to_numpy(dtype=dtype)[order],
+            geometry.y.to_numpy(dtype=dtype)[order],
+            time[order],
+            user_ids,
+            offsets,
+            ids=positionfixes.index.to_numpy()[order],
+            columns={c: positionfixes[c].array.take(order) for c in columns},
+            crs=positionfixes.crs,
+            tz=positionfixes["tracked_at"].dt.tz,
+            geom_col=geometry.name,
+            index_name=positionfixes.index.name,
+        )
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def nbytes(self):
+        """The memory of the arrays in bytes."""
+        arrays = [self.x, self.y, self.time, self.offsets, self.ids, *self.columns.values()]
+        return sum([values.nbytes for values in arrays])
+
+    @property
+    def user_codes(self):
+        """The position of the user of every row in `user_ids`."""
+        return np.repeat(np.arange(len(self.user_ids), dtype="int32"), np.diff(self.offsets))
+
+    @property
+    def tracked_at(self):
+        """The 'tracked_at' times as timezone aware timestamps."""
+        return _from_ns(self.time, self.tz)
+
+    @property
+    def geometry(self):
+        """The geometries as a GeoSeries with the index of the positionfixes, created on every access."""
+        return gpd.GeoSeries(
+            gpd.points_from_xy(self.x, self.y), index=pd.Index(self.ids, name=self.index_name), crs=self.crs
+        )
+
+    def to_positionfixes(self):
+        """Return the positionfixes as a GeoDataFrame, sorted by user and time.
+
+        Returns
+        -------
+        GeoDataFrame (as trackintel positionfixes)
+        """
+        return self._frame(0, len(self), index=pd.Index(self.ids, name=self.index_name))
+
+    def iter_users(self):
+        """Iterate over the users with their positionfixes as a GeoDataFrame.
+
+        The geometries are only created for one user at a time. The index of the yielded positionfixes are the
+        positions of the rows in the container.
+
+        Yields
+        ------
+        user_id : scalar
+
+        positionfixes : GeoDataFrame (as trackintel positionfixes)
+        """
+        for i, user_id in enumerate(self.user_ids):
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            yield user_id, self._frame(start, stop, index=pd.RangeIndex(start, stop))
+
+    def duplicated(self):
+        """Return a boolean array that marks the positionfixes that are equal to a previous one of the user."""
+        duplicated = np.zeros(len(self), dtype=bool)
+        for i in range(len(self.user_ids)):
+            start, stop = self.offsets[i], self.offsets[i + 1]
+            values = {"time": self.time[start:stop], "x": self.x[start:stop], "y": self.y[start:stop]}
+            values.update({name: column[start:stop] for name, column in self.columns.items()})
+            duplicated[start:stop] = pd.DataFrame(values).duplicated().to_numpy()
+        return duplicated
+
+    def take(self, positions):
+        """Return a new container with the rows at the sorted positions.
+
+        Parameters
+        ----------
+        positions : array-like of int
+            The positions of the rows, must be sorted.
+
+        Returns
+        -------
+        PositionfixArray
+        """
+        positions = np.asarray(positions, dtype="int64")
+        return PositionfixArray(
+            self.x[positions],
+            self.y[positions],
+            self.time[positions],
+            self.user_ids,
+            np.searchsorted(positions, self.offsets),
+            ids=self.ids[positions],
+            columns={name: column.take(positions) for name, column in self.columns.items()},
+            crs=self.crs,
+            tz=self.tz,
+            geom_col=self.geom_col,
+            index_name=self.index_name,
+        )
+
+    def assign(self, **columns):
+        """Return a new container with additional columns, the arrays of the other columns are shared.
+
+        Parameters
+        ----------
+        **columns : array-like
+            The new columns with one entry per row.
+
+        Returns
+        -------
+        PositionfixArray
+        """
+        return PositionfixArray(
+            self.x,
+            self.y,
+            self.time,
+            self.user_ids,
+            self.offsets,
+            ids=self.ids,
+            columns={**self.columns, **columns},
+            crs=self.crs,
+            tz=self.tz,
+            geom_col=self.geom_col,
+            index_name=self.index_name,
+        )
+
+    def _frame(self, start, stop, index):
+        """The rows start:stop as a GeoDataFrame."""
+        user_codes = np.searchsorted(self.offsets, np.arange(start, stop), side="right") - 1
+        frame = {
+            "user_id": self.user_ids[user_codes].to_numpy(),
+            "tracked_at": _from_ns(self.time[start:stop], self.tz),
+        }
+        frame.update({name: column[start:stop] for name, column in self.columns.items()})
+        frame[self.geom_col] = gpd.points_from_xy(self.x[start:stop], self.y[start:stop])
+        return gpd.GeoDataFrame(frame, index=index, geometry=self.geom_col, crs=self.crs)
+
+
+def _from_ns(ns, tz):
+    """Timestamps in timezone tz from nanoseconds since the epoch (UTC)."""
+    timestamps = pd.DatetimeIndex(ns.astype("datetime64[ns]"))
+    return timestamps if tz is None else timestamps.tz_localize("UTC").tz_convert(tz)
@@ -3,6 +3,8 @@ import trackintel as ti
 from trackintel.geogr.distances import calculate_distance_matrix
 from trackintel.io.file import write_positionfixes_csv
 from trackintel.io.postgis import write_positionfixes_postgis
+from trackintel.model.index import SpatioTemporalIndex, _attached_index
+from trackintel.model.positionfix_array import PositionfixArray
 from trackintel.model.util import _copy_docstring
 from trackintel.preprocessing.positionfixes import generate_staypoints, generate_triplegs
 from trackintel.visualization.positionfixes import plot_positionfixes
@@ -140,3 +142,45 @@ class PositionfixesAccessor(object):
         See :func:`trackintel.model.util.get_speed_positionfixes`.
         """
         return ti.model.util.get_speed_positionfixes(self._obj, *args, **kwargs)
+
+    def compact(self, dtype="float64", columns=None):
+        """
+        Return the positionfixes as a compact columnar PositionfixArray.
+
+        See :meth:`trackintel.model.positionfix_array.PositionfixArray.from_positionfixes`.
+        """
+        return PositionfixArray.from_positionfixes(self._obj, dtype=dtype, columns=columns)
+
+    def build_index(self):
+        """
+        Build the spatial and temporal index of the positionfixes and attach it to the accessor.
+
+        See :class:`trackintel.model.index.SpatioTemporalIndex`.
+        """
+        self._index = SpatioTemporalIndex.from_frame(self._obj)
+        return self._index
+
+    def read_index(self, filename):
+        """
+        Read the index of the positionfixes written with ``index.to_file(filename)`` and attach it to the accessor.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.read_file`.
+        """
+        self._index = SpatioTemporalIndex.read_file(filename, self._obj)
+        return self._index
+
+    def index_for(self, user_id, t0=None, t1=None):
+        """
+        Return the positionfixes of a user that overlap a time window, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.positions_for`.
+        """
+        return self._obj.iloc[_attached_index(self).positions_for(user_id, t0, t1)]
+
+    def query_bbox(self, bounds, user_id=None, t0=None, t1=None):
+        """
+        Return the positionfixes that intersect a bounding box, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.query_bbox`.
+        """
+        return self._obj.iloc[_attached_index(self).query_bbox(bounds, user_id, t0, t1)]
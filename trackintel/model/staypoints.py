@@ -2,8 +2,10 @@ import pandas as pd
 import trackintel as ti
 from trackintel.analysis.labelling import create_activity_flag
 from trackintel.analysis.tracking_quality import temporal_tracking_quality
+from trackintel.geogr.distances import neighbors
 from trackintel.io.file import write_staypoints_csv
 from trackintel.io.postgis import write_staypoints_postgis
+from trackintel.model.index import SpatioTemporalIndex, _attached_index
 from trackintel.model.util import _copy_docstring
 from trackintel.preprocessing.filter import spatial_filter
 from trackintel.preprocessing.staypoints import generate_locations, merge_staypoints
@@ -114,6 +116,15 @@ class StaypointsAccessor(object):
         """
         return ti.preprocessing.filter.spatial_filter(self._obj, *args, **kwargs)
 
+    @_copy_docstring(neighbors)
+    def neighbors(self, *args, **kwargs):
+        """
+        Find the neighbors of the staypoints within a radius or the k nearest neighbors.
+
+        See :func:`trackintel.geogr.distances.neighbors`.
+        """
+        return ti.geogr.distances.neighbors(self._obj, *args, **kwargs)
+
     @_copy_docstring(plot_staypoints)
     def plot(self, *args, **kwargs):
         """
@@ -153,3 +164,37 @@ class StaypointsAccessor(object):
         See :func:`trackintel.analysis.tracking_quality.temporal_tracking_quality`.
         """
         return ti.analysis.tracking_quality.temporal_tracking_quality(self._obj, *args, **kwargs)
+
+    def build_index(self):
+        """
+        Build the spatial and temporal index of the staypoints and attach it to the accessor.
+
+        See :class:`trackintel.model.index.SpatioTemporalIndex`.
+        """
+        self._index = SpatioTemporalIndex.from_frame(self._obj)
+        return self._index
+
+    def read_index(self, filename):
+        """
+        Read the index of the staypoints written with ``index.to_file(filename)`` and attach it to the accessor.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.read_file`.
+        """
+        self._index = SpatioTemporalIndex.read_file(filename, self._obj)
+        return self._index
+
+    def index_for(self, user_id, t0=None, t1=None):
+        """
+        Return the staypoints of a user that overlap a time window, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.positions_for`.
+        """
+        return self._obj.iloc[_attached_index(self).positions_for(user_id, t0, t1)]
+
+    def query_bbox(self, bounds, user_id=None, t0=None, t1=None):
+        """
+        Return the staypoints that intersect a bounding box, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.query_bbox`.
+        """
+        return self._obj.iloc[_attached_index(self).query_bbox(bounds, user_id, t0, t1)]
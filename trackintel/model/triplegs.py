@@ -5,8 +5,10 @@ from trackintel.analysis.labelling import predict_transport_mode
 from trackintel.analysis.modal_split import calculate_modal_split
 from trackintel.analysis.tracking_quality import temporal_tracking_quality
 from trackintel.geogr.distances import calculate_distance_matrix
+from trackintel.geogr.trajectory_distances import trajectory_similarity_search
 from trackintel.io.file import write_triplegs_csv
 from trackintel.io.postgis import write_triplegs_postgis
+from trackintel.model.index import SpatioTemporalIndex, _attached_index
 from trackintel.model.util import _copy_docstring, get_speed_triplegs
 from trackintel.preprocessing.filter import spatial_filter
 from trackintel.preprocessing.triplegs import generate_trips
@@ -111,6 +113,15 @@ class TriplegsAccessor(object):
         """
         return ti.geogr.distances.calculate_distance_matrix(self._obj, *args, **kwargs)
 
+    @_copy_docstring(trajectory_similarity_search)
+    def similarity_search(self, *args, **kwargs):
+        """
+        Find the most similar triplegs among these or other triplegs.
+
+        See :func:`trackintel.geogr.trajectory_distances.trajectory_similarity_search`.
+        """
+        return ti.geogr.trajectory_distances.trajectory_similarity_search(self._obj, *args, **kwargs)
+
     @_copy_docstring(spatial_filter)
     def spatial_filter(self, *args, **kwargs):
         """
@@ -173,3 +184,37 @@ class TriplegsAccessor(object):
         See :func:`trackintel.model.util.get_speed_triplegs`.
         """
         return ti.model.util.get_speed_triplegs(self._obj, *args, **kwargs)
+
+    def build_index(self):
+        """
+        Build the spatial and temporal index of the triplegs and attach it to the accessor.
+
+        See :class:`trackintel.model.index.SpatioTemporalIndex`.
+        """
+        self._index = SpatioTemporalIndex.from_frame(self._obj)
+        return self._index
+
+    def read_index(self, filename):
+        """
+        Read the index of the triplegs written with ``index.to_file(filename)`` and attach it to the accessor.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.read_file`.
+        """
+        self._index = SpatioTemporalIndex.read_file(filename, self._obj)
+        return self._index
+
+    def index_for(self, user_id, t0=None, t1=None):
+        """
+        Return the triplegs of a user that overlap a time window, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.positions_for`.
+        """
+        return self._obj.iloc[_attached_index(self).positions_for(user_id, t0, t1)]
+
+    def query_bbox(self, bounds, user_id=None, t0=None, t1=None):
+        """
+        Return the triplegs that intersect a bounding box, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.query_bbox`.
+        """
+        return self._obj.iloc[_attached_index(self).query_bbox(bounds, user_id, t0, t1)]
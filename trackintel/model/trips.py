@@ -1,6 +1,7 @@
 from trackintel.analysis.tracking_quality import temporal_tracking_quality
 from trackintel.io.postgis import write_trips_postgis
 from trackintel.io.file import write_trips_csv
+from trackintel.model.index import SpatioTemporalIndex, _attached_index
 from trackintel.model.util import _copy_docstring
 import pandas as pd
 import geopandas as gpd
@@ -120,3 +121,37 @@ class TripsAccessor(object):
         """
         assert len(args) == 0, "When calling 'generate_tours' via the accessor all arguments must be keyword arguments"
         return ti.preprocessing.trips.generate_tours(trips=self._obj, **kwargs)
+
+    def build_index(self):
+        """
+        Build the spatial and temporal index of the trips and attach it to the accessor.
+
+        See :class:`trackintel.model.index.SpatioTemporalIndex`.
+        """
+        self._index = SpatioTemporalIndex.from_frame(self._obj)
+        return self._index
+
+    def read_index(self, filename):
+        """
+        Read the index of the trips written with ``index.to_file(filename)`` and attach it to the accessor.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.read_file`.
+        """
+        self._index = SpatioTemporalIndex.read_file(filename, self._obj)
+        return self._index
+
+    def index_for(self, user_id, t0=None, t1=None):
+        """
+        Return the trips of a user that overlap a time window, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.positions_for`.
+        """
+        return self._obj.iloc[_attached_index(self).positions_for(user_id, t0, t1)]
+
+    def query_bbox(self, bounds, user_id=None, t0=None, t1=None):
+        """
+        Return the trips that intersect a bounding box, using the attached index.
+
+        See :meth:`trackintel.model.index.SpatioTemporalIndex.query_bbox`.
+        """
+        return self._obj.iloc[_attached_index(self).query_bbox(bounds, user_id, t0, t1)]
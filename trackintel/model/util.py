@@ -46,7 +46,7 @@ def get_speed_positionfixes(positionfixes):
     return pfs
 
 
-def get_speed_triplegs(triplegs, positionfixes=None, method="tpls_speed"):
+def get_speed_triplegs(triplegs, positionfixes=None, method="tpls_speed", coordinates=None):
     """
     Compute the average speed per positionfix for each tripleg (in m/s)
 
@@ -63,6 +63,11 @@ def get_speed_triplegs(triplegs, positionfixes=None, method="tpls_speed"):
         Method how the speed is computed, one of {tpls_speed, pfs_mean_speed}. The 'tpls_speed' method simply divides
         the overall tripleg distance by its duration, while the 'pfs_mean_speed' method is the mean pfs speed.
 
+    coordinates: LineCoordinates, optional
+        The coordinates of the triplegs extracted with :func:`trackintel.geogr.coordinates.get_line_coordinates`, to
+        reuse them for the distance of triplegs in WGS84 with the 'tpls_speed' method. If None, they are extracted
+        from the triplegs.
+
     Returns
     -------
     tpls: GeoDataFrame (as trackintel triplegs)
@@ -73,7 +78,7 @@ def get_speed_triplegs(triplegs, positionfixes=None, method="tpls_speed"):
         if check_gdf_planar(triplegs):
             distance = triplegs.length
         else:
-            distance = calculate_haversine_length(triplegs)
+            distance = calculate_haversine_length(triplegs, coordinates=coordinates)
         duration = (triplegs["finished_at"] - triplegs["started_at"]).dt.total_seconds()
         # The unit of the speed is m/s
         tpls = triplegs.copy()
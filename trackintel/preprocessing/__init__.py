@@ -9,6 +9,9 @@ from .triplegs import generate_trips
 
 from .trips import generate_tours
 
+from .pipeline import Pipeline
+from .pipeline import run_pipeline
+
 __all__ = [
     "generate_staypoints",
     "generate_triplegs",
@@ -16,4 +19,6 @@ __all__ = [
     "generate_locations",
     "generate_trips",
     "generate_tours",
+    "Pipeline",
+    "run_pipeline",
 ]
@@ -1,7 +1,8 @@
-import geopandas as gpd
+import numpy as np
+import pandas as pd
 
 
-def spatial_filter(source, areas, method="within", re_project=False):
+def spatial_filter(source, areas, method="within", re_project=False, return_area_ids=False):
     """
     Filter staypoints, locations or triplegs with a geo extent.
 
@@ -12,10 +13,10 @@ def spatial_filter(source, areas, method="within", re_project=False):
 
     areas : GeoDataFrame
         The areas used to perform the spatial filtering. Note, you can have multiple Polygons 
-        and it will return all the features intersect with ANY of those geometries.
+        and it will return all the features that fulfill the method with ANY of those geometries.
 
     method : {'within', 'intersects', 'crosses'}
-        The method to filter the 'source' GeoDataFrame
+        The method to filter the 'source' GeoDataFrame, evaluated separately for every area
         
         - 'within'    : return instances in 'source' where no points of these instances lies in the \
             exterior of the 'areas' and at least one point of the interior of these instances lies \
@@ -28,47 +29,45 @@ def spatial_filter(source, areas, method="within", re_project=False):
             
     re_project : bool, default False
         If this is set to True, the 'source' will be projected to the coordinate reference system of 'areas' 
+        for the filtering. The returned features keep their original geometries.
+
+    return_area_ids : bool, default False
+        If this is set to True, the index values of the matched 'areas' are returned as well, e.g., to assign
+        the features to zones.
     
     Returns
     -------
     ret_gdf: GeoDataFrame (as trackintel datamodels)
-        A new GeoDataFrame containing the features after the spatial filtering.
+        A new GeoDataFrame containing the features after the spatial filtering, in the order of 'source'.
+
+    area_ids: pd.Series
+        Only if `return_area_ids` is True. The index values of the matched areas with the index of 'source', \
+        one entry per matched pair of feature and area. Features that match several areas appear several times.
         
     Examples
     --------
     >>> sp.as_staypoints.spatial_filter(areas, method="within", re_project=False)
+    >>> sp_in_zones, zone_ids = sp.as_staypoints.spatial_filter(zones, method="within", return_area_ids=True)
     """
-    gdf = source.copy()
-
-    if re_project:
-        init_crs = gdf.crs
-        gdf = gdf.to_crs(areas.crs)
-
-    # build spatial index for pre filtering
-    source_sindex = gdf.sindex
-    possible_matches_index = []
-    for other in areas.itertuples():
-        bounds = other.geometry.bounds
-        c = list(source_sindex.intersection(bounds))
-        possible_matches_index += c
-
-    # Get unique candidates
-    unique_candidate_matches = list(set(possible_matches_index))
-    possible_matches = gdf.iloc[unique_candidate_matches]
-
-    # get final result
-    if method == "within":
-        ret_gdf = possible_matches.loc[possible_matches.within(areas.unary_union)]
-    elif method == "intersects":
-        ret_gdf = possible_matches.loc[possible_matches.intersects(areas.unary_union)]
-    elif method == "crosses":
-        ret_gdf = possible_matches.loc[possible_matches.crosses(areas.unary_union)]
-    else:
+    if method not in ["within", "intersects", "crosses"]:
         raise AttributeError(
             "method unknown. We only support ['within', 'intersects', 'crosses']. " f"You passed {method}"
         )
 
+    # only the geometries are reprojected, the source is neither copied nor projected back
+    geometry = source.geometry
     if re_project:
-        return ret_gdf.to_crs(init_crs)
-    else:
+        geometry = geometry.to_crs(areas.crs)
+
+    # bulk query of the spatial index of the areas with all features, the predicate is evaluated exactly for every
+    # candidate pair with overlapping bounding boxes
+    source_pos, area_pos = areas.sindex.query_bulk(geometry, predicate=method)
+
+    ret_gdf = source.iloc[np.unique(source_pos)]
+    if not return_area_ids:
         return ret_gdf
+    order = np.lexsort((area_pos, source_pos))
+    area_ids = pd.Series(
+        areas.index[area_pos[order]], index=source.index[source_pos[order]], name=areas.index.name or "area_id"
+    )
+    return ret_gdf, area_ids
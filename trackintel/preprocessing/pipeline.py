@@ -0,0 +1,306 @@
+from inspect import signature
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from tqdm import tqdm
+
+from trackintel.analysis.labelling import create_activity_flag
+from trackintel.geogr.distances import to_local_crs
+from trackintel.preprocessing.positionfixes import generate_staypoints, generate_triplegs
+from trackintel.preprocessing.staypoints import generate_locations
+from trackintel.preprocessing.triplegs import generate_trips
+from trackintel.preprocessing.trips import generate_tours
+
+# the function of every step, the tables it takes as (positional) input and the tables it returns
+STEPS = {
+    "generate_staypoints": (generate_staypoints, ["positionfixes"], ["positionfixes", "staypoints"]),
+    "generate_triplegs": (generate_triplegs, ["positionfixes", "staypoints"], ["positionfixes", "triplegs"]),
+    "create_activity_flag": (create_activity_flag, ["staypoints"], ["staypoints"]),
+    "generate_trips": (generate_trips, ["staypoints", "triplegs"], ["staypoints", "triplegs", "trips"]),
+    "generate_locations": (generate_locations, ["staypoints"], ["staypoints", "locations"]),
+    "generate_tours": (generate_tours, ["trips"], ["trips", "tours"]),
+}
+
+# the table that is created by a step
+CREATES = {
+    "generate_staypoints": "staypoints",
+    "generate_triplegs": "triplegs",
+    "generate_trips": "trips",
+    "generate_locations": "locations",
+    "generate_tours": "tours",
+}
+
+# the columns that refer to the ids of a table, the columns 'tour_id' and 'trips' contain lists of ids
+REFERENCES = {
+    "staypoint_id": "staypoints",
+    "origin_staypoint_id": "staypoints",
+    "destination_staypoint_id": "staypoints",
+    "tripleg_id": "triplegs",
+    "trip_id": "trips",
+    "prev_trip_id": "trips",
+    "next_trip_id": "trips",
+    "trips": "trips",
+    "location_id": "locations",
+    "tour_id": "tours",
+}
+
+
+class Pipeline:
+    """A planned chain of preprocessing steps that is run at once on positionfixes.
+
+    The whole chain is validated before any step is run: unknown steps, unknown arguments and steps whose input
+    tables are not generated by a previous step raise an error immediately. The positionfixes are validated once
+    (empty positionfixes raise the same error in both modes) and the steps are called directly instead of through
+    the accessors of the tables. Every step copies its input tables at most once, together with its first sort.
+
+    With ``per_user=True``, the positionfixes are sorted by user once and every user is run through the whole chain
+    on its own, optionally in parallel. The tables of every user are consecutive slices of the sorted tables. The
+    results of the users are concatenated and the ids of the generated tables (and all columns
+    referring to them) are renumbered consecutively. The ids can differ from running the steps one after another,
+    e.g., if a step numbers its results by time instead of by user. Locations generated with
+    ``agg_level='dataset'`` are shared by all users, such that the chain is split at this step: the previous steps are
+    run per user, the step itself on all staypoints and the following steps per user again.
+
+    Parameters
+    ----------
+    steps : list of str or tuple (str, dict)
+        The names of the steps, optionally with the keyword arguments of the step. Supported steps are
+        'generate_staypoints', 'generate_triplegs', 'create_activity_flag', 'generate_trips', 'generate_locations'
+        and 'generate_tours'. The tables are passed on from step to step, e.g., 'generate_tours' uses the staypoints
+        with their locations if 'generate_locations' is run before it.
+
+    per_user : bool, default False
+        If True, run every user through the whole chain on its own.
+
+    n_jobs : int, default 1
+        The maximum number of users that are run concurrently (only with ``per_user=True``). If -1 all CPUs are used.
+        See https://joblib.readthedocs.io/en/latest/parallel.html#parallel-reference-documentation for a detailed
+        description.
+
+    print_progress : bool, default False
+        Show per-user progress if set to True (only with ``per_user=True``).
+
+    crs : {None, 'local'}, default None
+        If 'local', the positionfixes are projected once into the UTM zone of their data (see
+        :func:`trackintel.geogr.distances.to_local_crs`) and all steps compute planar distances in meters. The steps
+        with the argument `distance_metric` use 'euclidean' by default. The geometries of the resulting tables are
+        converted back to the CRS of the positionfixes (WGS84 if they have none).
+
+    Examples
+    --------
+    >>> pipeline = ti.Pipeline(
+    ...     ["generate_staypoints", "generate_triplegs", ("create_activity_flag", {"time_threshold": 15}),
+    ...      "generate_trips", "generate_locations", "generate_tours"],
+    ...     per_user=True, n_jobs=-1)
+    >>> results = pipeline.run(pfs)
+    >>> sp, trips = results["staypoints"], results["trips"]
+    >>> results = ti.Pipeline(["generate_staypoints", "generate_triplegs"], crs="local").run(pfs)
+    """
+
+    def __init__(self, steps, per_user=False, n_jobs=1, print_progress=False, crs=None):
+        if crs not in [None, "local"]:
+            raise AttributeError(f"crs '{crs}' is unknown. Supported values are [None, 'local'].")
+        self.steps = _plan(steps)
+        if crs == "local":
+            self.steps = _use_euclidean(self.steps)
+        self.per_user = per_user
+        self.n_jobs = n_jobs
+        self.print_progress = print_progress
+        self.crs = crs
+
+    def __repr__(self):
+        steps = " -> ".join([name for name, _, _, _ in self.steps])
+        return f"Pipeline({steps}, per_user={self.per_user})"
+
+    def run(self, positionfixes):
+        """Run the steps on positionfixes.
+
+        Parameters
+        ----------
+        positionfixes : GeoDataFrame (as trackintel positionfixes)
+
+        Returns
+        -------
+        dict
+            The resulting tables by their names, i.e., 'positionfixes' and the tables generated by the steps (out of
+            'staypoints', 'triplegs', 'trips', 'locations' and 'tours').
+        """
+        # validate the positionfixes once, the steps do not use the accessors
+        positionfixes.as_positionfixes
+        crs = positionfixes.crs
+        if self.crs == "local":
+            positionfixes = to_local_crs(positionfixes)
+        # the steps do not modify their input tables
+        tables = {"positionfixes": positionfixes}
+        if not self.per_user:
+            tables = _run_steps(tables, self.steps)
+        else:
+            for per_user, steps in _split_stages(self.steps):
+                if per_user:
+                    tables = _run_per_user(tables, steps, self.n_jobs, self.print_progress)
+                else:
+                    tables = _run_steps(tables, steps)
+
+        if self.crs == "local" and positionfixes.crs != crs:
+            target = "EPSG:4326" if crs is None else crs
+            tables = {name: _to_crs(table, positionfixes.crs, target) for name, table in tables.items()}
+        return tables
+
+
+def run_pipeline(positionfixes, steps, per_user=False, n_jobs=1, print_progress=False, crs=None):
+    """
+    Run a chain of preprocessing steps on positionfixes.
+
+    See :class:`trackintel.preprocessing.pipeline.Pipeline` for the parameters.
+
+    Returns
+    -------
+    dict
+        The resulting tables by their names, e.g., 'positionfixes', 'staypoints' and 'triplegs'.
+
+    Examples
+    --------
+    >>> results = ti.preprocessing.run_pipeline(pfs, ["generate_staypoints", "generate_triplegs"], per_user=True)
+    """
+    pipeline = Pipeline(steps, per_user=per_user, n_jobs=n_jobs, print_progress=print_progress, crs=crs)
+    return pipeline.run(positionfixes)
+
+
+def _plan(steps):
+    """Validate the steps and return them as a list of (name, kwargs, input tables, output tables)."""
+    plan = []
+    available = {"positionfixes"}
+    for step in steps:
+        name, kwargs = (step, {}) if isinstance(step, str) else step
+        if name not in STEPS:
+            raise AttributeError(f"Step '{name}' is unknown. Supported values are {list(STEPS)}.")
+        func, inputs, outputs = STEPS[name]
+        kwargs = dict(kwargs)
+        passed_tables = [arg for arg in ["positionfixes", "staypoints", "triplegs", "trips"] if arg in kwargs]
+        if passed_tables or "return_index" in kwargs:
+            raise ValueError(f"The tables and 'return_index' of step '{name}' are set by the pipeline.")
+        # raises a TypeError for unknown arguments
+        signature(func).bind(*[None] * len(inputs), **kwargs)
+
+        missing = [table for table in inputs if table not in available]
+        if missing:
+            raise ValueError(f"Step '{name}' requires the {', '.join(missing)} generated by a previous step.")
+        if name == "generate_tours" and "locations" in available:
+            # tours connect the trips via the locations of the staypoints
+            inputs = inputs + ["staypoints"]
+        available.update(outputs)
+        plan.append((name, kwargs, inputs, outputs))
+    return plan
+
+
+def _use_euclidean(steps):
+    """Use the euclidean distance in the steps with a distance metric, for positionfixes in a planar CRS."""
+    planned = []
+    for name, kwargs, inputs, outputs in steps:
+        if "distance_metric" in signature(STEPS[name][0]).parameters:
+            if kwargs.get("distance_metric", "euclidean") != "euclidean":
+                raise ValueError(f"Step '{name}' must use the distance_metric 'euclidean' with crs 'local'.")
+            kwargs = {**kwargs, "distance_metric": "euclidean"}
+        planned.append((name, kwargs, inputs, outputs))
+    return planned
+
+
+def _to_crs(table, local_crs, crs):
+    """Convert all geometry columns of a table from the local CRS to crs, geometries without CRS are local."""
+    if not isinstance(table, gpd.GeoDataFrame):
+        return table
+    for column in table.columns:
+        if isinstance(table[column].dtype, gpd.array.GeometryDtype):
+            geometry = table[column] if table[column].crs is not None else table[column].set_crs(local_crs)
+            table[column] = geometry.to_crs(crs)
+    return table
+
+
+def _split_stages(steps):
+    """Split the steps into consecutive stages that are run per user (True) or on all users (False)."""
+    stages = []
+    for step in steps:
+        name, kwargs, _, _ = step
+        per_user = not (name == "generate_locations" and kwargs.get("agg_level", "user") == "dataset")
+        if stages and stages[-1][0] == per_user and per_user:
+            stages[-1][1].append(step)
+        else:
+            stages.append((per_user, [step]))
+    return stages
+
+
+def _run_steps(tables, steps):
+    """Run the steps one after another on the tables."""
+    tables = dict(tables)
+    for name, kwargs, inputs, outputs in steps:
+        func = STEPS[name][0]
+        results = func(*[tables[table] for table in inputs], **kwargs)
+        results = results if isinstance(results, tuple) else (results,)
+        tables.update(zip(outputs, results))
+    return tables
+
+
+def _run_per_user(tables, steps, n_jobs, print_progress):
+    """Run the steps on every user separately and merge the results."""
+    # tables without users, e.g., locations of all users, are passed on to every user
+    shared = {name: table for name, table in tables.items() if "user_id" not in table.columns}
+    users = pd.Index(np.sort(tables["positionfixes"]["user_id"].unique()))
+    split = {name: _split_users(table, users) for name, table in tables.items() if name not in shared}
+
+    def user_tables(i):
+        return {name: table.iloc[bounds[i] : bounds[i + 1]].copy() for name, (table, bounds) in split.items()}
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_run_steps)({**user_tables(i), **shared}, steps)
+        for i in tqdm(range(len(users)), disable=not print_progress)
+    )
+
+    # consecutive ids of the generated tables over all users
+    created = [CREATES[name] for name, _, _, _ in steps if name in CREATES]
+    mappings = {}
+    for name in created:
+        sizes = np.array([len(result[name]) for result in results])
+        offsets = np.cumsum(sizes) - sizes
+        mappings[name] = [
+            pd.Series(np.arange(offset, offset + len(result[name])), index=result[name].index)
+            for offset, result in zip(offsets, results)
+        ]
+
+    merged = dict(shared)
+    for name in results[0]:
+        if name in shared:
+            continue
+        user_results = []
+        for i, result in enumerate(results):
+            table = result[name]
+            if name in mappings:
+                table.index = pd.Index(mappings[name][i].to_numpy(), name=table.index.name, dtype="int64")
+            for column, target in REFERENCES.items():
+                if column in table.columns and target in mappings:
+                    table[column] = _renumber(table[column], mappings[target][i])
+            user_results.append(table)
+        # keep the dtypes and the index name of the users with results
+        reference = next((table for table in user_results if len(table) > 0), user_results[0])
+        merged[name] = pd.concat(user_results).astype(reference.dtypes.to_dict(), errors="ignore")
+        merged[name].index.name = reference.index.name
+    return merged
+
+
+def _split_users(table, users):
+    """The table sorted by user (keeping the order within a user) and the bounds of the rows of every user."""
+    codes = users.get_indexer(table["user_id"])
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(users) + 1))
+    return table.take(order), bounds
+
+
+def _renumber(column, mapping):
+    """Replace the ids in a column (of ids or lists of ids) with the new ids, missing values stay missing."""
+    if column.dtype == object and column.map(lambda value: isinstance(value, list)).any():
+        return column.map(lambda ids: [mapping[i] for i in ids] if isinstance(ids, list) else ids)
+    renumbered = column.map(mapping)
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return renumbered.astype(column.dtype if pd.api.types.is_extension_array_dtype(column.dtype) else "Int64")
+    return renumbered
@@ -1,4 +1,5 @@
 import datetime
+import math
 import warnings
 
 import geopandas as gpd
@@ -6,7 +7,9 @@ import numpy as np
 import pandas as pd
 from shapely.geometry import LineString, Point
 
-from trackintel.geogr.distances import haversine_dist
+from trackintel.geogr.distances import get_planar_coordinates
+from trackintel.geogr.point_distances import _haversine_scalar, prepare_points
+from trackintel.model.positionfix_array import PositionfixArray
 from trackintel.preprocessing.util import applyParallel, _explode_agg
 
 
@@ -27,19 +30,22 @@ def generate_staypoints(
 
     Parameters
     ----------
-    positionfixes : GeoDataFrame (as trackintel positionfixes)
-        The positionfixes have to follow the standard definition for positionfixes DataFrames.
+    positionfixes : GeoDataFrame (as trackintel positionfixes) or PositionfixArray
+        The positionfixes have to follow the standard definition for positionfixes DataFrames. The geometries of a
+        compact :class:`trackintel.model.PositionfixArray` are only created for one user at a time.
 
     method : {'sliding'}
         Method to create staypoints. 'sliding' applies a sliding window over the data.
 
-    distance_metric : {'haversine'}
-        The distance metric used by the applied method.
+    distance_metric : {'haversine', 'euclidean'}
+        The distance metric used by the applied method. With 'euclidean', positionfixes in a planar CRS are
+        used as they are and positionfixes in a geographic CRS are projected once into the UTM zone of each user.
+        Euclidean distances are cheaper to compute than haversine distances.
 
     dist_threshold : float, default 100
         The distance threshold for the 'sliding' method, i.e., how far someone has to travel to
         generate a new staypoint. Units depend on the dist_func parameter. If 'distance_metric' is 'haversine' the
-        unit is in meters
+        unit is in meters, if it is 'euclidean' the unit is the one of the planar CRS or meters for geographic CRS.
 
     time_threshold : float, default 5.0 (minutes)
         The time threshold for the 'sliding' method in minutes.
@@ -69,8 +75,8 @@ def generate_staypoints(
 
     Returns
     -------
-    pfs: GeoDataFrame (as trackintel positionfixes)
-        The original positionfixes with a new column ``[`staypoint_id`]``.
+    pfs: GeoDataFrame (as trackintel positionfixes) or PositionfixArray
+        The original positionfixes with a new column ``[`staypoint_id`]``, of the same type as `positionfixes`.
 
     sp: GeoDataFrame (as trackintel staypoints)
         The generated staypoints.
@@ -96,9 +102,27 @@ def generate_staypoints(
     similarity based on location history. In Proceedings of the 16th ACM SIGSPATIAL international
     conference on Advances in geographic information systems (p. 34). ACM.
     """
-    # copy the original pfs for adding 'staypoint_id' column
-    pfs = positionfixes.copy()
+    if distance_metric not in ["haversine", "euclidean"]:
+        raise AttributeError(
+            f"distance_metric '{distance_metric}' is unknown. Supported values are ['haversine', 'euclidean']."
+        )
+
+    if isinstance(positionfixes, PositionfixArray):
+        return _generate_staypoints_compact(
+            positionfixes,
+            method=method,
+            exclude_duplicate_pfs=exclude_duplicate_pfs,
+            n_jobs=n_jobs,
+            print_progress=print_progress,
+            dist_threshold=dist_threshold,
+            time_threshold=time_threshold,
+            gap_threshold=gap_threshold,
+            distance_metric=distance_metric,
+            include_last=include_last,
+        )
 
+    # the original pfs are not modified, 'staypoint_id' is added to the (joined) copy
+    pfs = positionfixes
     if exclude_duplicate_pfs:
         len_org = pfs.shape[0]
         pfs = pfs.drop_duplicates()
@@ -112,7 +136,7 @@ def generate_staypoints(
 
     # if the positionfixes already have a column "staypoint_id", we drop it
     if "staypoint_id" in pfs:
-        pfs.drop(columns="staypoint_id", inplace=True)
+        pfs = pfs.drop(columns="staypoint_id")
 
     elevation_flag = "elevation" in pfs.columns  # if there is elevation data
 
@@ -122,7 +146,6 @@ def generate_staypoints(
     else:
         sp_column = ["user_id", "started_at", "finished_at", geo_col]
 
-    # TODO: tests using a different distance function, e.g., L2 distance
     if method == "sliding":
         # Algorithm from Li et al. (2008). For details, please refer to the paper.
         sp = applyParallel(
@@ -216,16 +239,13 @@ def generate_triplegs(
     --------
     >>> pfs.as_positionfixes.generate_triplegs('between_staypoints', gap_threshold=15)
     """
-    # copy the original pfs for adding 'tripleg_id' column
-    pfs = positionfixes.copy()
+    # we need to ensure pfs is properly ordered, sorting copies the original pfs for adding 'tripleg_id' column
+    pfs = positionfixes.sort_values(by=["user_id", "tracked_at"])
 
     # if the positionfixes already have a column "tripleg_id", we drop it
     if "tripleg_id" in pfs:
         pfs.drop(columns="tripleg_id", inplace=True)
 
-    # we need to ensure pfs is properly ordered
-    pfs.sort_values(by=["user_id", "tracked_at"], inplace=True)
-
     if method == "between_staypoints":
 
         # get case:
@@ -389,15 +409,63 @@ def generate_triplegs(
         raise AttributeError(f"Method unknown. We only support 'between_staypoints'. You passed {method}")
 
 
+def _generate_staypoints_compact(pfa, method, exclude_duplicate_pfs, n_jobs, print_progress, **kwargs):
+    """generate_staypoints() for a PositionfixArray, the positionfixes are only materialized per user."""
+    if exclude_duplicate_pfs:
+        duplicated = pfa.duplicated()
+        nb_dropped = duplicated.sum()
+        if nb_dropped > 0:
+            pfa = pfa.take(np.flatnonzero(~duplicated))
+            warn_str = (
+                f"{nb_dropped} duplicates were dropped from your positionfixes. Dropping duplicates is"
+                + " recommended but can be prevented using the 'exclude_duplicate_pfs' flag."
+            )
+            warnings.warn(warn_str)
+
+    elevation_flag = "elevation" in pfa.columns
+    geo_col = pfa.geom_col
+    if elevation_flag:
+        sp_column = ["user_id", "started_at", "finished_at", "elevation", geo_col]
+    else:
+        sp_column = ["user_id", "started_at", "finished_at", geo_col]
+
+    # the positions of the staypoint of every positionfix (-1 if none)
+    staypoint_id = np.full(len(pfa), -1, dtype="int64")
+    if method == "sliding":
+        # the index of the positionfixes of a user are their positions in pfa
+        sp = applyParallel(
+            pfa.iter_users(),
+            _generate_staypoints_sliding_user,
+            n_jobs=n_jobs,
+            print_progress=print_progress,
+            geo_col=geo_col,
+            elevation_flag=elevation_flag,
+            **kwargs,
+        ).reset_index(drop=True)
+
+        if "pfs_id" in sp.columns:
+            pfs_id = sp["pfs_id"].explode().dropna()
+            staypoint_id[pfs_id.to_numpy(dtype="int64")] = pfs_id.index
+    sp = gpd.GeoDataFrame(sp, columns=sp_column, geometry=geo_col, crs=pfa.crs)
+    sp.index.name = "id"
+
+    if len(sp) > 0:
+        sp.as_staypoints
+    else:
+        warnings.warn("No staypoints can be generated, returning empty sp.")
+
+    ## dtype consistency
+    sp.index = sp.index.astype("int64")
+    sp["user_id"] = sp["user_id"].astype(pfa.user_ids.dtype)
+    # an existing column "staypoint_id" is replaced
+    pfa = pfa.assign(staypoint_id=pd.arrays.IntegerArray(staypoint_id, mask=staypoint_id < 0))
+    return pfa, sp
+
+
 def _generate_staypoints_sliding_user(
     df, geo_col, elevation_flag, dist_threshold, time_threshold, gap_threshold, distance_metric, include_last=False
 ):
     """User level staypoint generation using sliding method, see generate_staypoints() function for parameter meaning."""
-    if distance_metric == "haversine":
-        dist_func = haversine_dist
-    else:
-        raise AttributeError("distance_metric unknown. We only support ['haversine']. " f"You passed {distance_metric}")
-
     df = df.sort_index(kind="stable").sort_values(by=["tracked_at"], kind="stable")
 
     # transform times to pandas Timedelta to simplify comparisons
@@ -407,8 +475,21 @@ def _generate_staypoints_sliding_user(
     gap_times = pd.eval("((df.tracked_at - df.tracked_at.shift(1)) > gap_threshold)").to_numpy()
 
     # put x and y into numpy arrays to speed up the access in the for loop (shapely is slow)
-    x = df[geo_col].x.to_numpy()
-    y = df[geo_col].y.to_numpy()
+    if distance_metric == "haversine":
+        # the radians and cosine of the latitude are computed once instead of in every distance calculation
+        pts = prepare_points(df[geo_col].x, df[geo_col].y)
+        x, y, cos_y = pts.lon.tolist(), pts.lat.tolist(), pts.cos_lat.tolist()
+
+        def dist_func(i, j):
+            return _haversine_scalar(x[i], y[i], cos_y[i], x[j], y[j], cos_y[j])
+
+    else:
+        # project once into a metric CRS, such that the loop only evaluates euclidean distances
+        xy = get_planar_coordinates(df)
+        x, y = xy[:, 0].tolist(), xy[:, 1].tolist()
+
+        def dist_func(i, j):
+            return math.hypot(x[j] - x[i], y[j] - y[i])
 
     ret_sp = []
     start = 0
@@ -419,7 +500,7 @@ def _generate_staypoints_sliding_user(
             start = curr
             continue
 
-        delta_dist = dist_func(x[start], y[start], x[curr], y[curr], float_flag=True)
+        delta_dist = dist_func(start, curr)
         if delta_dist >= dist_threshold:
             # we want the staypoint to have long enough duration
             if (df["tracked_at"].iloc[curr] - df["tracked_at"].iloc[start]) >= time_threshold:
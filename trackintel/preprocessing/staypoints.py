@@ -1,10 +1,18 @@
+import itertools
+
 import numpy as np
 import geopandas as gpd
 import pandas as pd
+import pygeos
+from joblib import Parallel, delayed, effective_n_jobs
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import KDTree
+from tqdm import tqdm
 import warnings
 
-from trackintel.geogr.distances import meters_to_decimal_degrees
+from trackintel.geogr.distances import meters_to_decimal_degrees, _to_cartesian
 from trackintel.preprocessing.util import applyParallel
 
 
@@ -17,6 +25,9 @@ def generate_locations(
     agg_level="user",
     print_progress=False,
     n_jobs=1,
+    partition_size=None,
+    extent=True,
+    locations=None,
 ):
     """
     Generate locations from the staypoints.
@@ -26,10 +37,19 @@ def generate_locations(
     staypoints : GeoDataFrame (as trackintel staypoints)
         The staypoints have to follow the standard definition for staypoints DataFrames.
 
-    method : {'dbscan'}
+    method : {'dbscan', 'grid', 'hdbscan', 'incremental'}
         Method to create locations.
 
         - 'dbscan' : Uses the DBSCAN algorithm to cluster staypoints.
+        - 'grid' : Snaps staypoints to a grid with cell size `epsilon`. Cells with at least `num_samples`
+          staypoints are dense, and neighboring dense cells are merged into one location. Staypoints in other cells
+          are noise. This is much faster than 'dbscan', but clusters can be up to a few cell sizes wide.
+        - 'hdbscan' : Uses the HDBSCAN algorithm with `min_samples=num_samples` and `epsilon` as
+          `cluster_selection_epsilon`. Requires scikit-learn >= 1.3 or the package `hdbscan`.
+        - 'incremental' : Assigns staypoints to the nearest of the existing `locations` if its center is within
+          `epsilon`. The ids of the existing locations stay the same. The remaining staypoints are clustered with
+          'dbscan' into new locations. This allows labelling new batches of staypoints without clustering the whole
+          history again.
 
     epsilon : float, default 100
         The epsilon for the 'dbscan' method. if 'distance_metric' is 'haversine'
@@ -41,6 +61,7 @@ def generate_locations(
     distance_metric: {'haversine', 'euclidean'}
         The distance metric used by the applied method. Any mentioned below are possible:
         https://scikit-learn.org/stable/modules/generated/sklearn.metrics.pairwise_distances.html
+        For 'haversine', the staypoints must be in longitude and latitude (e.g., WGS84).
 
     agg_level: {'user','dataset'}
         The level of aggregation when generating locations:
@@ -56,113 +77,143 @@ def generate_locations(
         https://joblib.readthedocs.io/en/latest/parallel.html#parallel-reference-documentation
         for a detailed description
 
+    partition_size : float, optional
+        Only used with `agg_level='dataset'`. If given, space is tiled into square cells with an edge length of
+        `partition_size` (in meters for 'haversine' and 'euclidean'). The cells are clustered in parallel (see
+        `n_jobs`) and clusters crossing cell borders are stitched together afterwards. The labels are equivalent
+        to a single DBSCAN over all staypoints, but memory usage is bounded by the size of the cells. Must be larger
+        than `epsilon`; a few times `epsilon` up to some kilometers are reasonable values. Only supported for the
+        distance metrics 'haversine' and 'euclidean'. If None, a single DBSCAN is run over all staypoints.
+
+    extent : bool, default True
+        If True, the extent of each location (convex hull of its staypoints) is added to the locations as column
+        "extent". Set `extent=False` for better runtime performance if only the center is required.
+
+    locations : GeoDataFrame (as trackintel locations), optional
+        The existing locations, only used (and required) by the 'incremental' method. Must have been generated with
+        the same `agg_level`.
+
     Returns
     -------
     sp: GeoDataFrame (as trackintel staypoints)
         The original staypoints with a new column ``[`location_id`]``.
 
     locs: GeoDataFrame (as trackintel locations)
-        The generated locations.
+        The generated locations. The center of a location is the mean of the coordinates of its staypoints.
+        For the 'incremental' method, the existing locations followed by the newly generated locations.
 
     Examples
     --------
     >>> sp.as_staypoints.generate_locations(method='dbscan', epsilon=100, num_samples=1)
+    >>> sp_day.as_staypoints.generate_locations(method='incremental', locations=locs, epsilon=100)
     """
     if agg_level not in ["user", "dataset"]:
         raise AttributeError(f"agg_level '{agg_level}' is unknown. Supported values are ['user', 'dataset'].")
-    if method not in ["dbscan"]:
-        raise AttributeError(f"method '{method}' is unknown. Supported value is ['dbscan'].")
+    if method not in ["dbscan", "grid", "hdbscan", "incremental"]:
+        raise AttributeError(
+            f"method '{method}' is unknown. Supported values are ['dbscan', 'grid', 'hdbscan', 'incremental']."
+        )
+    if method in ["grid", "incremental"] and distance_metric not in ["haversine", "euclidean"]:
+        raise AttributeError(
+            f"distance_metric '{distance_metric}' is not supported with method '{method}'. "
+            "Supported values are ['haversine', 'euclidean']."
+        )
+    if method == "incremental" and locations is None:
+        raise AttributeError("Method 'incremental' requires the existing locations as argument 'locations'.")
+    if partition_size is not None:
+        if method != "dbscan":
+            raise AttributeError("partition_size is only supported for method 'dbscan'.")
+        if distance_metric not in ["haversine", "euclidean"]:
+            raise AttributeError(
+                f"distance_metric '{distance_metric}' is not supported with partition_size. "
+                "Supported values are ['haversine', 'euclidean']."
+            )
+        if partition_size <= epsilon:
+            raise ValueError("partition_size must be larger than epsilon.")
 
     # initialize the return GeoDataFrames
-    sp = staypoints.copy()
-    sp = sp.sort_values(["user_id", "started_at"])
+    sp = staypoints.sort_values(["user_id", "started_at"])
     geo_col = sp.geometry.name
 
+    if method == "incremental":
+        return _generate_locations_incremental(
+            sp, locations, epsilon, num_samples, distance_metric, agg_level, print_progress, n_jobs, extent
+        )
+
+    eps = epsilon / 6371000 if distance_metric == "haversine" else epsilon
     if method == "dbscan":
-        eps = epsilon / 6371000 if distance_metric == "haversine" else epsilon
         # scikit haversine_dist wants radian. (We assume that this is good enough)
         # https://scikit-learn.org/stable/modules/generated/sklearn.metrics.pairwise.haversine_distances.html
         db = DBSCAN(eps=eps, min_samples=num_samples, algorithm="ball_tree", metric=distance_metric)
+        cluster_func, cluster_kwargs = _gen_locs_dbscan, {"distance_metric": distance_metric, "db": db}
+    elif method == "hdbscan":
+        db = _get_hdbscan(eps, num_samples, distance_metric)
+        cluster_func, cluster_kwargs = _gen_locs_dbscan, {"distance_metric": distance_metric, "db": db}
+    else:
+        cluster_func = _gen_locs_grid
+        cluster_kwargs = {"distance_metric": distance_metric, "epsilon": epsilon, "num_samples": num_samples}
+
+    if agg_level == "user":
+        sp = applyParallel(
+            sp.groupby("user_id", as_index=False),
+            cluster_func,
+            n_jobs=n_jobs,
+            print_progress=print_progress,
+            **cluster_kwargs,
+        )
+
+        # keeping track of noise labels
+        sp_non_noise_labels = sp[sp["location_id"] != -1]
+        sp_noise_labels = sp[sp["location_id"] == -1]
+
+        # sort so that the last location id of a user = max(location id)
+        sp_non_noise_labels = sp_non_noise_labels.sort_values(["user_id", "location_id"])
+
+        # identify start positions of new user_ids
+        start_of_user_id = sp_non_noise_labels["user_id"] != sp_non_noise_labels["user_id"].shift(1)
+
+        # calculate the offset (= last location id of the previous user)
+        # multiplication is to mask all positions where no new user starts and addition is to have a +1 when a
+        # new user starts
+        loc_id_offset = sp_non_noise_labels["location_id"].shift(1) * start_of_user_id + start_of_user_id
+
+        # fill first nan with 0 and create the cumulative sum
+        loc_id_offset = loc_id_offset.fillna(0).cumsum()
+
+        sp_non_noise_labels["location_id"] = sp_non_noise_labels["location_id"] + loc_id_offset
+        sp = gpd.GeoDataFrame(pd.concat([sp_non_noise_labels, sp_noise_labels]), geometry=geo_col)
+        sp.sort_values(["user_id", "started_at"], inplace=True)
+
+    elif partition_size is not None:
+        sp["location_id"] = _dbscan_partitioned(
+            sp, epsilon, num_samples, distance_metric, partition_size, n_jobs, print_progress
+        )
+    else:
+        cluster_func(sp, **cluster_kwargs)
 
-        if agg_level == "user":
-            sp = applyParallel(
-                sp.groupby("user_id", as_index=False),
-                _gen_locs_dbscan,
-                n_jobs=n_jobs,
-                print_progress=print_progress,
-                distance_metric=distance_metric,
-                db=db,
-            )
-
-            # keeping track of noise labels
-            sp_non_noise_labels = sp[sp["location_id"] != -1]
-            sp_noise_labels = sp[sp["location_id"] == -1]
-
-            # sort so that the last location id of a user = max(location id)
-            sp_non_noise_labels = sp_non_noise_labels.sort_values(["user_id", "location_id"])
-
-            # identify start positions of new user_ids
-            start_of_user_id = sp_non_noise_labels["user_id"] != sp_non_noise_labels["user_id"].shift(1)
-
-            # calculate the offset (= last location id of the previous user)
-            # multiplication is to mask all positions where no new user starts and addition is to have a +1 when a
-            # new user starts
-            loc_id_offset = sp_non_noise_labels["location_id"].shift(1) * start_of_user_id + start_of_user_id
-
-            # fill first nan with 0 and create the cumulative sum
-            loc_id_offset = loc_id_offset.fillna(0).cumsum()
-
-            sp_non_noise_labels["location_id"] = sp_non_noise_labels["location_id"] + loc_id_offset
-            sp = gpd.GeoDataFrame(pd.concat([sp_non_noise_labels, sp_noise_labels]), geometry=geo_col)
-            sp.sort_values(["user_id", "started_at"], inplace=True)
-
-        else:
-            _gen_locs_dbscan(sp, db=db, distance_metric=distance_metric)
-
-        ### create locations as grouped staypoints
-        temp_sp = sp[["user_id", "location_id", sp.geometry.name]]
-        if agg_level == "user":
-            # directly dissolve by 'user_id' and 'location_id'
-            locs = temp_sp.dissolve(by=["user_id", "location_id"], as_index=False)
-        else:
-            ## generate user-location pairs with same geometries across users
-            # get user-location pairs
-            locs = temp_sp[["user_id", "location_id"]].drop_duplicates(ignore_index=True)
-            # get location geometries
-            geom_gdf = temp_sp.dissolve(by=["location_id"], as_index=False).drop(columns={"user_id"})
-            # merge pairs with location geometries
-            locs = geom_gdf.merge(locs, on="location_id", how="right")
-
-        # filter staypoints not belonging to locations
-        locs = locs.loc[locs["location_id"] != -1]
-
-        with warnings.catch_warnings():  # TODO: fix bug for geographic crs #437
-            warnings.simplefilter("ignore", category=UserWarning)
-            locs["center"] = locs.geometry.centroid  # creates warning for geographic crs
-
-        # extent is the convex hull of the geometry
-        locs["extent"] = locs.geometry.convex_hull
-        # convex_hull of Point is Point, and MultiPoint with two Points is a LineString
-        # we change them into Polygon by creating a buffer of epsilon around them.
-        pointLine_idx = (locs["extent"].geom_type == "LineString") | (locs["extent"].geom_type == "Point")
-
-        # Perform meter to decimal conversion if the distance metric is haversine
-        if distance_metric == "haversine":
-            locs.loc[pointLine_idx, "extent"] = locs.loc[pointLine_idx].apply(
-                lambda p: p["extent"].buffer(meters_to_decimal_degrees(epsilon, p["center"].y)), axis=1
-            )
-        else:
-            locs.loc[pointLine_idx, "extent"] = locs.loc[pointLine_idx, "extent"].buffer(epsilon)
+    ### create locations as grouped staypoints
+    temp_sp = sp.loc[sp["location_id"] != -1, ["user_id", "location_id", sp.geometry.name]]
+    if agg_level == "user":
+        # directly aggregate by 'user_id' and 'location_id'
+        locs = _create_locations_geometry(temp_sp, ["user_id", "location_id"], epsilon, distance_metric, extent)
+    else:
+        ## generate user-location pairs with same geometries across users
+        # get user-location pairs
+        locs = temp_sp[["user_id", "location_id"]].drop_duplicates(ignore_index=True)
+        # get location geometries
+        geom_gdf = _create_locations_geometry(temp_sp, ["location_id"], epsilon, distance_metric, extent)
+        # merge pairs with location geometries
+        locs = geom_gdf.merge(locs, on="location_id", how="right")
 
-        locs = locs.set_geometry("center")
-        locs = locs[["user_id", "location_id", "center", "extent"]]
+    locs = locs.set_geometry("center")
+    locs = locs[["user_id", "location_id", "center", "extent"] if extent else ["user_id", "location_id", "center"]]
 
-        # index management
-        locs.rename(columns={"location_id": "id"}, inplace=True)
-        locs.set_index("id", inplace=True)
+    # index management
+    locs.rename(columns={"location_id": "id"}, inplace=True)
+    locs.set_index("id", inplace=True)
 
-        # staypoints not linked to a location receive np.nan in 'location_id'
-        sp.loc[sp["location_id"] == -1, "location_id"] = np.nan
+    # staypoints not linked to a location receive np.nan in 'location_id'
+    sp.loc[sp["location_id"] == -1, "location_id"] = np.nan
 
     if len(locs) > 0:
         locs.as_locations  # empty location is not valid
@@ -180,6 +231,60 @@ def generate_locations(
     return sp, locs
 
 
+def _create_locations_geometry(sp, by, epsilon, distance_metric, extent=True):
+    """Compute center and extent of locations from grouped staypoint coordinates.
+
+    The center is the mean of the staypoint coordinates, the extent the convex hull of the staypoints. Extents that
+    are not a polygon (locations consisting of a single point or of points on a line) are buffered by epsilon.
+
+    Parameters
+    ----------
+    sp : GeoDataFrame (as trackintel staypoints)
+        Staypoints with column "location_id".
+    by : list of str
+        Columns to group the staypoints by.
+    epsilon : float
+    distance_metric : str
+    extent : bool, default True
+        If False, only the center is computed.
+
+    Returns
+    -------
+    locs : GeoDataFrame
+        The columns of `by`, "center" and (if `extent`) "extent".
+    """
+    x = sp.geometry.x.to_numpy()
+    y = sp.geometry.y.to_numpy()
+    grouper = sp.groupby(by)
+    group = grouper.ngroup().to_numpy()
+    locs = grouper.size().index.to_frame(index=False)
+
+    count = np.bincount(group, minlength=len(locs))
+    center_x = np.bincount(group, weights=x, minlength=len(locs)) / count
+    center_y = np.bincount(group, weights=y, minlength=len(locs)) / count
+    locs = gpd.GeoDataFrame(locs, geometry=gpd.points_from_xy(center_x, center_y), crs=sp.crs)
+    locs = locs.rename_geometry("center")
+    if not extent:
+        return locs
+
+    # extent is the convex hull of the grouped coordinates
+    order = np.argsort(group, kind="stable")
+    points = pygeos.multipoints(np.column_stack([x, y])[order], indices=group[order])
+    # the crs is set after buffering, epsilon is already converted to the unit of the crs
+    hull = gpd.GeoSeries(gpd.array.GeometryArray(pygeos.convex_hull(points)))
+    # convex_hull of Point is Point, and MultiPoint with two Points is a LineString
+    # we change them into Polygon by creating a buffer of epsilon around them.
+    point_line = (hull.geom_type != "Polygon").to_numpy()
+    # Perform meter to decimal conversion if the distance metric is haversine
+    if distance_metric == "haversine":
+        radius = meters_to_decimal_degrees(epsilon, center_y[point_line])
+    else:
+        radius = epsilon
+    hull[point_line] = hull[point_line].buffer(radius, resolution=16)
+    locs["extent"] = gpd.GeoSeries(hull, crs=sp.crs)
+    return locs
+
+
 def _gen_locs_dbscan(sp, distance_metric, db):
     """Small helper function that takes staypoints and apply them to DBSCAN.
 
@@ -196,12 +301,357 @@ def _gen_locs_dbscan(sp, distance_metric, db):
     """
     p = np.array([sp.geometry.x, sp.geometry.y]).transpose()
     if distance_metric == "haversine":
-        p = np.deg2rad(p)  # haversine distance metric assumes input is in rad
+        # haversine distance metric assumes input is in rad and in the order (lat, lon)
+        p = np.deg2rad(p[:, ::-1])
     labels = db.fit_predict(p)
     sp["location_id"] = labels
     return sp
 
 
+def _get_hdbscan(eps, num_samples, distance_metric):
+    """Create a HDBSCAN instance from scikit-learn (>= 1.3) or alternatively from the package `hdbscan`."""
+    kwargs = {
+        "min_cluster_size": max(num_samples, 2),
+        "min_samples": num_samples,
+        "cluster_selection_epsilon": eps,
+        "metric": distance_metric,
+    }
+    try:
+        from sklearn.cluster import HDBSCAN
+    except ImportError:
+        try:
+            from hdbscan import HDBSCAN
+        except ImportError:
+            raise ImportError(
+                "Method 'hdbscan' requires scikit-learn >= 1.3 or the package 'hdbscan'. Please install one of them."
+            )
+    return HDBSCAN(**kwargs)
+
+
+def _gen_locs_grid(sp, distance_metric, epsilon, num_samples):
+    """Grid based density clustering of staypoints.
+
+    Staypoints are snapped to cells of size epsilon, cells with at least num_samples staypoints are dense and
+    dense cells that touch each other (also diagonally) form a location.
+
+    Parameters
+    ----------
+    sp : GeoDataFrame (as trackintel staypoints)
+    distance_metric : {'haversine', 'euclidean'}
+    epsilon : float
+    num_samples : int
+
+    Returns
+    -------
+    sp : GeoDataFrame (as trackintel staypoints)
+        Staypoints with new column "location_id"
+    """
+    p, cell = _to_cartesian(sp.geometry, epsilon, distance_metric)
+    key = np.floor(p / cell).astype(np.int64)
+    cell_key, cell_of_point, count = np.unique(key, axis=0, return_inverse=True, return_counts=True)
+    cell_of_point = cell_of_point.ravel()
+    dense = count >= num_samples
+    cell_index = pd.MultiIndex.from_arrays(cell_key.T)
+
+    # connect neighboring dense cells
+    edges = []
+    for offset in itertools.product([-1, 0, 1], repeat=p.shape[1]):
+        neighbor = cell_index.get_indexer(pd.MultiIndex.from_arrays((cell_key + np.array(offset)).T))
+        valid = (neighbor != -1) & dense
+        valid[valid] = dense[neighbor[valid]]
+        edges.append(np.vstack([np.flatnonzero(valid), neighbor[valid]]))
+    edges = np.concatenate(edges, axis=1)
+    graph = coo_matrix((np.ones(edges.shape[1], dtype=bool), edges), shape=(len(cell_key), len(cell_key)))
+    _, component = connected_components(graph, directed=False)
+
+    # number locations in order of their first staypoint
+    labels = np.where(dense[cell_of_point], component[cell_of_point], -1)
+    valid = labels != -1
+    _, first = np.unique(labels[valid], return_index=True)
+    location_of_component = np.full(len(cell_key), -1, dtype=np.int64)
+    location_of_component[labels[valid][np.sort(first)]] = np.arange(len(first))
+    labels[valid] = location_of_component[labels[valid]]
+    sp["location_id"] = labels
+    return sp
+
+
+def _generate_locations_incremental(
+    sp, locations, epsilon, num_samples, distance_metric, agg_level, print_progress, n_jobs, extent
+):
+    """Assign staypoints to existing locations and cluster the remaining staypoints into new locations.
+
+    See the 'incremental' method of `generate_locations` for the parameters.
+
+    Returns
+    -------
+    sp : GeoDataFrame (as trackintel staypoints)
+        Staypoints with new column "location_id".
+    locs : GeoDataFrame (as trackintel locations)
+        The existing locations followed by the new locations.
+    """
+    # for 'dataset', each location id can appear multiple times (once per user)
+    locs_unique = locations if agg_level == "user" else locations[~locations.index.duplicated()]
+    locs_unique = locs_unique.set_geometry("center")
+    p_sp, radius = _to_cartesian(sp.geometry, epsilon, distance_metric)
+    p_locs, _ = _to_cartesian(locs_unique.geometry, epsilon, distance_metric)
+
+    # position of the nearest location of every staypoint and its distance
+    nearest = np.zeros(len(sp), dtype=np.int64)
+    dist = np.full(len(sp), np.inf)
+    if agg_level == "user":
+        # the staypoints of a user are only assigned to the locations of the same user
+        loc_groups = locs_unique.groupby("user_id").indices
+        for user_id, sp_pos in sp.groupby("user_id").indices.items():
+            loc_pos = loc_groups.get(user_id)
+            if loc_pos is None:
+                continue
+            d, i = KDTree(p_locs[loc_pos]).query(p_sp[sp_pos], k=1)
+            dist[sp_pos], nearest[sp_pos] = d[:, 0], loc_pos[i[:, 0]]
+    elif len(locs_unique) > 0:
+        d, i = KDTree(p_locs).query(p_sp, k=1)
+        dist, nearest = d[:, 0], i[:, 0]
+    matched = dist <= radius
+    sp["location_id"] = np.nan
+    sp.loc[matched, "location_id"] = locs_unique.index[nearest[matched]]
+
+    # cluster remaining staypoints into new locations
+    sp_new = sp[~matched].drop(columns="location_id")
+    locs_new = locations.iloc[:0]
+    if len(sp_new) > 0:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=UserWarning)
+            sp_new, locs_new = generate_locations(
+                sp_new,
+                epsilon=epsilon,
+                num_samples=num_samples,
+                distance_metric=distance_metric,
+                agg_level=agg_level,
+                print_progress=print_progress,
+                n_jobs=n_jobs,
+                extent=extent,
+            )
+        offset = locations.index.max() + 1 if len(locations) > 0 else 0
+        sp.loc[~matched, "location_id"] = sp_new["location_id"] + offset
+        locs_new.index = locs_new.index + offset
+
+    locs = [locations, locs_new]
+    if agg_level == "dataset":
+        # users visiting an existing location for the first time
+        pairs = pd.MultiIndex.from_arrays([sp.loc[matched, "user_id"], sp.loc[matched, "location_id"]]).unique()
+        known = pd.MultiIndex.from_arrays([locations["user_id"], locations.index])
+        pairs = pairs[~pairs.isin(known)]
+        locs_pairs = locs_unique.loc[pairs.get_level_values(1)].copy()
+        locs_pairs["user_id"] = pairs.get_level_values(0).to_numpy()
+        locs.append(locs_pairs)
+    locs = pd.concat(locs)
+    locs = locs.set_geometry(locations.geometry.name)
+
+    if len(locs) > 0:
+        locs.as_locations  # empty location is not valid
+    else:
+        warnings.warn("No locations can be generated, returning empty locs.")
+
+    sp["location_id"] = sp["location_id"].astype("Int64")
+    locs.index = locs.index.astype("int64")
+    locs.index.name = "id"
+    locs["user_id"] = locs["user_id"].astype(sp["user_id"].dtype)
+    return sp, locs
+
+
+def _dbscan_partitioned(sp, epsilon, num_samples, distance_metric, partition_size, n_jobs=1, print_progress=False):
+    """DBSCAN over spatial tiles that are clustered independently and stitched together.
+
+    Every staypoint is owned by exactly one square tile. A tile is processed together with all staypoints that lie
+    within `epsilon` of its border, such that the neighborhoods of all owned staypoints are complete. This gives the
+    exact core points and core-core connections of a global DBSCAN. Clusters that cross tile borders are merged via
+    the connected components of the stitched core-core graph. Border points get the smallest cluster label among
+    their core neighbors, exactly like the sequential expansion of sklearn's DBSCAN.
+
+    Parameters
+    ----------
+    sp : GeoDataFrame (as trackintel staypoints)
+    epsilon : float
+    num_samples : int
+    distance_metric : {'haversine', 'euclidean'}
+    partition_size : float
+        Edge length of the tiles in the unit of `epsilon`.
+    n_jobs : int
+    print_progress : bool
+
+    Returns
+    -------
+    labels : np.array
+        Cluster labels per staypoint, -1 for noise.
+    """
+    p, radius = _to_cartesian(sp.geometry, epsilon, distance_metric)
+    cell = partition_size / 6371000 if distance_metric == "haversine" else partition_size
+
+    tiles, padded = _partition_points(p, cell, radius)
+
+    # group tiles into batches of similar size to keep the overhead of parallelization small
+    n_batches = min(len(tiles), 4 * effective_n_jobs(n_jobs))
+    size = np.cumsum([len(pad) for pad in padded])
+    batches = np.split(np.arange(len(tiles)), np.searchsorted(size, np.linspace(0, size[-1], n_batches + 1)[1:-1]))
+    batches = [b for b in batches if len(b)]
+
+    parallel = Parallel(n_jobs=n_jobs)
+    # 1. exact core point flags, every point is counted in the tile that owns it
+    counts = parallel(
+        delayed(_count_neighbors_batch)([(p[padded[t]], len(tiles[t])) for t in batch], radius)
+        for batch in tqdm(batches, disable=not print_progress)
+    )
+    is_core = np.zeros(len(p), dtype=bool)
+    for batch, batch_counts in zip(batches, counts):
+        for t, count in zip(batch, batch_counts):
+            is_core[tiles[t]] = count >= num_samples
+
+    # 2. connect core points per tile and stitch across tiles
+    res = parallel(
+        delayed(_connect_batch)([(p[padded[t]], padded[t], len(tiles[t]), is_core[padded[t]]) for t in batch], radius)
+        for batch in tqdm(batches, disable=not print_progress)
+    )
+    core_edges = np.concatenate([edges for r in res for edges in r[0]], axis=1)
+    border_edges = np.concatenate([edges for r in res for edges in r[1]], axis=1)
+
+    graph = coo_matrix((np.ones(core_edges.shape[1], dtype=bool), core_edges), shape=(len(p), len(p)))
+    _, component = connected_components(graph, directed=False)
+
+    # clusters are labelled in order of their first core point (as sklearn does)
+    labels = np.full(len(p), -1, dtype=np.int64)
+    core_idx = np.flatnonzero(is_core)
+    _, first = np.unique(component[core_idx], return_index=True)
+    cluster_of_component = np.full(len(p), -1, dtype=np.int64)
+    cluster_of_component[component[core_idx[np.sort(first)]]] = np.arange(len(first))
+    labels[core_idx] = cluster_of_component[component[core_idx]]
+
+    # border points are assigned to the smallest adjacent cluster
+    if border_edges.shape[1] > 0:
+        border_labels = pd.Series(labels[border_edges[1]]).groupby(border_edges[0]).min()
+        labels[border_labels.index.to_numpy()] = border_labels.to_numpy()
+    return labels
+
+
+def _partition_points(p, cell, radius):
+    """Assign points to square tiles and collect the points within radius around each tile.
+
+    Parameters
+    ----------
+    p : np.array of shape (n, d)
+    cell : float
+        Edge length of the tiles, must be larger than radius.
+    radius : float
+
+    Returns
+    -------
+    tiles : list of np.array
+        Positions of the points owned by each tile.
+    padded : list of np.array
+        Positions of the points in the padded tile, starting with the owned points.
+    """
+    key = np.floor(p / cell).astype(np.int64)
+    frac = p - key * cell
+    tile_key, tile_id = np.unique(key, axis=0, return_inverse=True)
+    tile_id = tile_id.ravel()
+    tile_index = pd.MultiIndex.from_arrays(tile_key.T)
+
+    # a point lies in the padding of a neighboring tile if it is closer than radius to the shared border
+    pad_tile, pad_point = [], []
+    for offset in itertools.product([-1, 0, 1], repeat=p.shape[1]):
+        if not any(offset):
+            continue
+        mask = np.ones(len(p), dtype=bool)
+        for dim, o in enumerate(offset):
+            if o == -1:
+                mask &= frac[:, dim] < radius
+            elif o == 1:
+                mask &= frac[:, dim] > cell - radius
+        if not mask.any():
+            continue
+        neighbor_key = key[mask] + np.array(offset)
+        neighbor_tile = tile_index.get_indexer(pd.MultiIndex.from_arrays(neighbor_key.T))
+        pad_tile.append(neighbor_tile)
+        pad_point.append(np.flatnonzero(mask))
+    pad_tile = np.concatenate(pad_tile) if pad_tile else np.array([], dtype=np.int64)
+    pad_point = np.concatenate(pad_point) if pad_point else np.array([], dtype=np.int64)
+    # padding of tiles without any points is not needed
+    pad_point = pad_point[pad_tile != -1]
+    pad_tile = pad_tile[pad_tile != -1]
+
+    order = np.argsort(tile_id, kind="stable")
+    tiles = np.split(order, np.cumsum(np.bincount(tile_id, minlength=len(tile_index)))[:-1])
+    pad_order = np.argsort(pad_tile, kind="stable")
+    pads = np.split(pad_point[pad_order], np.cumsum(np.bincount(pad_tile, minlength=len(tile_index)))[:-1])
+    padded = [np.concatenate([own, pad]) for own, pad in zip(tiles, pads)]
+    return tiles, padded
+
+
+def _count_neighbors_batch(batch, radius):
+    """Number of points within radius (including the point itself) of the owned points for a batch of tiles.
+
+    Parameters
+    ----------
+    batch : list of tuple (np.array, int)
+        Coordinates of the padded tile (owned points first) and the number of owned points.
+    radius : float
+
+    Returns
+    -------
+    list of np.array
+    """
+    return [KDTree(p).query_radius(p[:n_own], radius, count_only=True) for p, n_own in batch]
+
+
+def _connect_batch(batch, radius):
+    """Apply `_connect_tile` to a batch of tiles given as list of (p, pad, n_own, is_core)."""
+    res = [_connect_tile(p, pad, n_own, is_core, radius) for p, pad, n_own, is_core in batch]
+    return [r[0] for r in res], [r[1] for r in res]
+
+
+def _connect_tile(p, pad, n_own, is_core, radius):
+    """Core-core and core-border edges starting from the core points owned by a tile.
+
+    Within the tile the core points are reduced to their connected components, such that only one edge per core point
+    (to the representative of its component) has to be stitched globally.
+
+    Parameters
+    ----------
+    p : np.array
+        Coordinates of the padded tile (owned points first).
+    pad : np.array
+        Global positions of the points in p.
+    n_own : int
+        Number of owned points in p.
+    is_core : np.array of bool
+        Global core flags of the points in p.
+    radius : float
+
+    Returns
+    -------
+    core_edges, border_edges : np.array of shape (2, m)
+        Edges in global positions. Border edges point from the border point to a core point.
+    """
+    src = np.flatnonzero(is_core[:n_own])
+    if len(src) == 0:
+        return np.empty((2, 0), dtype=np.int64), np.empty((2, 0), dtype=np.int64)
+    neighbors = KDTree(p).query_radius(p[src], radius)
+    lengths = np.array([len(n) for n in neighbors])
+    left = np.repeat(src, lengths)
+    right = np.concatenate(neighbors)
+
+    core = is_core[right]
+    graph = coo_matrix((np.ones(core.sum(), dtype=bool), (left[core], right[core])), shape=(len(p), len(p)))
+    _, component = connected_components(graph, directed=False)
+    connected = np.unique(right[core])
+    # representative (first point) of each component
+    representative = np.full(len(p), -1, dtype=np.int64)
+    representative[component[connected][::-1]] = connected[::-1]
+    core_edges = np.vstack([pad[connected], pad[representative[component[connected]]]])
+
+    border = ~core
+    border_edges = np.unique(np.vstack([pad[right[border]], pad[representative[component[left[border]]]]]), axis=1)
+    return core_edges, border_edges
+
+
 def merge_staypoints(staypoints, triplegs, max_time_gap="10min", agg={}):
     """
     Aggregate staypoints horizontally via time threshold.
@@ -231,7 +681,7 @@ def merge_staypoints(staypoints, triplegs, max_time_gap="10min", agg={}):
     -------
     sp: DataFrame
         The new staypoints with the default columns and columns in `agg`, where staypoints at same location and close in
-        time are aggregated.
+        time are aggregated. The dtypes of the columns of the staypoints are preserved.
 
     Notes
     -----
@@ -256,56 +706,35 @@ def merge_staypoints(staypoints, triplegs, max_time_gap="10min", agg={}):
         raise TypeError("Parameter max_time_gap must be either of type String or pd.Timedelta!")
     assert "location_id" in staypoints.columns, "Staypoints must contain column location_id"
 
-    sp_merge = staypoints.copy()
     index_name = staypoints.index.name
 
-    # concat sp and tpls to get information whether there is a tripleg between to staypoints
-    tpls_merge = triplegs.copy()
-    tpls_merge["type"] = "tripleg"
-    sp_merge["type"] = "staypoint"
-    # convert datatypes in order to preserve the datatypes (especially ints) despite of NaNs during concat
-    sp_merge = sp_merge.convert_dtypes()
-
-    # a joined dataframe sp_tpls is constructed to add the columns 'type' and 'next_type' to the 'sp_merge' table
-    # concat and sort by time
-    sp_tpls = pd.concat([sp_merge, tpls_merge]).sort_values(by=["user_id", "started_at"])
-    sp_tpls.index.rename(index_name, inplace=True)
-    # get information whether the there is a tripleg after a staypoint
-    sp_tpls["next_type"] = sp_tpls["type"].shift(-1)
-    # get only staypoints, but with next type information
-    sp_merge = sp_tpls[sp_tpls["type"] == "staypoint"]
-
-    # reset index and make temporary index
-    sp_merge = sp_merge.reset_index()
-    # copy index to use it in the end (id is modified)
-    sp_merge["index_temp"] = sp_merge[index_name]
-
-    # roll by 1 to get next row info
-    sp_merge[["next_user_id", "next_started_at", "next_location_id"]] = sp_merge[
-        ["user_id", "started_at", "location_id"]
-    ].shift(-1)
-    # Conditions to keep on merging
-    cond = pd.Series(data=False, index=sp_merge.index)
-    cond_old = pd.Series(data=True, index=sp_merge.index)
-    cond_diff = cond != cond_old
-
-    while np.sum(cond_diff) >= 1:
-        # .values is important otherwise the "=" would imply a join via the new index
-        sp_merge["next_id"] = sp_merge["index_temp"].shift(-1).values
-
-        # identify rows to merge
-        cond0 = sp_merge["next_user_id"] == sp_merge["user_id"]
-        cond1 = sp_merge["next_started_at"] - sp_merge["finished_at"] <= max_time_gap  # time constraint
-        cond2 = sp_merge["location_id"] == sp_merge["next_location_id"]
-        cond3 = sp_merge["index_temp"] != sp_merge["next_id"]  # already merged
-        cond4 = sp_merge["next_type"] != "tripleg"  # no tripleg inbetween two staypoints
-        cond = cond0 & cond1 & cond2 & cond3 & cond4
-
-        # assign index to next row
-        sp_merge.loc[cond, "index_temp"] = sp_merge.loc[cond, "next_id"]
-        # check whether anything was changed
-        cond_diff = cond != cond_old
-        cond_old = cond.copy()
+    # order staypoints and triplegs by time to get information whether there is a tripleg between two staypoints.
+    # Only the required columns are concatenated, such that the dtypes of the staypoints are preserved.
+    sp_time = staypoints[["user_id", "started_at"]].reset_index(drop=True)
+    sp_time["position"] = np.arange(len(sp_time))
+    tpls_time = triplegs.reindex(columns=["user_id", "started_at"]).reset_index(drop=True)
+    tpls_time["position"] = -1
+    sp_tpls = pd.concat([sp_time, tpls_time], ignore_index=True).sort_values(by=["user_id", "started_at"])
+    position = sp_tpls["position"].to_numpy()
+    # a tripleg follows a staypoint if the next row is a tripleg
+    next_is_tripleg = np.append(position[1:] == -1, False)[position != -1]
+
+    # staypoints sorted by user and time
+    sp_merge = staypoints.iloc[position[position != -1]].reset_index()
+
+    # a staypoint is merged with its successor if they belong to the same user, are close in time, are at the same
+    # location and there is no tripleg inbetween them
+    next_sp = sp_merge[["user_id", "started_at", "location_id"]].shift(-1)
+    cond = (
+        (next_sp["user_id"] == sp_merge["user_id"])
+        & (next_sp["started_at"] - sp_merge["finished_at"] <= max_time_gap)  # time constraint
+        & (next_sp["location_id"] == sp_merge["location_id"]).fillna(False)
+        & ~next_is_tripleg
+    ).to_numpy(dtype=bool)
+    # a new group starts at every staypoint that is not merged with its predecessor
+    group_start = np.ones(len(sp_merge), dtype=bool)
+    group_start[1:] = ~cond[:-1]
+    sp_merge["index_temp"] = np.cumsum(group_start)
 
     # Staypoint-required columnsare aggregated in the following manner:
     agg_dict = {
@@ -318,8 +747,26 @@ def merge_staypoints(staypoints, triplegs, max_time_gap="10min", agg={}):
     # User-defined further aggregation
     agg_dict.update(agg)
 
-    # aggregate values
-    sp = sp_merge.groupby(by="index_temp").agg(agg_dict).sort_values(by=["user_id", "started_at"])
+    # "first" and "last" are taken directly from the group boundaries. This is only equivalent to the pandas
+    # aggregation (that skips missing values) for columns without missing values, the remaining columns are
+    # aggregated in a grouped reduction.
+    first = np.flatnonzero(group_start)
+    last = np.append(first[1:], len(sp_merge))[: len(first)] - 1
+    boundary = {"first": first, "last": last}
+    grouped = {
+        col: func
+        for col, func in agg_dict.items()
+        if not (isinstance(func, str) and func in boundary and sp_merge[col].notna().all())
+    }
+    if len(grouped) > 0:
+        sp_grouped = sp_merge.groupby(by="index_temp").agg(grouped).reset_index(drop=True)
+    columns = []
+    for col, func in agg_dict.items():
+        if col in grouped:
+            columns.append(sp_grouped[col])
+        else:
+            columns.append(sp_merge[col].iloc[boundary[func]].reset_index(drop=True))
+    sp = pd.concat(columns, axis=1).sort_values(by=["user_id", "started_at"])
 
     # clean
     sp = sp.set_index(index_name)
@@ -246,30 +246,26 @@ def _concat_staypoints_triplegs(staypoints, triplegs, add_geometry):
     """
     if "is_activity" not in staypoints:
         raise AttributeError("staypoints need the column 'is_activity' to be able to generate trips")
-    # Copy the input because we add temporary column "type"
-    tpls = triplegs.copy()
-    sp = staypoints.copy()
-
     # write warnings for columns that we replace
-    if "trip_id" in tpls:
+    if "trip_id" in triplegs:
         warnings.warn(f"Override column 'trip_id' in copy of triplegs.")
 
-    intersection = sp.columns.intersection(["trip_id", "prev_trip_id", "next_trip_id"])
+    intersection = staypoints.columns.intersection(["trip_id", "prev_trip_id", "next_trip_id"])
     if len(intersection):
         warnings.warn(f"Override column(s) {intersection} in copy of staypoints.")
 
-    tpls["is_activity"] = False  # in case "is_activity" is already a column of tpls
-    tpls["type"] = "tripleg"
-    sp["type"] = "staypoint"
-
-    # create table with relevant information from triplegs and staypoints.
-    sp_cols = ["started_at", "finished_at", "user_id", "type", "is_activity"]
-    tpls_cols = ["started_at", "finished_at", "user_id", "type"]
-    sp_tpls = pd.concat([sp[sp_cols], tpls[tpls_cols]])
+    # create table with relevant information from triplegs and staypoints, selecting the columns copies them
+    # such that the temporary column "type" is not added to the input.
+    sp = staypoints[["started_at", "finished_at", "user_id", "is_activity"]]
+    sp.insert(3, "type", "staypoint")
+    tpls = triplegs[["started_at", "finished_at", "user_id"]]
+    tpls.insert(3, "type", "tripleg")
+    tpls.insert(4, "is_activity", False)  # in case "is_activity" is already a column of tpls
+    sp_tpls = pd.concat([sp, tpls])
     sp_tpls["is_activity"].fillna(False, inplace=True)
     sp_tpls["sp_tpls_id"] = sp_tpls.index  # store id for later reassignment
     if add_geometry:
-        sp_tpls["geom"] = pd.concat([sp.geometry, tpls.geometry])
+        sp_tpls["geom"] = pd.concat([staypoints.geometry, triplegs.geometry])
 
     sp_tpls.sort_values(by=["user_id", "started_at"], inplace=True)
     return sp_tpls
@@ -6,6 +6,171 @@ from tqdm import tqdm
 import warnings
 
 import trackintel as ti
+from trackintel.geogr.coordinates import get_line_coordinates
+from trackintel.geogr.point_distances import prepare_points, prepared_dist
+
+
+class TourTripIndex:
+    """Compact representation of the n:n relationship between tours and trips.
+
+    The relationship is stored in compressed sparse row (CSR) layout: the trip ids of all tours are concatenated
+    into one flat array ``trip_ids`` and ``offsets`` marks where the trips of each tour start and end, i.e., the
+    trips of the i-th tour are ``trip_ids[offsets[i]:offsets[i + 1]]``.
+
+    Parameters
+    ----------
+    tour_ids : array-like of int
+        Ids of the tours, in the order of the rows of the index.
+
+    offsets : array-like of int
+        Start positions of each tour in `trip_ids` with a trailing entry for the end of the last tour. Must have
+        length ``len(tour_ids) + 1``.
+
+    trip_ids : array-like of int
+        Flat array of trip ids of all tours. Within a tour the trips are ordered by time.
+
+    Examples
+    --------
+    >>> trips, tours, index = generate_tours(trips, return_index=True)
+    >>> index.trips_of(0)
+    >>> index.tours_of(trip_id)
+    """
+
+    def __init__(self, tour_ids, offsets, trip_ids):
+        self.tour_ids = np.asarray(tour_ids, dtype="int64")
+        self.offsets = np.asarray(offsets, dtype="int64")
+        self.trip_ids = np.asarray(trip_ids, dtype="int64")
+        if len(self.offsets) != len(self.tour_ids) + 1:
+            raise ValueError("offsets must have exactly one entry more than tour_ids.")
+        if self.offsets[-1] != len(self.trip_ids):
+            raise ValueError("The last entry of offsets must be equal to the number of trip_ids.")
+        self._tour_index = pd.Index(self.tour_ids)
+        self._transposed = None
+
+    @classmethod
+    def from_tours(cls, tours, column="trips"):
+        """Build the index from a tours table with a column containing lists of trip ids.
+
+        Parameters
+        ----------
+        tours : DataFrame (as trackintel tours)
+            Tours with a column containing lists of trip ids, e.g., the output of `generate_tours`.
+
+        column : str, default "trips"
+            Name of the column with the lists of trip ids.
+
+        Returns
+        -------
+        TourTripIndex
+        """
+        lengths = tours[column].map(len).to_numpy(dtype="int64")
+        offsets = np.zeros(len(lengths) + 1, dtype="int64")
+        np.cumsum(lengths, out=offsets[1:])
+        trip_ids = np.fromiter((t for trips in tours[column] for t in trips), dtype="int64", count=offsets[-1])
+        return cls(tours.index.to_numpy(), offsets, trip_ids)
+
+    def __len__(self):
+        return len(self.tour_ids)
+
+    @property
+    def lengths(self):
+        """Number of trips per tour."""
+        return np.diff(self.offsets)
+
+    def trips_of(self, tour_id):
+        """Return the ids of all trips on a tour (including trips of nested tours).
+
+        Parameters
+        ----------
+        tour_id : int
+
+        Returns
+        -------
+        np.array
+            Trip ids ordered by time.
+        """
+        i = self._tour_index.get_loc(tour_id)
+        return self.trip_ids[self.offsets[i] : self.offsets[i + 1]]
+
+    def tours_of(self, trip_id):
+        """Return the ids of all tours a trip is part of.
+
+        Parameters
+        ----------
+        trip_id : int
+
+        Returns
+        -------
+        np.array
+            Tour ids in increasing order, i.e., the smallest nested tour first.
+        """
+        if self._transposed is None:
+            self._transposed = self._transpose()
+        trip_index, offsets, tour_ids = self._transposed
+        i = trip_index.get_indexer([trip_id])[0]
+        if i == -1:
+            return np.array([], dtype="int64")
+        return tour_ids[offsets[i] : offsets[i + 1]]
+
+    def _transpose(self):
+        """Build the trip -> tour direction of the relationship in CSR layout."""
+        tour_of_entry = np.repeat(self.tour_ids, self.lengths)
+        order = np.lexsort((tour_of_entry, self.trip_ids))
+        trip_ids_sorted = self.trip_ids[order]
+        unique_trips, starts = np.unique(trip_ids_sorted, return_index=True)
+        offsets = np.append(starts, len(trip_ids_sorted))
+        return pd.Index(unique_trips), offsets, tour_of_entry[order]
+
+    def to_frame(self):
+        """Return the relationship in long format.
+
+        Returns
+        -------
+        DataFrame
+            One row per (tour, trip) pair with the columns ``['tour_id', 'trip_id']``.
+        """
+        return pd.DataFrame({"tour_id": np.repeat(self.tour_ids, self.lengths), "trip_id": self.trip_ids})
+
+    def tour_id_lists(self, trips_index):
+        """Return for each trip the list of tours it is part of, aligned to `trips_index`.
+
+        This is the representation of the column `tour_id` that `generate_tours` writes on trips.
+
+        Parameters
+        ----------
+        trips_index : pd.Index
+            Index of the trips table.
+
+        Returns
+        -------
+        pd.Series
+            Lists of tour ids, NaN for trips that are not part of any tour.
+        """
+        if self._transposed is None:
+            self._transposed = self._transpose()
+        trip_index, offsets, tour_ids = self._transposed
+        tour_lists = np.split(tour_ids, offsets[1:-1]) if len(trip_index) else []
+        tour_lists = pd.Series([list(t) for t in tour_lists], index=trip_index, dtype="object")
+        return tour_lists.reindex(trips_index)
+
+    def join_trips(self, trips):
+        """Join the trips table onto the (tour, trip) pairs of the index.
+
+        Parameters
+        ----------
+        trips : GeoDataFrame (as trackintel trips)
+
+        Returns
+        -------
+        DataFrame
+            One row per (tour, trip) pair with the columns `tour_id`, `trip_id` and all columns of `trips`.
+            Trips that are not in `trips` are filled with NaN.
+        """
+        joined = pd.DataFrame(trips.drop(columns="tour_id", errors="ignore")).reindex(self.trip_ids)
+        joined.index = pd.RangeIndex(len(joined))
+        joined.insert(0, "trip_id", self.trip_ids)
+        joined.insert(0, "tour_id", np.repeat(self.tour_ids, self.lengths))
+        return joined
 
 
 def get_trips_grouped(trips, tours):
@@ -16,8 +181,9 @@ def get_trips_grouped(trips, tours):
     trips: GeoDataFrame (as trackintel trips)
         Trips dataframe
 
-    tours: GeoDataFrame (as trackintel tours)
-        Output of generate_tours function, must contain column "trips" with list of trip ids on tour
+    tours: GeoDataFrame (as trackintel tours) or TourTripIndex
+        Output of generate_tours function, must contain column "trips" with list of trip ids on tour. Alternatively,
+        the TourTripIndex returned by `generate_tours(..., return_index=True)`.
 
     Returns
     -------
@@ -33,21 +199,9 @@ def get_trips_grouped(trips, tours):
     This function is necessary because when running generate_tours, one trip only gets the tour ID of the smallest
     tour it belongs to assigned. Here, we return all trips for each tour, which might contain a nested tour.
     """
-    trips_inp = trips.copy()
-    if "tour_id" in trips_inp.columns:
-        trips_inp.drop(columns=["tour_id"], inplace=True)
-    # make smaller version of tours
-    tours_to_trips = tours.reset_index()[["id", "trips"]]
-    # switch to trips id as index
-    tours_to_trips.rename(columns={"id": "tour_id", "trips": "trip_id"}, inplace=True)
-    # expand this small version so that each trip id is one row
-    tours_expanded = tours_to_trips.explode("trip_id").reset_index(drop=True)
-
-    # join with trips table by id
-    tours_with_trips = tours_expanded.merge(trips_inp, left_on="trip_id", right_on="id", how="left")
-    # group
-    trips_grouped_by_tour = tours_with_trips.groupby("tour_id")
-    return trips_grouped_by_tour
+    if not isinstance(tours, TourTripIndex):
+        tours = TourTripIndex.from_tours(tours)
+    return tours.join_trips(trips).groupby("tour_id")
 
 
 def generate_tours(
@@ -57,6 +211,7 @@ def generate_tours(
     max_time="1d",
     max_nr_gaps=0,
     print_progress=False,
+    return_index=False,
 ):
     """
     Generate trackintel-tours from trips
@@ -85,18 +240,27 @@ def generate_tours(
     print_progress : bool, default False
         If print_progress is True, the progress bar is displayed
 
+    return_index : bool, default False
+        If True, the relationship between tours and trips is returned as a compact `TourTripIndex` instead of the
+        list columns `trips` (on tours) and `tour_id` (on trips). Recommended for large datasets, as the list
+        columns are memory-heavy object columns.
 
     Returns
     -------
     trips_with_tours: GeoDataFrame (as trackintel trips)
         Same as `trips`, but with column `tour_id`, containing a list of the tours that the trip is part of (see notes).
+        If `return_index` is True, `trips` are returned without the column `tour_id`.
 
     tours: GeoDataFrame (as trackintel tours)
-        The generated tours
+        The generated tours. If `return_index` is True, the tours are returned without the column `trips`.
+
+    index: TourTripIndex
+        Only returned if `return_index` is True. The trips of each tour in CSR layout (see `TourTripIndex`).
 
     Examples
     --------
     >>> trips.as_trips.generate_tours(staypoints)
+    >>> trips, tours, index = trips.as_trips.generate_tours(staypoints, return_index=True)
 
     Notes
     -------
@@ -135,11 +299,12 @@ def generate_tours(
     elif not isinstance(max_time, pd.Timedelta):
         raise TypeError("Parameter max_time must be either of type String or pd.Timedelta!")
 
-    trips_input = trips.copy()
-    # If the trips already have a column "tour_id", we drop it
-    if "tour_id" in trips_input:
-        trips_input.drop(columns="tour_id", inplace=True)
+    # If the trips already have a column "tour_id", we drop it (from a copy of the trips)
+    if "tour_id" in trips:
+        trips_input = trips.drop(columns="tour_id")
         warnings.warn("Deleted existing column 'tour_id' from trips.")
+    else:
+        trips_input = trips.copy()
 
     kwargs = {
         "max_dist": max_dist,
@@ -149,41 +314,46 @@ def generate_tours(
         "geom_col": geom_col,
         "crs_is_projected": crs_is_projected,
     }
-    if print_progress:
-        tqdm.pandas(desc="User tour generation")
-        tours = (
-            trips_input.groupby(["user_id"], group_keys=False, as_index=False)
-            .progress_apply(_generate_tours_user, **kwargs)
-            .reset_index(drop=True)
-        )
-    else:
-        tours = (
-            trips_input.groupby(["user_id"], group_keys=False, as_index=False)
-            .apply(_generate_tours_user, **kwargs)
-            .reset_index(drop=True)
-        )
+    groups = trips_input.groupby("user_id")
+    user_tours = [
+        _generate_tours_user(user_trips, **kwargs)
+        for _, user_trips in tqdm(groups, total=groups.ngroups, desc="User tour generation", disable=not print_progress)
+    ]
+    tours = pd.concat([t for t, _ in user_tours], ignore_index=True) if user_tours else _empty_tours()
+    # the trips of the tours in CSR layout, directly from the tour generation
+    tour_trips = [trip_ids for _, user_trip_ids in user_tours for trip_ids in user_trip_ids]
+    offsets = np.zeros(len(tour_trips) + 1, dtype="int64")
+    np.cumsum([len(trip_ids) for trip_ids in tour_trips], out=offsets[1:])
+    trip_ids = np.concatenate(tour_trips) if tour_trips else np.empty(0, dtype="int64")
+
+    # the list column is only created if no index is requested
+    if not return_index:
+        tours.insert(tours.columns.get_loc("location_id"), "trips", [list(t) for t in tour_trips])
 
     # No tours found
     if len(tours) == 0:
         warnings.warn("No tours can be generated, return empty tours")
+        if return_index:
+            return trips_input, tours, TourTripIndex([], [0], [])
         return trips_input, tours
 
     # index management
     tours["id"] = np.arange(len(tours))
     tours.set_index("id", inplace=True)
 
-    # assign tour id to trips
-    tour2trip_map = tours.reset_index().explode("trips").rename(columns={"id": "tour_id"})
-    # Each trip is only assigned to one tour. If a trip belongs to multiple tours, we can find its smallest subtour
-    # by using the first one it is assigned to (nested tours are always found before big tours - have smaller tour_id)
-    temp = tour2trip_map.groupby("trips").agg({"tour_id": list})
-
-    trips_with_tours = trips_input.join(temp, how="left")
-
     # trips id (generated by this function) should be int64
     tours.index = tours.index.astype("int64")
 
-    return trips_with_tours, tours
+    index = TourTripIndex(tours.index, offsets, trip_ids)
+    if return_index:
+        return trips_input, tours, index
+
+    # assign tour id to trips
+    # A trip can belong to multiple tours. The tours are sorted by tour id, so the smallest subtour comes first
+    # (nested tours are always found before big tours - have smaller tour_id)
+    trips_input["tour_id"] = index.tour_id_lists(trips_input.index)
+
+    return trips_input, tours
 
 
 def _generate_tours_user(
@@ -228,6 +398,9 @@ def _generate_tours_user(
     -------
     tours_df: DataFrame
         Tours for one user
+
+    tour_trips: list of np.array
+        The ids of the trips of each tour, ordered by time
     """
     user_id = user_trip_df["user_id"].unique()
     assert len(user_id) == 1
@@ -236,13 +409,19 @@ def _generate_tours_user(
     # sort by time
     user_trip_df = user_trip_df.sort_values(by=["started_at"])
 
+    if staypoints is None:
+        # origin and destination points of all trips, prepared once for the distance checks
+        origins, destinations = _get_trip_endpoints(user_trip_df, geom_col, crs_is_projected)
+        position = pd.Series(np.arange(len(user_trip_df)), index=user_trip_df.index)
+
     # save only the trip id (row.name) in the start candidates
     start_candidates = []
 
-    # collect tours
+    # collect tours and their trips
     tours = []
+    tour_trips = []
     # Iterate over trips
-    for _, row in user_trip_df.iterrows():
+    for pos, (_, row) in enumerate(user_trip_df.iterrows()):
         end_time = row["finished_at"]
 
         if len(start_candidates) > 0:
@@ -256,11 +435,9 @@ def _generate_tours_user(
                 )
             else:
                 # If no locations are available, check whether the distance is smaller than max_dist
+                # the last candidate is the previous trip
                 end_start_at_same_loc = _check_max_dist(
-                    user_trip_df.loc[start_candidates[-1], geom_col].geoms[1],  # destination point of previous trip
-                    row[geom_col].geoms[0],  # start point of current trip
-                    max_dist,
-                    crs_is_projected,
+                    destinations, origins, pos - 1, pos, max_dist, crs_is_projected  # previous end, current start
                 )
 
             # if the current trip does not start at the end of the previous trip, there is a gap
@@ -318,10 +495,7 @@ def _generate_tours_user(
             else:
                 # if no locations are available, check whether the distance is smaller than max_dist
                 end_start_at_same_loc = _check_max_dist(
-                    user_trip_df.loc[cand, geom_col].geoms[0],  # start point of first trip
-                    row[geom_col].geoms[1],  # destination point of current trip
-                    max_dist,
-                    crs_is_projected=crs_is_projected,
+                    origins, destinations, position[cand], pos, max_dist, crs_is_projected  # first start, current end
                 )
 
             if end_start_at_same_loc:
@@ -330,6 +504,7 @@ def _generate_tours_user(
                 non_gap_trip_idxs = [c for c in start_candidates[-j - 1 :] if ~np.isnan(c)]
                 tour_candidate = user_trip_df[user_trip_df.index.isin(non_gap_trip_idxs)]
                 tours.append(_create_tour_from_stack(tour_candidate, staypoints, max_time))
+                tour_trips.append(tour_candidate.index.to_numpy())
 
                 # do not consider the other trips - one trip cannot close two tours at a time
                 break
@@ -338,20 +513,23 @@ def _generate_tours_user(
         start_candidates = start_candidates[new_list_start:]
 
     if len(tours) == 0:
-        return pd.DataFrame(
-            tours,
-            columns=[
-                "user_id",
-                "started_at",
-                "finished_at",
-                "origin_staypoint_id",
-                "destination_staypoint_id",
-                "trips",
-                "location_id",
-            ],
-        )
+        return _empty_tours(), tour_trips
     tours_df = pd.DataFrame(tours)
-    return tours_df
+    return tours_df, tour_trips
+
+
+def _empty_tours():
+    """Tours for users without tours (without the column 'trips')."""
+    return pd.DataFrame(
+        columns=[
+            "user_id",
+            "started_at",
+            "finished_at",
+            "origin_staypoint_id",
+            "destination_staypoint_id",
+            "location_id",
+        ]
+    )
 
 
 def _check_same_loc(stp1, stp2, staypoints):
@@ -377,24 +555,47 @@ def _check_same_loc(stp1, stp2, staypoints):
     return share_location
 
 
-def _check_max_dist(p1, p2, max_dist, crs_is_projected=False):
+def _get_trip_endpoints(trips, geom_col, crs_is_projected=False):
+    """
+    Get the origin and destination points of trips with a MultiPoint geometry (origin, destination).
+
+    Parameters
+    --------
+    trips: GeoDataFrame (as trackintel trips)
+    geom_col: str
+    crs_is_projected: bool, default False
+
+    Returns
+    ------
+    origins, destinations: np.array of shape (len(trips), 2) or PreparedPoints
+        The coordinates if the crs is projected, otherwise the points prepared for :func:`prepared_dist`.
+    """
+    coords, offsets, _ = get_line_coordinates(gpd.GeoSeries(trips[geom_col]))
+    origins, destinations = coords[offsets[:-1]], coords[offsets[1:] - 1]
+    if crs_is_projected:
+        return origins, destinations
+    return prepare_points(origins[:, 0], origins[:, 1]), prepare_points(destinations[:, 0], destinations[:, 1])
+
+
+def _check_max_dist(points_1, points_2, i, j, max_dist, crs_is_projected=False):
     """
-    Check whether two points p1, p2 are less or equal than max_dist apart
+    Check whether the points points_1[i] and points_2[j] are less or equal than max_dist apart
 
     Parameters
     --------
-    p1, p2: shapely Point objects
+    points_1, points_2: np.array or PreparedPoints, see `_get_trip_endpoints`
+    i, j: int
     max_dist: int
 
     Returns
     ------
     dist_below_thresh: bool
-        indicating whether p1 and p2 are less than max_dist apart
+        indicating whether the points are less than max_dist apart
     """
     if crs_is_projected:
-        dist = p1.distance(p2)
+        dist = np.hypot(*(points_1[i] - points_2[j]))
     else:
-        dist = ti.geogr.point_distances.haversine_dist(p1.x, p1.y, p2.x, p2.y)
+        dist = prepared_dist(points_1, points_2, i, j)
     dist_below_thresh = dist <= max_dist
     return dist_below_thresh
 
@@ -440,7 +641,6 @@ def _create_tour_from_stack(temp_tour_stack, staypoints, max_time):
         "finished_at": last_trip["finished_at"],
         "origin_staypoint_id": first_trip["origin_staypoint_id"],
         "destination_staypoint_id": last_trip["destination_staypoint_id"],
-        "trips": list(temp_tour_stack.index),
         "location_id": start_loc,
     }
 